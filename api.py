@@ -0,0 +1,210 @@
+"""
+HTTP API пакетного расчета на Flask-сервере дашборда.
+
+POST /api/v1/calculate
+    {
+        "specs": [
+            {"substance": "CO2", "d": 0.00142, "G": 300, "T": -10,
+             "x_start": 0.1, "x_end": 0.9, "num_points": 50,
+             "ki": null, "value_fb": true},
+            ...
+        ],
+        "format": "json",       # или "parquet", "arrow"
+        "precision": "float64"  # "float32" - компактные parquet/arrow (для json - только float64)
+    }
+
+Для json ответ колоночный: по каждой спецификации {"columns": {имя: [значения]}}
+либо {"error": "..."}. Для parquet/arrow - одна таблица со столбцом spec;
+при precision float32 производные поля хранятся во float32, Substance - словарем.
+Ошибки спецификаций - в метаданных схемы dpdz.errors (JSON {номер: сообщение}),
+их число - в заголовке X-DpDz-Errors.
+Расчеты идут в пуле потоков через calculate_results, поэтому используют
+те же кэши свойств и объединение одинаковых запросов, что и интерфейс
+(value_fb по умолчанию true, как в дашборде).
+"""
+import io
+import json
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Response, jsonify, request
+
+from calculation import calculate_results
+from dpdz_vector import PRECISIONS, compact_results
+from lazy_import import lazy_module
+
+pd = lazy_module('pandas')
+
+# Ограничения на один запрос
+MAX_SPECS = 256
+MAX_POINTS_PER_SPEC = 10000
+MAX_POINTS_PER_REQUEST = 200000
+
+REQUIRED_FIELDS = ('substance', 'd', 'G', 'T', 'x_start', 'x_end', 'num_points')
+NUMERIC_FIELDS = ('d', 'G', 'T', 'g', 'ki', 'x_start', 'x_end', 'P',
+                  'liquid_density', 'liquid_viscosity', 'gas_density', 'gas_viscosity',
+                  'SV_liquid', 'SV_gas')
+
+API_WORKERS = int(os.environ.get('DPDZ_API_WORKERS', os.cpu_count() or 4))
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class SpecError(ValueError):
+    pass
+
+
+def get_executor():
+    global _executor
+    # Одновременные первые запросы должны получить один и тот же пул
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix='dpdz-api')
+        return _executor
+
+
+def validate_spec(spec):
+    """Проверяет спецификацию и приводит ее к запросу calculate_results"""
+    if not isinstance(spec, dict):
+        raise SpecError("Спецификация должна быть объектом")
+    missing = [field for field in REQUIRED_FIELDS if spec.get(field) is None]
+    if missing:
+        raise SpecError(f"Не заданы обязательные поля: {', '.join(missing)}")
+
+    # value_fb по умолчанию как в дашборде: иначе запросы API и интерфейса не делят кэш и расчеты
+    calc_request = {'g': 9.81, 'ki': None, 'value_fb': True}
+    calc_request.update(spec)
+    try:
+        for field in NUMERIC_FIELDS:
+            if calc_request.get(field) is not None:
+                calc_request[field] = float(calc_request[field])
+                if not math.isfinite(calc_request[field]):
+                    raise ValueError(field)
+        calc_request['num_points'] = int(calc_request['num_points'])
+    except (TypeError, ValueError, OverflowError):
+        # JSON Flask пропускает NaN и Infinity
+        raise SpecError("Числовые поля должны быть конечными числами")
+    if not isinstance(calc_request['value_fb'], bool):
+        raise SpecError("value_fb должно быть true или false")
+
+    # Физически недопустимые значения отклоняются до расчета, а не ошибкой решателя
+    for field in ('d', 'G'):
+        if calc_request[field] <= 0:
+            raise SpecError(f"{field} должно быть больше нуля")
+    for field in ('x_start', 'x_end'):
+        if not 0 <= calc_request[field] <= 1:
+            raise SpecError(f"{field} должно быть в интервале [0, 1]")
+    if not 2 <= calc_request['num_points'] <= MAX_POINTS_PER_SPEC:
+        raise SpecError(f"num_points должно быть от 2 до {MAX_POINTS_PER_SPEC}")
+    return calc_request
+
+
+def _columns(results_df):
+    # NaN в JSON недопустим, заменяем на null
+    clean = results_df.astype(object).where(results_df.notna(), None)
+    return {col: clean[col].tolist() for col in clean.columns}
+
+
+def _run_spec(calc_request):
+    try:
+        return calculate_results(calc_request), None
+    except Exception as e:
+        return None, str(e)
+
+
+def run_batch(specs):
+    """Проверка и расчет пакета, возвращает список (DataFrame или None, ошибка или None)"""
+    prepared = []
+    for spec in specs:
+        try:
+            prepared.append((validate_spec(spec), None))
+        except SpecError as e:
+            prepared.append((None, str(e)))
+
+    total_points = sum(req['num_points'] for req, _ in prepared if req is not None)
+    if total_points > MAX_POINTS_PER_REQUEST:
+        raise SpecError(f"Слишком много точек в запросе: {total_points} > {MAX_POINTS_PER_REQUEST}")
+
+    executor = get_executor()
+    futures = [executor.submit(_run_spec, req) if req is not None else None for req, _ in prepared]
+    return [future.result() if future is not None else (None, error)
+            for future, (_, error) in zip(futures, prepared)]
+
+
+def _combined_table(outcomes):
+    frames = []
+    for i, (results_df, _) in enumerate(outcomes):
+        if results_df is not None:
+            frame = results_df.copy()
+            frame.insert(0, 'spec', i)
+            frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame({'spec': []})
+
+
+def _binary_response(outcomes, fmt, precision):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return jsonify(error="Для форматов parquet/arrow установите пакет pyarrow"), 501
+
+    combined = _combined_table(outcomes)
+    if precision != 'float64':
+        combined = compact_results(combined, precision)
+    table = pa.Table.from_pandas(combined, preserve_index=False)
+    errors = {str(i): error for i, (_, error) in enumerate(outcomes) if error}
+    metadata = {**(table.schema.metadata or {}), b'dpdz.errors': json.dumps(errors, ensure_ascii=False).encode()}
+    table = table.replace_schema_metadata(metadata)
+    sink = io.BytesIO()
+    if fmt == 'parquet':
+        pq.write_table(table, sink)
+        mimetype = 'application/vnd.apache.parquet'
+    else:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        mimetype = 'application/vnd.apache.arrow.stream'
+
+    headers = {'X-DpDz-Errors': str(len(errors))}
+    return Response(sink.getvalue(), mimetype=mimetype, headers=headers)
+
+
+def calculate_batch():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('specs'), list):
+        return jsonify(error="Ожидается JSON-объект с полем specs (список)"), 400
+
+    specs = payload['specs']
+    fmt = payload.get('format', 'json')
+    if fmt not in ('json', 'parquet', 'arrow'):
+        return jsonify(error=f"Неизвестный формат: {fmt}"), 400
+    precision = payload.get('precision', 'float64')
+    if precision not in PRECISIONS:
+        return jsonify(error=f"precision должен быть одним из {', '.join(PRECISIONS)}"), 400
+    if fmt == 'json' and precision != 'float64':
+        # Числа в JSON - текст, компактное хранение там ничего не дает
+        return jsonify(error="precision применяется только к форматам parquet и arrow"), 400
+    if not specs or len(specs) > MAX_SPECS:
+        return jsonify(error=f"Число спецификаций должно быть от 1 до {MAX_SPECS}"), 400
+
+    try:
+        outcomes = run_batch(specs)
+    except SpecError as e:
+        return jsonify(error=str(e)), 413
+
+    if fmt != 'json':
+        return _binary_response(outcomes, fmt, precision)
+
+    results = []
+    for results_df, error in outcomes:
+        if error is not None:
+            results.append({'error': error})
+        else:
+            results.append({'columns': _columns(results_df)})
+    return jsonify(results=results)
+
+
+def register_api(server):
+    """Добавляет маршруты API на Flask-сервер"""
+    server.add_url_rule('/api/v1/calculate', 'calculate_batch', calculate_batch, methods=['POST'])
@@ -0,0 +1,138 @@
+"""
+Асинхронный сервис расчета с микропакетами.
+
+Запросы, пришедшие в течение batch_window секунд (или пока не набралось
+max_batch_size запросов), объединяются по (вещество, T, d, ki) в один
+векторный расчет dpdz_vector.calculate_points, результат разрезается
+обратно по запросам. Так свойства фаз, построение DataFrame и решение
+уравнения для пленки выполняются один раз на группу, а не на каждый запрос.
+
+    service = BatchingCalculationService(batch_window=0.005, max_batch_size=256)
+    async with service:
+        df = await service.calculate('CO2', d=0.00142, T=-10, G=300, x=[0.1, 0.5])
+
+close() досчитывает уже принятые запросы (текущий пакет, очередь и группы
+в пуле) и только потом возвращается, поэтому ни один await calculate()
+не остается без ответа.
+"""
+import asyncio
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from dpdz_vector import calculate_points
+
+BATCH_WINDOW = 0.005
+MAX_BATCH_SIZE = 256
+
+
+class BatchingCalculationService():
+
+    def __init__(self, batch_window=BATCH_WINDOW, max_batch_size=MAX_BATCH_SIZE, executor=None):
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.executor = executor    # None - пул потоков цикла событий по умолчанию
+        self._queue = None
+        self._worker = None
+        self._batch = []        # пакет, который собирается сейчас
+        self._tasks = set()     # группы, которые считаются в пуле
+        self.batches = 0
+        self.requests = 0
+
+    async def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._collect())
+
+    async def close(self):
+        if self._worker is None:
+            return
+        worker, queue, batch = self._worker, self._queue, self._batch
+        # Новые вызовы calculate() после этого запускают сервис заново со своей очередью
+        self._worker = self._queue = None
+        worker.cancel()
+        try:
+            await worker
+        except asyncio.CancelledError:
+            pass
+
+        # Принятые, но еще не отправленные в расчет запросы досчитываются
+        while not queue.empty():
+            batch.append(queue.get_nowait())
+        if batch:
+            self._dispatch(asyncio.get_running_loop(), batch)
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def calculate(self, substance, d, T, G, x, ki=None):
+        """Расчет одной кривой: G - скаляр или массив той же длины, что x"""
+        if self._worker is None:
+            await self.start()
+        G, x = np.broadcast_arrays(np.asarray(G, dtype=float), np.atleast_1d(np.asarray(x, dtype=float)))
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(((substance, float(T), float(d), ki), G.ravel(), x.ravel(), future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            batch = self._batch = [await queue.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self._batch = []
+            self._dispatch(loop, batch)
+
+    def _dispatch(self, loop, batch):
+        self.batches += 1
+        self.requests += len(batch)
+        groups = defaultdict(list)
+        for item in batch:
+            groups[item[0]].append(item)
+        for key, items in groups.items():
+            # Группы считаются в пуле, цикл событий продолжает принимать запросы.
+            # Ссылка на задачу хранится до ее окончания, иначе сборщик мусора может ее удалить
+            task = loop.create_task(self._run_group(loop, key, items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_group(self, loop, key, items):
+        substance, T, d, ki = key
+        G = np.concatenate([item[1] for item in items])
+        x = np.concatenate([item[2] for item in items])
+        try:
+            results_df = await loop.run_in_executor(self.executor, calculate_points, substance, T, d, ki, G, x)
+        except Exception as e:
+            for item in items:
+                if not item[3].done():
+                    item[3].set_exception(e)
+            return
+
+        start = 0
+        for _, G_item, _, future in items:
+            stop = start + len(G_item)
+            if not future.done():
+                future.set_result(results_df.iloc[start:stop].reset_index(drop=True))
+            start = stop
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'requests': self.requests,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+        }
@@ -0,0 +1,188 @@
+"""
+Интегрирование по длине испарительного канала.
+
+Вдоль канала длиной L при равномерном тепловом потоке q, Вт/м²:
+
+    dp/dz = -DpDz(G, x, T_нас(p))        (градиент давления трения по модели DpDz)
+    dx/dz = 4 q / (G d r(p))             (r - теплота парообразования)
+
+Давление падает, поэтому температура насыщения и свойства фаз меняются по
+длине. Они берутся из таблицы насыщения на отрезке температур канала
+(строится один раз на вещество и диапазон), толщина пленки на каждом шаге
+ищется от решения с прошлого шага (dpdz_vector.solve_film(guess=...)).
+Шаг по z адаптивный (Богацкий - Шампайн 3(2)), у каждого канала свой;
+все каналы считаются одними векторными вызовами.
+
+    summary, profiles = integrate_channels('CO2', d=0.00142, L=1.0, G=[300, 500],
+                                           T_in=-10, x_in=0.1, q=10000)
+"""
+import functools
+
+import numpy as np
+
+from dpdz_vector import effective_ki, interfacial_stress, solve_film
+from lazy_import import lazy_module
+from properties import TabulatedProvider, get_provider
+
+pd = lazy_module('pandas')
+
+# Состояние канала
+STATUS_DONE = 0         # дошли до конца канала
+STATUS_NO_ROOT = 1      # уравнение для пленки не решается
+STATUS_DRYOUT = 2       # x достигло x_max
+STATUS_OUT_OF_TABLE = 3  # T_нас вышла за таблицу насыщения
+STATUS_MAX_STEPS = 4    # исчерпан лимит шагов
+
+# Таблица насыщения: узлы и запас по температуре ниже входной
+TABLE_NODES = 2001
+T_SPAN = 30.0
+
+# Допуски шага: по давлению (абсолютный, Па, и относительный) и по x
+P_ATOL = 1.0
+RTOL = 1.0e-6
+X_ATOL = 1.0e-6
+MAX_STEPS = 10000
+
+# Минимальный шаг (доля длины канала)
+MIN_STEP = 1.0e-9
+
+# Коэффициенты Богацкого - Шампайн
+_A2, _A3 = 0.5, 0.75
+_B = (2 / 9, 1 / 3, 4 / 9)
+_E = (-5 / 72, 1 / 12, 1 / 9, -1 / 8)
+
+
+class SaturationTable():
+    """Свойства на линии насыщения по сетке T, °C, и обратная функция T(p)"""
+
+    def __init__(self, substance, T_min, T_max, nodes=TABLE_NODES):
+        provider = get_provider(substance)
+        self.T = np.linspace(T_min, T_max, nodes)
+        self.p = provider.saturation_pressure(self.T)
+        self.latent_heat = provider.latent_heat(self.T)
+        self.provider = TabulatedProvider.from_provider(provider, self.T)
+
+    def state(self, p):
+        """T, свойства фаз, теплопроводность и r при давлении p; вне таблицы - NaN"""
+        inside = (p >= self.p[0]) & (p <= self.p[-1])
+        T = np.where(inside, np.interp(p, self.p, self.T), np.nan)
+        T_safe = np.where(inside, T, self.T[0])
+        props = tuple(np.where(inside, v, np.nan) for v in self.provider.phase_properties(T_safe))
+        lam = self.provider.conductivity(T_safe)
+        r = np.interp(T_safe, self.T, self.latent_heat)
+        return T, props, lam, r
+
+
+@functools.lru_cache(maxsize=32)
+def saturation_table(substance, T_min, T_max, nodes=TABLE_NODES):
+    return SaturationTable(substance, T_min, T_max, nodes)
+
+
+def _rhs(table, p, x, G, d, q, ki, guess):
+    """Производные dp/dz, dx/dz и величины в точке для активных каналов"""
+    T, (rho_l, mu_l, rho_g, mu_g), lam, r = table.state(p)
+    jl = G * (1 - x) / rho_l
+    jg = G * x / rho_g
+    ki_eff = effective_ki(ki, rho_l, rho_g)
+    B, _ = solve_film(jg, jl, d, ki_eff, rho_l, rho_g, mu_l, mu_g, guess=guess)
+    with np.errstate(all='ignore'):
+        dpdz = 4.0 * interfacial_stress(B, jg, d, ki_eff, rho_g, mu_g) / (d - 2 * B)
+        dxdz = 4 * q / (G * d * r)
+        point = {'T': T, 'B': B, 'fi': ((d - 2 * B) / d) ** 2, 'alpha': lam / B, 'DpDz': dpdz}
+    status = np.where(np.isnan(T), STATUS_OUT_OF_TABLE, np.where(np.isnan(B), STATUS_NO_ROOT, STATUS_DONE))
+    return np.stack([-dpdz, dxdz]), point, status
+
+
+def integrate_channels(substance, d, L, G, T_in, x_in, q, ki=None, x_max=0.99,
+                       p_atol=P_ATOL, rtol=RTOL, x_atol=X_ATOL, max_steps=MAX_STEPS, h0=None):
+    """
+    Интегрирование всех каналов (аргументы транслируются друг с другом).
+    Возвращает (summary, profiles):
+        summary  - по каналу: dp, p_out, T_out, x_out, z_end, steps, status
+        profiles - точки по длине: channel, z, p, T, x, B, fi, alpha, DpDz
+    """
+    d, L, G, T_in, x_in, q = (a.ravel().astype(float) for a in
+                              np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (d, L, G, T_in, x_in, q))))
+    ki = np.nan if ki is None else float(ki)
+    n = len(G)
+
+    provider = get_provider(substance)
+    T_low = max(provider.triple_temperature() + 0.5, float(T_in.min()) - T_SPAN)
+    table = saturation_table(substance, round(T_low, 3), round(float(T_in.max()) + 0.5, 3))
+
+    p = np.interp(T_in, table.T, table.p)
+    y = np.stack([p, x_in])
+    z = np.zeros(n)
+    h = np.full(n, h0) if h0 is not None else L / 100
+    steps = np.zeros(n, dtype=int)
+    status = np.full(n, -1)
+
+    k1, point, st = _rhs(table, y[0], y[1], G, d, q, ki, None)
+    B_last = point['B'].copy()
+    status[st != STATUS_DONE] = st[st != STATUS_DONE]
+    records = [(np.arange(n), z.copy(), y[0].copy(), y[1].copy(), point)]
+
+    active = np.flatnonzero(status < 0)
+    while active.size:
+        a = active
+        ya, k1a = y[:, a], k1[:, a]
+        args = (G[a], d[a], q[a], ki)
+        # Шаг не выходит за конец канала и за x_max
+        with np.errstate(divide='ignore'):
+            h_x = np.where(k1a[1] > 0, (x_max - ya[1]) / k1a[1], np.inf)
+        ha = np.minimum(np.minimum(h[a], L[a] - z[a]), np.maximum(h_x, 1e-12))
+
+        k2, _, _ = _rhs(table, *(ya + _A2 * ha * k1a), *args, B_last[a])
+        k3, _, _ = _rhs(table, *(ya + _A3 * ha * k2), *args, B_last[a])
+        y_new = ya + ha * (_B[0] * k1a + _B[1] * k2 + _B[2] * k3)
+        k4, point, st = _rhs(table, y_new[0], y_new[1], *args, B_last[a])
+        err = ha * (_E[0] * k1a + _E[1] * k2 + _E[2] * k3 + _E[3] * k4)
+
+        scale = np.stack([p_atol + rtol * np.abs(ya[0]), np.full(a.size, x_atol)])
+        with np.errstate(invalid='ignore'):
+            err_norm = np.max(np.abs(err) / scale, axis=0)
+        failed = np.isnan(err_norm)
+        accepted = (err_norm <= 1) & (st == STATUS_DONE)
+
+        # Ошибка в пробных точках - уменьшаем шаг, пока он не станет слишком мал
+        with np.errstate(divide='ignore', invalid='ignore'):
+            factor = np.clip(0.9 * err_norm ** (-1 / 3), 0.2, 5.0)
+        factor = np.where(failed, 0.25, factor)
+        h[a] = ha * factor
+
+        idx = a[accepted]
+        y[:, idx] = y_new[:, accepted]
+        k1[:, idx] = k4[:, accepted]
+        z[idx] += ha[accepted]
+        B_last[idx] = point['B'][accepted]
+        steps[idx] += 1
+        records.append((idx, z[idx].copy(), y[0, idx].copy(), y[1, idx].copy(),
+                        {key: value[accepted] for key, value in point.items()}))
+
+        done = np.isclose(z[idx], L[idx], rtol=1e-12, atol=0)
+        dry = y[1, idx] >= x_max * (1 - 1e-12)
+        status[idx[done]] = STATUS_DONE
+        status[idx[dry & ~done]] = STATUS_DRYOUT
+
+        # Шаг стал пренебрежимо мал, а точка все еще не считается
+        small = ~accepted & (h[a] < MIN_STEP * L[a])
+        status[a[small]] = np.where(st[small] != STATUS_DONE, st[small], STATUS_NO_ROOT)
+        over = (status[a] < 0) & (steps[a] >= max_steps)
+        status[a[over]] = STATUS_MAX_STEPS
+        active = np.flatnonzero(status < 0)
+
+    profiles = pd.DataFrame({
+        'channel': np.concatenate([r[0] for r in records]),
+        'z': np.concatenate([r[1] for r in records]),
+        'p': np.concatenate([r[2] for r in records]),
+        'x': np.concatenate([r[3] for r in records]),
+        **{key: np.concatenate([r[4][key] for r in records]) for key in ('T', 'B', 'fi', 'alpha', 'DpDz')},
+    }).sort_values(['channel', 'z'], kind='stable').reset_index(drop=True)
+
+    T_out, _, _, _ = table.state(y[0])
+    summary = pd.DataFrame({
+        'G': G, 'd': d, 'L': L, 'q': q, 'T_in': T_in, 'x_in': x_in,
+        'dp': p - y[0], 'p_out': y[0], 'T_out': T_out, 'x_out': y[1],
+        'z_end': z, 'steps': steps, 'status': status,
+    })
+    return summary, profiles
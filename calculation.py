@@ -0,0 +1,605 @@
+"""
+Путь расчета для дашборда: из параметров формы в DataFrame результатов.
+
+Одинаковые запросы, пришедшие одновременно (несколько инженеров нажали
+"Выполнить расчет" с теми же входными данными), не считаются повторно:
+они присоединяются к уже идущему расчету и получают его результат.
+
+В форме обычно меняют одно поле за раз (x_end, число точек, ki), поэтому
+расчет инкрементальный. Зависимости промежуточных величин:
+
+    свойства фаз        <- (вещество, T)
+    скорости фаз jl, jg <- свойства фаз, G, x
+    толщина пленки B    <- все остальное (d, ki, g, value_fb, ...)
+
+Свойства берутся из кэша saturation_properties, решенные точки хранятся
+по ключу модели (все входы, кроме x) и значению x, так что новый запрос
+досчитывает только отсутствующие в кэше x.
+
+Долгие расчеты в дашборде идут фоновыми заданиями (ProgressiveJob): точки
+считаются пакетами от грубой сетки к мелкой (концы, середина, четверти, ...),
+поэтому форма кривой видна сразу, а готовые точки забираются опросом
+snapshot(), пока расчет продолжается. Задания живут в процессе, который
+их запустил; идентификатор задания случайный, и задание видно только
+сессиям, которые его запустили или присоединились к нему. Ход задания
+передается JobRegistry.publisher (дашборд пишет его в общее хранилище
+результатов), поэтому опрос через другой рабочий процесс тоже видит точки.
+Задание запускается через tracing.detach: его спаны - отдельная трасса
+со ссылкой на запрос, запустивший задание.
+
+Серия кривых (SweepJob) - все сочетания веществ, G и T из формы. Кривые
+считаются в общем пуле потоков (parallel.make_executor); в сборке Python
+без GIL - параллельно, иначе поочередно, но у каждой кривой свой ход расчета.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+from class_DpDz import CompactDpDz, DpDz, saturation_properties
+from lazy_import import lazy_module
+from metrics import POINTS_SOLVED, REGISTRY, SOLVER_FAILURES
+from parallel import make_executor
+from tracing import current_span, detach, record_exception, span
+
+pd = lazy_module('pandas')
+
+# Необязательные параметры формы -> ключи thermodynamic_params класса DpDz
+OPTIONAL_PARAMS = {
+    'P': 'Pressure',
+    'liquid_density': 'Liquid density',
+    'liquid_viscosity': 'Liquid viscosity',
+    'gas_density': 'Gas density',
+    'gas_viscosity': 'Gas viscosity',
+    'SV_liquid': 'Liquid velocity',
+    'SV_gas': 'Gas velocity',
+}
+
+# Поля запроса, из которых строится ключ
+KEY_FIELDS = ('substance', 'd', 'G', 'T', 'g', 'ki', 'x_start', 'x_end', 'num_points', 'value_fb') \
+    + tuple(OPTIONAL_PARAMS)
+
+# Поля, от которых зависит решение в точке (все, кроме сетки по x)
+MODEL_FIELDS = tuple(field for field in KEY_FIELDS if field not in ('x_start', 'x_end', 'num_points'))
+
+# Сколько наборов входных данных и точек в каждом держать в кэше
+MAX_MODELS = 64
+MAX_POINTS_PER_MODEL = 20000
+
+# Точность сравнения x: np.linspace дает разный шум в последних разрядах
+X_DECIMALS = 12
+
+# Пакеты фонового расчета: первый маленький (форма кривой сразу), дальше вдвое больше
+FIRST_BATCH = 8
+MAX_BATCH = 512
+
+# Сколько завершенных заданий хранить
+MAX_JOBS = 32
+
+# Как часто, с, извещать о ходе задания (JobRegistry.publisher); о завершении - всегда
+PUBLISH_INTERVAL = 0.5
+
+# Предел числа кривых в одной серии и потоков для их расчета
+MAX_CURVES = 24
+CURVE_WORKERS = 4
+
+
+def _normalize(value):
+    # 300 и 300.0 - один и тот же запрос
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    return float(value)
+
+
+def parse_values(value, positive=False):
+    """
+    Значения параметра из поля формы: число, список '300, 400, 500'
+    или равномерный диапазон 'start:stop:num' ('300:600:4').
+    Повторы отбрасываются; nan, inf и (при positive) значения <= 0 - ошибка
+    """
+    if value is None:
+        return [value]
+    text = str(value).strip()
+    try:
+        if isinstance(value, (int, float)):
+            values = [float(value)]
+        elif ':' in text:
+            start, stop, num = text.split(':')
+            if int(num) < 1:
+                raise ValueError
+            values = [float(v) for v in np.linspace(float(start), float(stop), int(num))]
+        else:
+            values = [float(v) for v in text.replace(';', ',').split(',') if v.strip()]
+    except ValueError:
+        raise ValueError(f"Не удалось разобрать значения '{text}': ожидается число, список через запятую "
+                         "или диапазон start:stop:num") from None
+    if not values or not all(np.isfinite(values)):
+        raise ValueError(f"Значения '{text}' должны быть конечными числами")
+    if positive and min(values) <= 0:
+        raise ValueError(f"Значения '{text}' должны быть больше нуля")
+    # Одинаковые значения дали бы кривые с одной подписью
+    return list(dict.fromkeys(values))
+
+
+def sweep_requests(request, substances, G_values, T_values):
+    """Запросы для всех сочетаний (вещество, G, T) на основе общего запроса формы"""
+    requests = [{**request, 'substance': substance, 'G': G, 'T': T}
+                for substance in substances for G in G_values for T in T_values]
+    if len(requests) > MAX_CURVES:
+        raise ValueError(f"Слишком много кривых: {len(requests)} (не больше {MAX_CURVES})")
+    return requests
+
+
+def curve_label(request):
+    return f"{request['substance']}, G={request['G']:g}, T={request['T']:g}"
+
+
+def calculation_key(request):
+    """Нормализованный ключ запроса"""
+    return tuple(_normalize(request.get(field)) for field in KEY_FIELDS)
+
+
+def model_key(request):
+    """Ключ всех входов, кроме сетки по x"""
+    return tuple(_normalize(request.get(field)) for field in MODEL_FIELDS)
+
+
+def compute_results(request):
+    """Расчет DpDz по параметрам формы, результат - DataFrame"""
+    x_values = np.linspace(request['x_start'], request['x_end'], int(request['num_points']))
+
+    thermodynamic_params = {
+        'Substance': request['substance'],
+        'Temperature': request['T'],
+        'G': request['G'],
+        'x': x_values
+    }
+    for field, name in OPTIONAL_PARAMS.items():
+        if request.get(field) is not None:
+            thermodynamic_params[name] = request[field]
+
+    with span('dpdz.construct', substance=request['substance']):
+        calculator = DpDz(g=request['g'], d=request['d'], ki=request.get('ki'),
+                          thermodynamic_params=thermodynamic_params,
+                          value_fb=request.get('value_fb', True))
+    with span('dpdz.solve', points=len(x_values)):
+        results = _count_points(calculator.calculate, len(x_values))
+
+    with span('dataframe', rows=len(x_values)):
+        if isinstance(results, list):
+            results_df = pd.DataFrame(results)
+        else:
+            results_df = pd.DataFrame([results])
+
+    # Убеждаемся, что все необходимые колонки присутствуют
+    for col in ['x', 'DpDz']:
+        if col not in results_df.columns:
+            results_df[col] = np.nan
+    return results_df
+
+
+def _count_points(calculate, n):
+    # brentq в DpDz бросает исключение на первой точке без решения - неудачной считается вся порция
+    # (как и при любой другой ошибке расчета, например неизвестном веществе)
+    try:
+        results = calculate()
+    except Exception:
+        SOLVER_FAILURES.inc(n, engine='scalar')
+        raise
+    POINTS_SOLVED.inc(n, engine='scalar')
+    return results
+
+
+class IncrementalEvaluator():
+    """
+    Расчет с переиспользованием уже решенных точек.
+    Запросы с заданными скоростями фаз или без T считаются полностью (compute_results)
+    """
+
+    def __init__(self, max_models=MAX_MODELS, max_points=MAX_POINTS_PER_MODEL):
+        self.max_models = max_models
+        self.max_points = max_points
+        self._models = OrderedDict()    # ключ модели -> {x: строка результата}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.points_reused = 0
+        self.points_solved = 0
+
+    @staticmethod
+    def supports(request):
+        if request.get('SV_liquid') is not None or request.get('SV_gas') is not None:
+            return False
+        return request.get('T') is not None and np.ndim(request.get('G')) == 0
+
+    def _solve(self, request, x_values):
+        with span('dpdz.construct'):
+            calc = CompactDpDz(g=request['g'], d=request['d'], ki=request.get('ki'),
+                               value_fb=request.get('value_fb', True))
+        with span('properties.lookup', substance=request['substance'], T=request['T']):
+            calc.set_state(request['substance'], request['T']).set_points(request['G'], x_values)
+        with span('dpdz.solve', points=len(x_values)):
+            results = _count_points(calc.calculate, len(x_values))
+        return results if isinstance(results, list) else [results]
+
+    def evaluate(self, request):
+        if not self.supports(request):
+            return compute_results(request)
+        x_values = np.linspace(request['x_start'], request['x_end'], int(request['num_points']))
+        return pd.DataFrame(self.evaluate_points(request, x_values))
+
+    def evaluate_points(self, request, x_values):
+        """Строки результата для заданных x (в том же порядке)"""
+        x_keys = [round(float(x), X_DECIMALS) for x in x_values]
+        key = model_key(request)
+
+        with self._lock:
+            points = self._models.get(key)
+            if points is None:
+                points = self._models[key] = {}
+                while len(self._models) > self.max_models:
+                    self._models.popitem(last=False)
+            else:
+                self._models.move_to_end(key)
+            known = [points.get(xk) for xk in x_keys]
+        missing = [i for i, row in enumerate(known) if row is None]
+        current_span().set_attribute('points.reused', len(x_values) - len(missing))
+
+        if missing:
+            for i, row in zip(missing, self._solve(request, x_values[missing])):
+                known[i] = row
+
+        with self._lock:
+            for i in missing:
+                points[x_keys[i]] = known[i]
+            # Старые точки вытесняются в порядке добавления
+            while len(points) > self.max_points:
+                points.pop(next(iter(points)))
+            self.requests += 1
+            self.points_reused += len(x_keys) - len(missing)
+            self.points_solved += len(missing)
+
+        return [{**row, 'x': x} for row, x in zip(known, x_values)]
+
+    def stats(self):
+        with self._lock:
+            total = self.points_reused + self.points_solved
+            return {
+                'requests': self.requests,
+                'models': len(self._models),
+                'points_reused': self.points_reused,
+                'points_solved': self.points_solved,
+                'reuse_rate': self.points_reused / total if total else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+class InFlightCoalescer():
+    """
+    Объединение одинаковых одновременных расчетов.
+    Первый запрос с данным ключом считает, остальные ждут его Future.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.computed = 0
+        self.coalesced = 0
+
+    def run(self, key, func):
+        with self._lock:
+            self.requests += 1
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                future = Future()
+                self._in_flight[key] = future
+                self.computed += 1
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(func())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return future.result()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'computed': self.computed,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._in_flight),
+                'coalesce_rate': self.coalesced / self.requests if self.requests else 0.0,
+            }
+
+
+def coarse_to_fine(n):
+    """Порядок точек сетки из n узлов: концы, середина, четверти, восьмые, ..."""
+    order = [0] + ([n - 1] if n > 1 else [])
+    seen = set(order)
+    step = 1 << max(0, (n - 1).bit_length())
+    while step >= 1:
+        for i in range(0, n, step):
+            if i not in seen:
+                seen.add(i)
+                order.append(i)
+        step //= 2
+    return order
+
+
+def batches(order, first=FIRST_BATCH, largest=MAX_BATCH):
+    """Пакеты индексов растущего размера: first, 2 first, ... до largest"""
+    start, size = 0, first
+    while start < len(order):
+        yield order[start:start + size]
+        start += size
+        size = min(size * 2, largest)
+
+
+def done_indices(total, done):
+    """
+    Узлы сетки (по возрастанию), готовые у кривой из total точек после done точек:
+    задание считает их пакетами в порядке coarse_to_fine
+    """
+    return sorted(coarse_to_fine(total)[:done])
+
+
+class _BackgroundJob():
+    """Общее для заданий: сессии, которым задание видно, и извещение о ходе расчета"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.sessions = set()
+        self.params = None      # параметры вызывающей стороны для публикации результата
+        # on_progress(job) вызывается не чаще PUBLISH_INTERVAL и по завершении задания
+        self.on_progress = None
+        self._published = 0.0
+        self._notify_lock = threading.Lock()
+
+    def _notify(self):
+        callback = self.on_progress
+        if callback is None:
+            return
+        with self._notify_lock:
+            now = time.monotonic()
+            if not self.finished and now - self._published < PUBLISH_INTERVAL:
+                return
+            self._published = now
+            try:
+                callback(self)
+            except Exception as e:
+                # Ошибка извещения не прерывает расчет
+                record_exception(e, "Error publishing job progress")
+
+
+class ProgressiveJob(_BackgroundJob):
+    """Фоновый расчет одного запроса формы с промежуточными результатами"""
+
+    def __init__(self, job_id, request, evaluator):
+        super().__init__(job_id)
+        self.request = request
+        self.evaluator = evaluator
+        self.x_values = np.linspace(request['x_start'], request['x_end'], int(request['num_points']))
+        self._rows = [None] * len(self.x_values)
+        self._lock = threading.Lock()
+        self.started = False
+        self.done = 0
+        self.finished = False
+        self.error = None
+
+    @property
+    def total(self):
+        return len(self.x_values)
+
+    def run(self):
+        self.started = True
+        try:
+            with span('job.run', job_id=self.job_id, points=self.total):
+                if not self.evaluator.supports(self.request):
+                    # Скорости фаз заданы явно - считаем за один раз
+                    rows = compute_results(self.request).to_dict('records')
+                    self._store(range(len(rows)), rows)
+                    return
+                for batch in batches(coarse_to_fine(self.total)):
+                    with span('job.batch', points=len(batch)):
+                        self._store(batch, self.evaluator.evaluate_points(self.request, self.x_values[batch]))
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.finished = True
+            self._notify()
+
+    def _store(self, indices, rows):
+        with self._lock:
+            for i, row in zip(indices, rows):
+                self._rows[i] = row
+            self.done += len(rows)
+        self._notify()
+
+    def snapshot(self):
+        """Готовые точки по возрастанию x (DataFrame) и состояние задания"""
+        with self._lock:
+            rows = [row for row in self._rows if row is not None]
+        return pd.DataFrame(rows, columns=list(rows[0]) if rows else ['x', 'DpDz']), {
+            'done': len(rows),
+            'total': self.total,
+            'finished': self.finished,
+            'error': self.error,
+        }
+
+
+class SweepJob(_BackgroundJob):
+    """Серия кривых, каждая - ProgressiveJob; результат - общая таблица со столбцом curve"""
+
+    def __init__(self, job_id, requests, evaluator):
+        super().__init__(job_id)
+        self.curves = [ProgressiveJob(f"{job_id}.{i}", request, evaluator) for i, request in enumerate(requests)]
+        for curve in self.curves:
+            curve.on_progress = lambda curve: self._notify()
+
+    @property
+    def request(self):
+        return self.curves[0].request
+
+    @property
+    def finished(self):
+        return all(curve.finished for curve in self.curves)
+
+    def launch(self, executor):
+        for curve in self.curves:
+            executor.submit(detach(curve.run))
+
+    def snapshot(self):
+        """Готовые точки всех кривых и состояние серии (по кривым в 'curves')"""
+        frames, states = [], []
+        for curve in self.curves:
+            results_df, state = curve.snapshot()
+            label = curve_label(curve.request)
+            results_df.insert(0, 'curve', label)
+            frames.append(results_df)
+            states.append({**state, 'curve': label})
+        errors = [f"{state['curve']}: {state['error']}" for state in states if state['error']]
+        return pd.concat(frames, ignore_index=True), {
+            'done': sum(state['done'] for state in states),
+            'total': sum(state['total'] for state in states),
+            'finished': all(state['finished'] for state in states),
+            'error': '; '.join(errors) or None,
+            'curves': states,
+        }
+
+
+class JobRegistry():
+    """
+    Фоновые задания расчета. Одинаковый запрос, пока его задание идет,
+    присоединяется к нему, а не запускает второе. publisher(job) получает
+    ход каждого задания (см. _BackgroundJob.on_progress)
+    """
+
+    def __init__(self, evaluator, max_jobs=MAX_JOBS, curve_workers=CURVE_WORKERS, publisher=None):
+        self.evaluator = evaluator
+        self.max_jobs = max_jobs
+        self.curve_workers = curve_workers
+        self.publisher = publisher
+        self._jobs = OrderedDict()
+        self._running = {}      # ключ запроса -> идентификатор задания
+        self._lock = threading.Lock()
+        self._executor = None   # пул потоков для кривых серий, создается при первой серии
+
+    def start(self, request, session_id=None, params=None):
+        """Запускает расчет в фоне, возвращает идентификатор задания"""
+        job, created = self._register(calculation_key(request), session_id,
+                                      lambda job_id: ProgressiveJob(job_id, request, self.evaluator), params)
+        if created:
+            threading.Thread(target=detach(job.run), name=f"dpdz-job-{job.job_id}", daemon=True).start()
+        return job.job_id
+
+    def start_sweep(self, requests, session_id=None, params=None):
+        """Запускает серию кривых в общем пуле потоков, возвращает идентификатор задания"""
+        key = ('sweep',) + tuple(calculation_key(request) for request in requests)
+        job, created = self._register(key, session_id, lambda job_id: SweepJob(job_id, requests, self.evaluator),
+                                      params)
+        if created:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = make_executor(self.curve_workers, 'thread')
+            job.launch(self._executor)
+        return job.job_id
+
+    def _register(self, key, session_id, factory, params=None):
+        """
+        Задание для ключа: уже идущее (created=False) или новое; сессия получает к нему доступ.
+        params сохраняются в новом задании (job.params) для издателя
+        """
+        with self._lock:
+            # Задание могло завершиться после прошлой чистки и уже быть вытеснено
+            self._running = {k: i for k, i in self._running.items() if i in self._jobs and not self._jobs[i].finished}
+            if key in self._running:
+                job = self._jobs[self._running[key]]
+                job.sessions.add(session_id)
+                return job, False
+            # Случайный идентификатор: номер задания не угадать и не спутать с заданием другого процесса
+            job = factory(uuid.uuid4().hex)
+            job.sessions.add(session_id)
+            job.params = params
+            job.on_progress = self._publish
+            self._jobs[job.job_id] = job
+            self._running[key] = job.job_id
+            # Вытесняются самые старые завершенные задания
+            for old_id in [i for i, j in self._jobs.items() if j.finished][:max(0, len(self._jobs) - self.max_jobs)]:
+                del self._jobs[old_id]
+            return job, True
+
+    def get(self, job_id, session_id=None):
+        """Задание, если оно видно сессии session_id, иначе None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job if job is not None and session_id in job.sessions else None
+
+    def _publish(self, job):
+        publisher = self.publisher
+        if publisher is not None:
+            publisher(job)
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        curves = [curve for job in jobs if isinstance(job, SweepJob) for curve in job.curves]
+        return {
+            'jobs': len(jobs),
+            'running': sum(not job.finished for job in jobs),
+            # Кривые серий, ждущие свободного потока
+            'curves_queued': sum(not curve.started for curve in curves),
+        }
+
+
+EVALUATOR = IncrementalEvaluator()
+COALESCER = InFlightCoalescer()
+JOBS = JobRegistry(EVALUATOR)
+
+
+def calculate_results(request):
+    """
+    Расчет с объединением одинаковых одновременных запросов.
+    Возвращаемый DataFrame может быть общим для нескольких вызывающих - не изменять
+    """
+    return COALESCER.run(calculation_key(request), lambda: EVALUATOR.evaluate(request))
+
+
+@REGISTRY.register_collector
+def _collect_metrics():
+    """Статистика кэшей и очередей пути расчета дашборда (снимается при запросе /metrics)"""
+    evaluator, coalescer, jobs = EVALUATOR.stats(), COALESCER.stats(), JOBS.stats()
+    properties = saturation_properties.cache_info()
+    return [
+        ('dpdz_incremental_points_total', 'counter', "Точки инкрементального расчета по источнику",
+         [({'source': 'cache'}, evaluator['points_reused']), ({'source': 'solved'}, evaluator['points_solved'])]),
+        ('dpdz_incremental_models', 'gauge', "Наборы входных данных в кэше точек", [({}, evaluator['models'])]),
+        ('dpdz_coalesced_requests_total', 'counter', "Запросы, присоединенные к идущему расчету",
+         [({}, coalescer['coalesced'])]),
+        ('dpdz_requests_in_flight', 'gauge', "Идущие расчеты calculate_results", [({}, coalescer['in_flight'])]),
+        ('dpdz_jobs', 'gauge', "Фоновые задания расчета",
+         [({'state': 'running'}, jobs['running']), ({'state': 'stored'}, jobs['jobs'] - jobs['running'])]),
+        ('dpdz_job_curves_queued', 'gauge', "Кривые серий в очереди пула потоков", [({}, jobs['curves_queued'])]),
+        ('dpdz_property_cache_requests_total', 'counter', "Обращения к кэшу свойств насыщения",
+         [({'result': 'hit'}, properties.hits), ({'result': 'miss'}, properties.misses)]),
+        ('dpdz_property_cache_entries', 'gauge', "Записи кэша свойств насыщения", [({}, properties.currsize)]),
+    ]
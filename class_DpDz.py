@@ -1,10 +1,70 @@
+import functools
+
 import numpy as np
-from scipy import optimize
-import CoolProp.CoolProp as CP
+
+from lazy_import import lazy_module
+from properties import get_provider
+
+# SciPy optimize (и CoolProp в properties) загружаются при первом расчете, а не при импорте
+optimize = lazy_module('scipy.optimize')
+
+
+# Свойства фаз на линии насыщения (кэшируются по веществу и температуре)
+@functools.lru_cache(maxsize=4096)
+def saturation_properties(substance, T):
+    """
+    Возвращает (плотность жидкости, вязкость жидкости, плотность пара, вязкость пара)
+    при температуре насыщения T, °C
+    """
+    return tuple(float(v) for v in get_provider(substance).phase_properties(float(T)))
+
+
+# Поля результата calculate_one_point в порядке вывода
+RESULT_FIELDS = ('Substance', 'x', 'G', 'T',
+                 'Liquid density', 'Gas density', 'Lquid viscosity', 'Gas viscosity',
+                 'Simplex density', 'Simplex viscosity',
+                 'jl', 'jg', 'Re liquid', 'Re gas', 'fi', 'alpha', 'Pred', 'B', 'DpDz')
+
+# Поля, для которых нужна толщина пленки (решение уравнения)
+FILM_FIELDS = frozenset(('Re gas', 'fi', 'alpha', 'B', 'DpDz'))
+
+# Расчет каждого поля по калькулятору и точке (jg, jl, x, G, B); таблица строится один раз
+FIELD_VALUES = {
+    'Substance': lambda calc, jg, jl, x, G, B: calc.substance,
+    'x': lambda calc, jg, jl, x, G, B: x,
+    'G': lambda calc, jg, jl, x, G, B: G,
+    'T': lambda calc, jg, jl, x, G, B: calc.T,
+    'Liquid density': lambda calc, jg, jl, x, G, B: calc.liquid_density,
+    'Gas density': lambda calc, jg, jl, x, G, B: calc.gas_density,
+    'Lquid viscosity': lambda calc, jg, jl, x, G, B: calc.liquid_viscosity,
+    'Gas viscosity': lambda calc, jg, jl, x, G, B: calc.gas_viscosity,
+    'Simplex density': lambda calc, jg, jl, x, G, B: calc.simplex_density,
+    'Simplex viscosity': lambda calc, jg, jl, x, G, B: calc.simplex_viscosity,
+    'jl': lambda calc, jg, jl, x, G, B: jl,
+    'jg': lambda calc, jg, jl, x, G, B: jg,
+    'Re liquid': lambda calc, jg, jl, x, G, B: calc.Re_liquid(jl),
+    'Re gas': lambda calc, jg, jl, x, G, B: calc.RE0_gas(B, jg),
+    'fi': lambda calc, jg, jl, x, G, B: calc.Fi(B),
+    'alpha': lambda calc, jg, jl, x, G, B: calc.alpha(B),          # Расчет КТО
+    'Pred': lambda calc, jg, jl, x, G, B: calc.reduced_pressure,   # Приведенное давление
+    'B': lambda calc, jg, jl, x, G, B: B,
+    'DpDz': lambda calc, jg, jl, x, G, B: calc.calcDPDZ(B, jg, jl),  # Градиент давления
+}
+
+
+def check_fields(fields):
+    """Выбранные поля в порядке RESULT_FIELDS; None - все поля"""
+    if fields is None:
+        return RESULT_FIELDS
+    unknown = set(fields) - set(RESULT_FIELDS)
+    if unknown:
+        raise ValueError(f"Неизвестные поля результата: {', '.join(sorted(unknown))}")
+    return tuple(field for field in RESULT_FIELDS if field in fields)
+
 
 class DpDz():
 
-    def __init__(self, g, d, ki, thermodynamic_params: dict, value_fb: bool):
+    def __init__(self, g, d, ki, thermodynamic_params: dict, value_fb: bool, properties=None):
 
         self.g = g   # Ускорение свободного падения
         self.d = d  # Диаметр канала
@@ -22,6 +82,7 @@ class DpDz():
         self.x = thermodynamic_params.get('x', None)
         self.SV_liquid = thermodynamic_params.get('Liquid velocity', None)
         self.SV_gas = thermodynamic_params.get('Gas velocity', None)
+        self.properties = properties  # Источник свойств (properties.py), None - CoolProp по веществу
 
         if (self.liquid_density is not None) and (self.gas_density is not None):
             self.delta_density = self.liquid_density - self.gas_density
@@ -34,17 +95,12 @@ class DpDz():
     def check_values(self):
         if self.SV_liquid is None or self.SV_gas is None:
             if self.G is not None and self.x is not None:
-                if self.T is None:
+                if self.T is None and self.properties is None:
                     self.SV_liquid, self.SV_gas = self.phase_velocity_G_x()
                 else:
-                    self.liquid_density = CP.PropsSI('D', 'T', self.T + 273, 'Q', 0, self.substance)      # Плотность жидкости [kg/m³]
-                    mu_liq = CP.PropsSI('VISCOSITY', 'T', self.T + 273, 'Q', 0, self.substance)   # Вязкость жидкости [Pa·s]
-                    self.liquid_viscosity = mu_liq
-
-                    # Свойства пара (Q=1)
-                    self.gas_density = CP.PropsSI('D', 'T', self.T + 273, 'Q', 1, self.substance)         # Плотность пара [kg/m³]
-                    mu_gas = CP.PropsSI('VISCOSITY', 'T', self.T + 273, 'Q', 1, self.substance)      # Вязкость пара [Pa·s]
-                    self.gas_viscosity = mu_gas
+                    # Свойства жидкости и газа из источника свойств
+                    (self.liquid_density, self.liquid_viscosity,
+                     self.gas_density, self.gas_viscosity) = self.phase_properties()
 
                     self.simplex_density = self.gas_density / self.liquid_density
                     self.simplex_viscosity = self.gas_viscosity / self.liquid_viscosity
@@ -56,6 +112,16 @@ class DpDz():
                 print(f"G is None: {self.G is None}, X is None: {self.x is None}")
                 raise ValueError("Недостаточно данных для расчета скоростей фаз")
             
+    @property
+    def provider(self):
+        return self.properties if self.properties is not None else get_provider(self.substance)
+
+    def phase_properties(self):
+        if self.properties is None:
+            # Насыщение по CoolProp - через общий кэш
+            return saturation_properties(self.substance, self.T)
+        return tuple(float(v) for v in self.properties.phase_properties(self.T))
+
     def phase_velocity_G_x(self):
         """
         Расчет расходных скоростей фаз из массовой скорости
@@ -173,83 +239,154 @@ class DpDz():
         return sol.root
 
     def alpha(self, B):
-        lam = CP.PropsSI('CONDUCTIVITY', 'T', self.T + 273, 'Q', 0, self.substance)
+        # Свойства фаз заданы напрямую (без T): теплопроводность взять неоткуда
+        if self.T is None:
+            return np.nan
+        lam = float(self.provider.conductivity(self.T))
         a = lam / B
         return a
     
     @property
     def reduced_pressure(self):
-        P_crit = CP.PropsSI('Pcrit', self.substance)  # Критическое давление
-        P_sat = CP.PropsSI('P', 'T', self.T + 273, 'Q', 0, self.substance)  # Давление насыщения
-        return P_sat / P_crit  # Приведённое давление
+        if self.T is None:
+            return np.nan
+        return float(self.provider.reduced_pressure(self.T))  # Приведённое давление
 
     # Функция всех параметров в 1 точке 
-    def calculate_one_point(self, jg, jl, x, G):
-        params = (jg, jl)
-        # Расчет толщины пленки
-        B = self.calcOnePoint(params) 
-        
-        # Расчет градиента давления
-        dpdz = self.calcDPDZ(B, jg, jl) 
-        ReL = self.Re_liquid(jl)
-        ReG = self.RE0_gas(B, jg)
+    def calculate_one_point(self, jg, jl, x, G, fields=None, B=None):
+        """
+        fields - какие поля результата считать (по умолчанию RESULT_FIELDS).
+        Толщина пленки ищется только если она нужна выбранным полям;
+        B можно передать из сохраненного результата, тогда решатель не вызывается
+        """
+        fields = check_fields(fields)
 
-        # Расчет fi
-        fi = self.Fi(B)
+        # Расчет толщины пленки
+        if B is None and not FILM_FIELDS.isdisjoint(fields):
+            B = self.calcOnePoint((jg, jl))
 
-        # Расчет КТО
-        alph = self.alpha(B)
+        return {field: FIELD_VALUES[field](self, jg, jl, x, G, B) for field in fields}
 
-        # Расчет критического давления 
-        Pcrit = self.reduced_pressure
+    def complete_point(self, res, fields):
+        """Досчитывает поля для результата, где уже есть B, jg, jl, x и G"""
+        missing = [field for field in check_fields(fields) if field not in res]
+        return {**res, **self.calculate_one_point(res['jg'], res['jl'], res['x'], res['G'],
+                                                  fields=missing, B=res['B'])}
 
-        if self.flg_wb:
-            w_b = self.wb(B, jl)
-        else:
-            w_b = 0
-        
-        Res = {
-           'Substance': self.substance, 
-            'x': x,
-            'G': G,
-            'T': self.T,
-            'Liquid density': self.liquid_density,
-            'Gas density': self.gas_density,
-            'Lquid viscosity': self.liquid_viscosity,
-            'Gas viscosity': self.gas_viscosity,
-            'Simplex density':self.simplex_density,
-            'Simplex viscosity':self.simplex_viscosity,
-            'jl': jl,
-            'jg': jg,
-            'Re liquid': ReL,
-            'Re gas': ReG,
-            'fi': fi,
-            'alpha': alph,
-            'Pred': Pcrit,
-            'B': B,
-            'DpDz': dpdz
-        }
-        
-        return Res
-    
     # Итоговая функция расчета для всех данных точек 
-    def calculate(self):
+    def calculate(self, fields=None):
         Res = []
+        fields = check_fields(fields)
         
         # Проверяем, являются ли массивы одномерными
         if self.SV_gas.ndim == 1 and self.SV_liquid.ndim == 1:
             # Одномерный случай - параллельная обработка
             for jg, jl, x, g in zip(self.SV_gas, self.SV_liquid, self.x, self.G):
-                Res.append(self.calculate_one_point(jg, jl, x, g))
+                Res.append(self.calculate_one_point(jg, jl, x, g, fields))
         else:
             # Многомерный случай - вложенная обработка
             for arr_gas, arr_liquid in zip(self.SV_gas, self.SV_liquid):
                 res_row = []
                 for jg, jl, x, g in zip(arr_gas, arr_liquid, self.x, self.G):
-                    res_row.append(self.calculate_one_point(jg, jl, x, g))
+                    res_row.append(self.calculate_one_point(jg, jl, x, g, fields))
                 Res.append(res_row)
         
         # Распаковка единичного результата
         return Res[0] if len(Res) == 1 else Res
     
     
+
+
+class CompactDpDz():
+    """
+    Компактный вариант DpDz для расчетов в цикле.
+
+    Геометрия и настройки задаются один раз в конструкторе, вещество с
+    температурой и рабочие точки подменяются методами set_state и set_points
+    без создания нового объекта. Атрибуты хранятся в __slots__, формулы
+    модели те же, что в DpDz.
+
+        calc = CompactDpDz(g=9.81, d=0.00142, ki=None)
+        for G in (300, 400, 500):
+            res = calc.set_state('CO2', -10).set_points(G, x).calculate()
+    """
+
+    __slots__ = ('g', 'd', 'ki', 's', 'flg_wb',
+                 'substance', 'T', 'P',
+                 'liquid_density', 'liquid_viscosity', 'gas_density', 'gas_viscosity',
+                 'delta_density', 'simplex_density', 'simplex_viscosity',
+                 'G', 'x', 'SV_liquid', 'SV_gas', 'properties', '_points')
+
+    def __init__(self, g, d, ki, value_fb: bool = False, properties=None):
+        self.g = g
+        self.d = d
+        self.ki: int | None = ki
+        self.s = np.pi * (self.d / 2) ** 2
+        self.flg_wb = value_fb
+        self.substance = self.T = self.P = None
+        self.liquid_density = self.liquid_viscosity = None
+        self.gas_density = self.gas_viscosity = None
+        self.delta_density = self.simplex_density = self.simplex_viscosity = None
+        self.G = self.x = self.SV_liquid = self.SV_gas = None
+        self.properties = properties
+        self._points = None
+
+    def set_state(self, substance, T):
+        """Вещество и температура T, °C; свойства фаз берутся из источника свойств"""
+        if (substance, T) != (self.substance, self.T):
+            self.substance = substance
+            self.T = T
+            self._apply_properties(*self.phase_properties())
+        return self
+
+    def set_properties(self, liquid_density, liquid_viscosity, gas_density, gas_viscosity):
+        """Свойства фаз, заданные напрямую (без CoolProp)"""
+        # Свойства больше не соответствуют (вещество, T): следующий set_state пересчитает их
+        self.substance = self.T = None
+        return self._apply_properties(liquid_density, liquid_viscosity, gas_density, gas_viscosity)
+
+    def _apply_properties(self, liquid_density, liquid_viscosity, gas_density, gas_viscosity):
+        self.liquid_density = liquid_density
+        self.liquid_viscosity = liquid_viscosity
+        self.gas_density = gas_density
+        self.gas_viscosity = gas_viscosity
+        self.delta_density = liquid_density - gas_density
+        self.simplex_density = gas_density / liquid_density
+        self.simplex_viscosity = gas_viscosity / liquid_viscosity
+        # Скорости фаз зависят от плотностей, их нужно пересчитать
+        if self._points is not None:
+            self.set_points(*self._points)
+        return self
+
+    def set_points(self, G, x):
+        """Рабочие точки: массовая скорость G и паросодержание x (скаляры или массивы)"""
+        self._points = (G, x)
+        self.G = G
+        self.x = x
+        # До set_state скорости не считаются, их пересчитает set_properties
+        if self.liquid_density is not None:
+            self.SV_liquid, self.SV_gas, self.G = self.phase_velocity_G_x()
+        return self
+
+    # Формулы модели общие с DpDz
+    provider = DpDz.provider
+    phase_properties = DpDz.phase_properties
+    phase_velocity_G_x = DpDz.phase_velocity_G_x
+    Re_liquid = DpDz.Re_liquid
+    Ec = DpDz.Ec
+    Di = DpDz.Di
+    Fi = DpDz.Fi
+    RE0_gas = DpDz.RE0_gas
+    E0 = DpDz.E0
+    Ei = DpDz.Ei
+    Tc = DpDz.Tc
+    wb = DpDz.wb
+    Ti = DpDz.Ti
+    calcDPDZ = DpDz.calcDPDZ
+    equation = DpDz.equation
+    calcOnePoint = DpDz.calcOnePoint
+    alpha = DpDz.alpha
+    reduced_pressure = DpDz.reduced_pressure
+    calculate_one_point = DpDz.calculate_one_point
+    complete_point = DpDz.complete_point
+    calculate = DpDz.calculate
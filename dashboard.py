@@ -1,21 +1,50 @@
 import dash
-from dash import dcc, html, dash_table, Input, Output, callback, State
-import pandas as pd
+from dash import dcc, html, dash_table, Input, Output, Patch, callback, State, ctx
 import os
-import plotly.express as px
 from dash.dash import no_update
+import datetime
+import functools
+import time
 import numpy as np
-from class_DpDz import DpDz  # Импортируем класс для расчетов
+from flask import Response, abort, stream_with_context
+from calculation import JOBS, done_indices, parse_values, sweep_requests  # Фоновый расчет через класс DpDz
+from class_DpDz import RESULT_FIELDS
+from result_store import DiskResultStore, make_result_store, new_session_id, valid_session_id
+from result_export import EXPORT_FORMATS, generate_filename, stream_export
+from api import register_api
+from metrics import REGISTRY, register_metrics, timed_callback
+from tiles import FIELDS as MAP_FIELDS, TILE_CACHE
+from tracing import record_exception, register_tracing, span, traced
+from lazy_import import lazy_module
 
-# Инициализация приложения
-app = dash.Dash(__name__)
+# Тяжелые библиотеки загружаются при первом использовании
+pd = lazy_module('pandas')
+px = lazy_module('plotly.express')
+go = lazy_module('plotly.graph_objects')
 
-# Отключаем окно с ошибками в режиме разработки
-app.config.suppress_callback_exceptions = True
+# Приложение создается фабрикой create_app при первом обращении (см. get_app)
+_app = None
 
 # Конфигурация путей
 DATA_DIR = 'Results'
 
+# Серверное хранилище результатов расчета (в браузер уходит только идентификатор).
+# При заданной DPDZ_RESULT_DIR хранилище дисковое и общее для всех рабочих процессов
+RESULT_STORE = make_result_store()
+
+# Подписи кнопок экспорта
+EXPORT_LABELS = {
+    'csv': 'CSV',
+    'parquet': 'Parquet',
+    'xlsx': 'Excel',
+}
+
+# Период опроса фонового расчета, мс
+PROGRESS_INTERVAL_MS = 300
+
+# Сколько, с, опрос ждет первого снимка задания, которого не видно из этого процесса
+JOB_VISIBILITY_GRACE = 15
+
 # Словарь с размерностями
 DIMENSIONS = {
     'jg': 'm/s',
@@ -134,7 +163,7 @@ CALC_STYLES = {
 }
 
 # Функция для создания параметра с полем ввода
-def create_input_param(param_id, label_text, input_type='number', placeholder_text='', value=None):
+def create_input_param(param_id, label_text, input_type='number', placeholder_text='', value=None, multi=False):
     """Создает параметр с полем ввода"""
     if input_type == 'dropdown':
         return html.Div([
@@ -143,6 +172,7 @@ def create_input_param(param_id, label_text, input_type='number', placeholder_te
                 id=param_id,
                 options=[{'label': s, 'value': s} for s in get_substances()],
                 placeholder=placeholder_text,
+                multi=multi,
                 style=CALC_STYLES['dropdown']
             ),
         ], style=CALC_STYLES['param_container'])
@@ -219,96 +249,124 @@ def format_mode_value(param, value):
         return f"{value} {DIMENSIONS[param]}"
     return str(value)
 
-# Базовая структура приложения
-app.layout = html.Div([
-    html.Div([
-        html.H1("Исследование гидродинамических характеристик", 
-                style={
-                    'textAlign': 'center', 
-                    'marginBottom': 30,
-                    'color': COLORS['text'],
-                    'fontWeight': '600',
-                    'fontSize': '2.2rem',
-                    'padding': '15px 0',
-                    'borderBottom': f"1px solid {COLORS['border']}",
-                    'textShadow': '0 2px 10px rgba(0, 0, 0, 0.3)',
-                }),
+# Базовая структура приложения (строится при каждой загрузке страницы)
+def serve_layout():
+    return html.Div([
+        # Идентификатор сессии и ссылка на последний результат расчета (сами данные на сервере)
+        dcc.Store(id='session-id-store', storage_type='session'),
+        dcc.Store(id='calculation-data-store'),
         
-        # Вкладки для переключения между страницами
-        dcc.Tabs(id="app-tabs", value='tab-analysis', children=[
-            dcc.Tab(
-                label='Анализ данных',
-                value='tab-analysis',
-                style={
-                    'backgroundColor': COLORS['tab_background'],
-                    'color': COLORS['text_secondary'],
-                    'border': COLORS['tab_border'],
-                    'padding': '12px 24px',
-                    'fontWeight': '500',
-                    'borderRadius': '8px 8px 0 0',
-                    'marginRight': '5px'
-                },
-                selected_style={
-                    'backgroundColor': COLORS['card_background'],
-                    'color': COLORS['text'],
-                    'borderBottom': f"3px solid {COLORS['tab_selected']}",
-                    'padding': '12px 24px',
-                    'fontWeight': '600',
-                    'borderRadius': '8px 8px 0 0',
-                    'marginRight': '5px'
-                }
-            ),
-            dcc.Tab(
-                label='Интерактивный расчет',
-                value='tab-calculator',
-                style={
-                    'backgroundColor': COLORS['tab_background'],
-                    'color': COLORS['text_secondary'],
-                    'border': COLORS['tab_border'],
-                    'padding': '12px 24px',
-                    'fontWeight': '500',
-                    'borderRadius': '8px 8px 0 0',
-                    'marginLeft': '5px'
-                },
-                selected_style={
-                    'backgroundColor': COLORS['card_background'],
-                    'color': COLORS['text'],
-                    'borderBottom': f"3px solid {COLORS['tab_selected']}",
-                    'padding': '12px 24px',
-                    'fontWeight': '600',
-                    'borderRadius': '8px 8px 0 0',
-                    'marginLeft': '5px'
-                }
-            ),
+        html.Div([
+            html.H1("Исследование гидродинамических характеристик", 
+                    style={
+                        'textAlign': 'center', 
+                        'marginBottom': 30,
+                        'color': COLORS['text'],
+                        'fontWeight': '600',
+                        'fontSize': '2.2rem',
+                        'padding': '15px 0',
+                        'borderBottom': f"1px solid {COLORS['border']}",
+                        'textShadow': '0 2px 10px rgba(0, 0, 0, 0.3)',
+                    }),
+            
+            # Вкладки для переключения между страницами
+            dcc.Tabs(id="app-tabs", value='tab-analysis', children=[
+                dcc.Tab(
+                    label='Анализ данных',
+                    value='tab-analysis',
+                    style={
+                        'backgroundColor': COLORS['tab_background'],
+                        'color': COLORS['text_secondary'],
+                        'border': COLORS['tab_border'],
+                        'padding': '12px 24px',
+                        'fontWeight': '500',
+                        'borderRadius': '8px 8px 0 0',
+                        'marginRight': '5px'
+                    },
+                    selected_style={
+                        'backgroundColor': COLORS['card_background'],
+                        'color': COLORS['text'],
+                        'borderBottom': f"3px solid {COLORS['tab_selected']}",
+                        'padding': '12px 24px',
+                        'fontWeight': '600',
+                        'borderRadius': '8px 8px 0 0',
+                        'marginRight': '5px'
+                    }
+                ),
+                dcc.Tab(
+                    label='Интерактивный расчет',
+                    value='tab-calculator',
+                    style={
+                        'backgroundColor': COLORS['tab_background'],
+                        'color': COLORS['text_secondary'],
+                        'border': COLORS['tab_border'],
+                        'padding': '12px 24px',
+                        'fontWeight': '500',
+                        'borderRadius': '8px 8px 0 0',
+                        'marginLeft': '5px'
+                    },
+                    selected_style={
+                        'backgroundColor': COLORS['card_background'],
+                        'color': COLORS['text'],
+                        'borderBottom': f"3px solid {COLORS['tab_selected']}",
+                        'padding': '12px 24px',
+                        'fontWeight': '600',
+                        'borderRadius': '8px 8px 0 0',
+                        'marginLeft': '5px'
+                    }
+                ),
+                dcc.Tab(
+                    label='Карта DpDz',
+                    value='tab-map',
+                    style={
+                        'backgroundColor': COLORS['tab_background'],
+                        'color': COLORS['text_secondary'],
+                        'border': COLORS['tab_border'],
+                        'padding': '12px 24px',
+                        'fontWeight': '500',
+                        'borderRadius': '8px 8px 0 0',
+                        'marginLeft': '5px'
+                    },
+                    selected_style={
+                        'backgroundColor': COLORS['card_background'],
+                        'color': COLORS['text'],
+                        'borderBottom': f"3px solid {COLORS['tab_selected']}",
+                        'padding': '12px 24px',
+                        'fontWeight': '600',
+                        'borderRadius': '8px 8px 0 0',
+                        'marginLeft': '5px'
+                    }
+                ),
+            ], style={
+                'marginBottom': '30px',
+                'borderBottom': 'none'
+            }),
+            
+            # Контент вкладок
+            html.Div(id='tab-content')
         ], style={
-            'marginBottom': '30px',
-            'borderBottom': 'none'
-        }),
-        
-        # Контент вкладок
-        html.Div(id='tab-content')
+            'backgroundColor': COLORS['background'],
+            'minHeight': '100vh',
+            'padding': '30px',
+            'fontFamily': '"Segoe UI", "Inter", -apple-system, BlinkMacSystemFont, sans-serif',
+            'backgroundImage': 'radial-gradient(circle at 10% 20%, rgba(15, 15, 26, 0.8) 0%, rgba(10, 10, 20, 1) 100%)',
+            'color': COLORS['text'],
+            'margin': '0',
+            'width': '100%'
+        })
     ], style={
-        'backgroundColor': COLORS['background'],
-        'minHeight': '100vh',
-        'padding': '30px',
-        'fontFamily': '"Segoe UI", "Inter", -apple-system, BlinkMacSystemFont, sans-serif',
-        'backgroundImage': 'radial-gradient(circle at 10% 20%, rgba(15, 15, 26, 0.8) 0%, rgba(10, 10, 20, 1) 100%)',
-        'color': COLORS['text'],
         'margin': '0',
-        'width': '100%'
+        'padding': '0',
+        'width': '100%',
+        'backgroundColor': COLORS['background']
     })
-], style={
-    'margin': '0',
-    'padding': '0',
-    'width': '100%',
-    'backgroundColor': COLORS['background']
-})
 
 # Callback для переключения между вкладками
-@app.callback(
+@callback(
     Output('tab-content', 'children'),
     Input('app-tabs', 'value')
 )
+@timed_callback
 def render_tab_content(tab):
     if tab == 'tab-analysis':
         return html.Div([
@@ -569,9 +627,10 @@ def render_tab_content(tab):
                         # Вещество
                         create_input_param(
                             'substance-calc-dropdown',
-                            'Вещество',
+                            'Вещество (можно несколько)',
                             'dropdown',
-                            'Выберите вещество'
+                            'Выберите вещество',
+                            multi=True
                         ),
                         
                         # Диаметр
@@ -586,16 +645,16 @@ def render_tab_content(tab):
                         create_input_param(
                             'G-input',
                             'Массовый расход (G), кг/м²с',
-                            'number',
-                            'Введите расход'
+                            'text',
+                            '300, список 300, 500 или диапазон 300:600:4'
                         ),
                         
                         # Температура
                         create_input_param(
                             'T-input',
                             'Температура (T), °C',
-                            'number',
-                            'Введите температуру'
+                            'text',
+                            '-10, список -10, 0 или диапазон -20:0:3'
                         ),
                         
                         # Ускорение свободного падения (теперь обязательный параметр)
@@ -779,22 +838,346 @@ def render_tab_content(tab):
                 })
             ])
         ])
+    
+    elif tab == 'tab-map':
+        return build_map_layout()
+
+# Разметка вкладки карты: параметры плоскости и график из тайлов
+def build_map_layout():
+    substances = get_substances()
+    control = {'width': '13%', 'display': 'inline-block', 'padding': '10px', 'verticalAlign': 'top',
+               'textAlign': 'center'}
+    label = {**CALC_STYLES['label'], 'marginBottom': '8px'}
+    field_input = {**CALC_STYLES['input'], 'width': '100%'}
+    return html.Div([
+        html.Div([
+            html.Div([
+                html.Label("Вещество", style=label),
+                dcc.Dropdown(id='map-substance-dropdown', options=[{'label': s, 'value': s} for s in substances],
+                             value=substances[0] if substances else None, clearable=False),
+            ], style=control),
+            html.Div([
+                html.Label("Диаметр (d), м", style=label),
+                dcc.Input(id='map-d-input', type='number', value=0.00142, debounce=True, style=field_input),
+            ], style=control),
+            html.Div([
+                html.Label("ki (необязательно)", style=label),
+                dcc.Input(id='map-ki-input', type='number', debounce=True, style=field_input),
+            ], style=control),
+            html.Div([
+                html.Label("Плоскость", style=label),
+                dcc.RadioItems(id='map-plane-radio', value='G', options=[
+                    {'label': ' x - G', 'value': 'G'},
+                    {'label': ' x - T', 'value': 'T'},
+                ], style={'color': COLORS['text']}),
+            ], style=control),
+            # Фиксированные параметры плоскостей: T для x - G, G для x - T
+            html.Div([
+                html.Label("T, °C (x - G)", style=label),
+                dcc.Input(id='map-T-input', type='number', value=-10, debounce=True, style=field_input),
+                html.Label("G, кг/м²с (x - T)", style={**label, 'marginTop': '8px'}),
+                dcc.Input(id='map-G-input', type='number', value=300, min=0, debounce=True, style=field_input),
+            ], style=control),
+            html.Div([
+                html.Label("Величина", style=label),
+                dcc.Dropdown(id='map-field-dropdown', options=[{'label': f, 'value': f} for f in MAP_FIELDS],
+                             value='DpDz', clearable=False),
+            ], style=control),
+            html.Div([
+                html.Label("Вид", style=label),
+                dcc.RadioItems(id='map-kind-radio', value='heatmap', options=[
+                    {'label': ' Тепловая карта', 'value': 'heatmap'},
+                    {'label': ' Изолинии', 'value': 'contour'},
+                ], style={'color': COLORS['text']}),
+            ], style=control),
+        ], style={
+            'backgroundColor': COLORS['card_background'],
+            'borderRadius': '12px',
+            'boxShadow': COLORS['card_shadow'],
+            'border': COLORS['card_border'],
+            'marginBottom': '20px',
+            'padding': '10px',
+        }),
+        html.Div([
+            dcc.Graph(id='map-plot', style={'height': '680px'}),
+            html.Div(id='map-info', style={'textAlign': 'center', 'color': COLORS['text_secondary'],
+                                           'fontSize': '12px'}),
+        ], style={
+            'backgroundColor': COLORS['card_background'],
+            'borderRadius': '12px',
+            'boxShadow': COLORS['card_shadow'],
+            'border': COLORS['card_border'],
+            'padding': '20px',
+        }),
+        dcc.Store(id='map-view-store'),
+    ])
+
+# Границы окна из relayoutData графика; None - вся плоскость
+def relayout_ranges(relayout, previous):
+    ranges = dict(previous or {})
+    for axis in ('xaxis', 'yaxis'):
+        if relayout.get(f'{axis}.autorange'):
+            ranges.pop(axis, None)
+        elif f'{axis}.range[0]' in relayout:
+            ranges[axis] = [relayout[f'{axis}.range[0]'], relayout[f'{axis}.range[1]']]
+        elif f'{axis}.range' in relayout:
+            ranges[axis] = list(relayout[f'{axis}.range'])
+    return ranges
+
+# График карты: тепловая карта или изолинии
+def build_map_figure(view, field, plane, kind, title, revision):
+    trace = go.Contour if kind == 'contour' else go.Heatmap
+    unit = DIMENSIONS.get(field, '')
+    fig = go.Figure(trace(x=view['x'], y=view['y'], z=view['fields'][field], colorscale='Viridis',
+                          colorbar=dict(title=dict(text=f"{field}, {unit}" if unit else field,
+                                                   font=dict(color=COLORS['text'])),
+                                        tickfont=dict(color=COLORS['text_secondary'])),
+                          hovertemplate=f"x: %{{x:.3f}}<br>{plane}: %{{y:.4g}}<br>{field}: %{{z:.4g}}<extra></extra>"))
+    axis_style = dict(gridcolor=COLORS['grid_lines'], linecolor=COLORS['border'],
+                      title_font=dict(size=14, color=COLORS['text']),
+                      tickfont=dict(size=12, color=COLORS['text_secondary']))
+    fig.update_layout(
+        title=title,
+        title_x=0.5,
+        xaxis=dict(title="Паросодержание, x", **axis_style),
+        yaxis=dict(title=PARAM_DISPLAY_NAMES.get(plane, plane), **axis_style),
+        plot_bgcolor=COLORS['card_background'],
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color=COLORS['text'], size=13),
+        margin=dict(l=70, r=40, t=80, b=60),
+        # Масштаб сохраняется, пока не изменены параметры плоскости
+        uirevision=revision,
+    )
+    return fig
+
+# Callback карты: при смене параметров - вся плоскость, при масштабировании - тайлы окна
+@callback(
+    [Output('map-plot', 'figure'),
+     Output('map-info', 'children'),
+     Output('map-view-store', 'data')],
+    [Input('map-substance-dropdown', 'value'),
+     Input('map-d-input', 'value'),
+     Input('map-ki-input', 'value'),
+     Input('map-plane-radio', 'value'),
+     Input('map-T-input', 'value'),
+     Input('map-G-input', 'value'),
+     Input('map-field-dropdown', 'value'),
+     Input('map-kind-radio', 'value'),
+     Input('map-plot', 'relayoutData')],
+    State('map-view-store', 'data')
+)
+@timed_callback
+def update_map(substance, d, ki, plane, T, G, field, kind, relayout, view_state):
+    fixed = T if plane == 'G' else G
+    if not substance or not d or fixed is None:
+        return no_update, "Заполните вещество, диаметр и фиксированное значение", no_update
+    if plane == 'T' and fixed <= 0:
+        return no_update, "Массовый расход G должен быть больше нуля", no_update
+    
+    revision = f"{substance}|{d}|{ki}|{plane}|{fixed}"
+    ranges = {}
+    if ctx.triggered_id == 'map-plot' and relayout and view_state and view_state.get('revision') == revision:
+        ranges = relayout_ranges(relayout, view_state.get('ranges'))
+    elif view_state and view_state.get('revision') == revision:
+        # Смена величины или вида карты не сбрасывает окно
+        ranges = view_state.get('ranges') or {}
+    
+    try:
+        view = TILE_CACHE.view(substance, d, ki, plane, fixed, ranges.get('xaxis'), ranges.get('yaxis'))
+    except Exception as e:
+        return no_update, f"Ошибка расчета карты: {e}", no_update
+    
+    fixed_label = f"T={fixed} °C" if plane == 'G' else f"G={fixed} кг/м²с"
+    title = f"{field}: {substance}, d={d} м, {fixed_label}"
+    stats = TILE_CACHE.stats()
+    info = (f"Уровень {view['zoom']}, тайлов в окне: {view['tiles']}, в кэше: {stats['tiles']}, "
+            f"попаданий в кэш: {stats['hit_rate']:.0%}")
+    return (build_map_figure(view, field, plane, kind, title, revision), info,
+            {'revision': revision, 'ranges': ranges})
 
 # Callback для показа/скрытия дополнительных параметров
-@app.callback(
+@callback(
     Output('advanced-params', 'style'),
     Input('toggle-advanced-button', 'n_clicks'),
     State('advanced-params', 'style')
 )
+@timed_callback
 def toggle_advanced_params(n_clicks, current_style):
     if n_clicks % 2 == 1:
         return {**current_style, 'display': 'block'}
     else:
         return {**current_style, 'display': 'none'}
 
+# Стили строк таблицы результатов расчета
+TABLE_STYLE_CONDITIONAL = [
+    {
+        'if': {'state': 'selected'},
+        'backgroundColor': COLORS['hover'],
+        'border': f"2px solid {COLORS['primary']}"
+    },
+    {
+        'if': {'column_id': '№'},
+        'fontWeight': '600',
+        'color': COLORS['primary'],
+        'backgroundColor': COLORS['table_header']
+    },
+    {
+        'if': {'row_index': 'odd'},
+        'backgroundColor': COLORS['table_odd']
+    },
+    {
+        'if': {'row_index': 'even'},
+        'backgroundColor': COLORS['table_even']
+    }
+]
+
+# Колонки таблицы результатов с размерностями
+def table_columns(fields):
+    columns = [{"name": "№", "id": "№"}]
+    for col in fields:
+        if col in DIMENSIONS and DIMENSIONS[col]:
+            columns.append({"name": f"{col} ({DIMENSIONS[col]})", "id": col})
+        else:
+            columns.append({"name": col, "id": col})
+    return columns
+
+# Строки таблицы: нумерация и округление чисел
+def table_records(results_df, numbers=None):
+    """Строки таблицы; numbers - номера строк (по умолчанию 1, 2, ...)"""
+    display_df = results_df.copy()
+    display_df.insert(0, '№', range(1, len(display_df) + 1) if numbers is None else [int(n) for n in numbers])
+    for col in display_df.columns:
+        if col != '№' and col != 'Substance':
+            if display_df[col].dtype in [np.float64, np.float32]:
+                display_df[col] = display_df[col].round(6)
+    return display_df.to_dict('records')
+
+# Строка хода фонового расчета (для серии - и ход каждой кривой)
+def format_progress(state):
+    if state['finished']:
+        text, color = f"Расчет завершен: {state['done']} точек", COLORS['success']
+    else:
+        text, color = f"Идет расчет: {state['done']} из {state['total']} точек", COLORS['warning']
+    lines = [html.P(text, style={'textAlign': 'center', 'color': color, 'fontWeight': '600'})]
+    if state['error']:
+        lines.append(html.P(f"Произошла ошибка при выполнении расчета: {state['error']}",
+                            style={'textAlign': 'center', 'color': COLORS['error']}))
+    if len(state.get('curves', ())) > 1:
+        curves = [
+            html.Li(f"{curve['curve']}: {curve['done']}/{curve['total']}" + (" ✓" if curve['finished'] else ""),
+                    style={'color': COLORS['success'] if curve['finished'] else COLORS['text_secondary']})
+            for curve in state['curves']
+        ]
+        lines.append(html.Ul(curves, style={
+            'columns': '3', 'fontSize': '12px', 'textAlign': 'left', 'margin': '0 auto', 'maxWidth': '900px'
+        }))
+    return html.Div(lines)
+
+# Ссылки для экспорта результатов (файл формируется на сервере потоково)
+def build_export_links(session_id, run_id):
+    return [
+        html.A(
+            f'Экспорт в {EXPORT_LABELS[fmt]}',
+            href=f'/export/{session_id}/{run_id}.{fmt}',
+            style={
+                'width': '20%',
+                'padding': '12px',
+                'borderRadius': '8px',
+                'border': 'none',
+                'backgroundColor': COLORS['success'],
+                'color': COLORS['text'],
+                'fontSize': '14px',
+                'fontWeight': '600',
+                'cursor': 'pointer',
+                'transition': 'all 0.3s ease',
+                'margin': '20px 10px 0',
+                'display': 'inline-block',
+                'textDecoration': 'none'
+            }
+        ) for fmt in EXPORT_FORMATS
+    ]
+
+# Функция построения графика результатов интерактивного расчета
+@traced('figure')
+def build_calculation_figure(results_df, y_axis, substance, G, d, T):
+    try:
+        if y_axis == 'DpDz':
+            title = "Зависимость градиента давления от паросодержания"
+            y_title = "Градиент давления, DpDz (Па/м)"
+            hover = "<b>x:</b> %{x:.3f}<br><b>DpDz:</b> %{y:.1f} Па/м<extra></extra>"
+        else:
+            title = f"{format_column_name(y_axis)} vs x"
+            y_title = format_column_name(y_axis)
+            hover = f"<b>x:</b> %{{x:.3f}}<br><b>{y_axis}:</b> %{{y}}<extra></extra>"
+        
+        # Несколько кривых серии - каждая своим цветом
+        multi_curve = 'curve' in results_df and results_df['curve'].nunique() > 1
+        fig = px.line(results_df, x='x', y=y_axis, color='curve' if multi_curve else None,
+                     title=f"{title}<br>{substance} (G={G} кг/м²с, d={d} м, T={T}°C)")
+        
+        fig.update_layout(
+            xaxis_title="Паросодержание, x",
+            yaxis_title=y_title,
+            title_x=0.5,
+            height=500,
+            margin=dict(l=60, r=40, t=80, b=60),
+            plot_bgcolor=COLORS['card_background'],
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color=COLORS['text'], size=13),
+            title_font_size=16,
+            title_font_color=COLORS['text'],
+            xaxis=dict(
+                gridcolor=COLORS['grid_lines'],
+                linecolor=COLORS['border'],
+                zerolinecolor=COLORS['border'],
+                title_font=dict(size=14, color=COLORS['text']),
+                tickfont=dict(size=12, color=COLORS['text_secondary']),
+                showgrid=True,
+                gridwidth=1,
+                linewidth=1
+            ),
+            yaxis=dict(
+                gridcolor=COLORS['grid_lines'],
+                linecolor=COLORS['border'],
+                zerolinecolor=COLORS['border'],
+                title_font=dict(size=14, color=COLORS['text']),
+                tickfont=dict(size=12, color=COLORS['text_secondary']),
+                showgrid=True,
+                gridwidth=1,
+                linewidth=1
+            ),
+            hoverlabel=dict(
+                bgcolor=COLORS['dropdown_bg'],
+                font_size=12,
+                font_family="Arial",
+                font_color=COLORS['text']
+            )
+        )
+        
+        # Стилизация линии графика
+        if multi_curve:
+            fig.update_traces(mode='lines+markers', line=dict(width=2), marker=dict(size=4),
+                              hovertemplate="%{fullData.name}<br>" + hover)
+            fig.update_layout(legend=dict(title_text='', font=dict(color=COLORS['text'])))
+        else:
+            fig.update_traces(
+                mode='lines+markers',
+                line=dict(width=2.5, color=COLORS['primary']),
+                marker=dict(size=4, color=COLORS['accent']),
+                hovertemplate=hover
+            )
+        
+    except Exception as e:
+        fig = px.line(title="Ошибка построения графика")
+        record_exception(e, "Error creating plot")
+    
+    return fig
+
 # Callback для выполнения расчета - ОБНОВЛЕННАЯ ВЕРСИЯ С ИСПОЛЬЗОВАНИЕМ КЛАССА DpDz
-@app.callback(
-    Output('calculation-results', 'children'),
+@callback(
+    [Output('calculation-results', 'children'),
+     Output('calculation-data-store', 'data'),
+     Output('session-id-store', 'data')],
     Input('calculate-button', 'n_clicks'),
     [State('substance-calc-dropdown', 'value'),
      State('d-input', 'value'),
@@ -811,14 +1194,16 @@ def toggle_advanced_params(n_clicks, current_style):
      State('gas-density-input', 'value'),
      State('gas-viscosity-input', 'value'),
      State('SV-liquid-input', 'value'),
-     State('SV-gas-input', 'value')]
+     State('SV-gas-input', 'value'),
+     State('session-id-store', 'data')]
 )
+@timed_callback
 def perform_calculation(n_clicks, substance, d, G, T, g, num_points, x_start, x_end, P, ki, 
                        liquid_density, liquid_viscosity, gas_density, gas_viscosity, 
-                       SV_liquid, SV_gas):
+                       SV_liquid, SV_gas, session_id):
     if n_clicks == 0:
         return html.P("Введите параметры и нажмите 'Выполнить расчет'", 
-                     style={'textAlign': 'center', 'color': COLORS['text_secondary']})
+                     style={'textAlign': 'center', 'color': COLORS['text_secondary']}), no_update, no_update
     
     # Проверка обязательных полей
     required_fields = {
@@ -830,14 +1215,14 @@ def perform_calculation(n_clicks, substance, d, G, T, g, num_points, x_start, x_
         'количество точек расчета': num_points
     }
     
-    missing_fields = [name for name, value in required_fields.items() if value is None or value == '']
+    missing_fields = [name for name, value in required_fields.items() if value is None or value in ('', [])]
     
     if missing_fields:
         return html.Div([
             html.H4("Ошибка", style={'color': COLORS['error'], 'textAlign': 'center'}),
             html.P(f"Заполните все обязательные параметры: {', '.join(missing_fields)}",
                   style={'textAlign': 'center', 'color': COLORS['text_secondary']})
-        ])
+        ]), no_update, no_update
     
     # Проверка количества точек
     if num_points < 2:
@@ -845,7 +1230,7 @@ def perform_calculation(n_clicks, substance, d, G, T, g, num_points, x_start, x_
             html.H4("Ошибка", style={'color': COLORS['error'], 'textAlign': 'center'}),
             html.P("Количество точек расчета должно быть целым числом больше 1",
                   style={'textAlign': 'center', 'color': COLORS['text_secondary']})
-        ])
+        ]), no_update, no_update
     
     # Проверка диапазона паросодержания
     if x_start is None or x_end is None:
@@ -853,159 +1238,55 @@ def perform_calculation(n_clicks, substance, d, G, T, g, num_points, x_start, x_
             html.H4("Ошибка", style={'color': COLORS['error'], 'textAlign': 'center'}),
             html.P("Заполните диапазон паросодержания",
                   style={'textAlign': 'center', 'color': COLORS['text_secondary']})
-        ])
+        ]), no_update, no_update
     
+    # Каждое сочетание вещества, G и T - отдельная кривая
+    substances = substance if isinstance(substance, list) else [substance]
     try:
-        # Создаем диапазон значений x
-        x_values = np.linspace(x_start, x_end, num_points)
-        
-        # Подготавливаем параметры для расчета
-        thermodynamic_params = {
-            'Substance': substance,
-            'Temperature': T,
-            'G': G,
-            'x': x_values
-        }
-        
-        # Добавляем опциональные параметры, если они заданы
-        if P is not None:
-            thermodynamic_params['Pressure'] = P
-        if liquid_density is not None:
-            thermodynamic_params['Liquid density'] = liquid_density
-        if liquid_viscosity is not None:
-            thermodynamic_params['Liquid viscosity'] = liquid_viscosity
-        if gas_density is not None:
-            thermodynamic_params['Gas density'] = gas_density
-        if gas_viscosity is not None:
-            thermodynamic_params['Gas viscosity'] = gas_viscosity
-        if SV_liquid is not None:
-            thermodynamic_params['Liquid velocity'] = SV_liquid
-        if SV_gas is not None:
-            thermodynamic_params['Gas velocity'] = SV_gas
-        
-        # Создаем экземпляр класса DpDz и выполняем расчет
-        # value_fb = True - учитывать скорость на границе раздела фаз
-        calculator = DpDz(g=g, d=d, ki=ki, thermodinamic_params=thermodynamic_params, value_fb=True)
-        results = calculator.calculate()
-        
-        # Преобразуем результаты в DataFrame
-        if isinstance(results, list):
-            # Если результат - список словарей
-            results_df = pd.DataFrame(results)
-        else:
-            # Если результат - одиночный словарь
-            results_df = pd.DataFrame([results])
-        
-        # Убеждаемся, что все необходимые колонки присутствуют
-        required_columns = ['x', 'DpDz']
-        for col in required_columns:
-            if col not in results_df.columns:
-                results_df[col] = np.nan
-        
-    except Exception as e:
+        with span('validate') as validate_span:
+            G_values = parse_values(G, positive=True)
+            T_values = parse_values(T)
+            # value_fb = True - учитывать скорость на границе раздела фаз
+            requests = sweep_requests({
+                'd': d,
+                'g': g,
+                'ki': ki,
+                'num_points': num_points,
+                'x_start': x_start,
+                'x_end': x_end,
+                'P': P,
+                'liquid_density': liquid_density,
+                'liquid_viscosity': liquid_viscosity,
+                'gas_density': gas_density,
+                'gas_viscosity': gas_viscosity,
+                'SV_liquid': SV_liquid,
+                'SV_gas': SV_gas,
+                'value_fb': True,
+            }, substances, G_values, T_values)
+            validate_span.set_attribute('curves', len(requests))
+    except ValueError as e:
         return html.Div([
-            html.H4("Ошибка расчета", style={'color': COLORS['error'], 'textAlign': 'center'}),
-            html.P(f"Произошла ошибка при выполнении расчета: {str(e)}",
-                  style={'textAlign': 'center', 'color': COLORS['text_secondary']})
-        ])
-    
-    # Строим график DpDz от x
-    try:
-        fig = px.line(results_df, x='x', y='DpDz', 
-                     title=f"Зависимость градиента давления от паросодержания<br>{substance} (G={G} кг/м²с, d={d} м, T={T}°C)")
-        
-        fig.update_layout(
-            xaxis_title="Паросодержание, x",
-            yaxis_title="Градиент давления, DpDz (Па/м)",
-            title_x=0.5,
-            height=500,
-            margin=dict(l=60, r=40, t=80, b=60),
-            plot_bgcolor=COLORS['card_background'],
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(color=COLORS['text'], size=13),
-            title_font_size=16,
-            title_font_color=COLORS['text'],
-            xaxis=dict(
-                gridcolor=COLORS['grid_lines'],
-                linecolor=COLORS['border'],
-                zerolinecolor=COLORS['border'],
-                title_font=dict(size=14, color=COLORS['text']),
-                tickfont=dict(size=12, color=COLORS['text_secondary']),
-                showgrid=True,
-                gridwidth=1,
-                linewidth=1
-            ),
-            yaxis=dict(
-                gridcolor=COLORS['grid_lines'],
-                linecolor=COLORS['border'],
-                zerolinecolor=COLORS['border'],
-                title_font=dict(size=14, color=COLORS['text']),
-                tickfont=dict(size=12, color=COLORS['text_secondary']),
-                showgrid=True,
-                gridwidth=1,
-                linewidth=1
-            ),
-            hoverlabel=dict(
-                bgcolor=COLORS['dropdown_bg'],
-                font_size=12,
-                font_family="Arial",
-                font_color=COLORS['text']
-            )
-        )
-        
-        # Стилизация линии графика
-        fig.update_traces(
-            mode='lines+markers',
-            line=dict(width=2.5, color=COLORS['primary']),
-            marker=dict(size=4, color=COLORS['accent']),
-            hovertemplate="<b>x:</b> %{x:.3f}<br><b>DpDz:</b> %{y:.1f} Па/м<extra></extra>"
-        )
-        
-    except Exception as e:
-        fig = px.line(title="Ошибка построения графика")
-        print(f"Error creating plot: {e}")
+            html.H4("Ошибка", style={'color': COLORS['error'], 'textAlign': 'center'}),
+            html.P(str(e), style={'textAlign': 'center', 'color': COLORS['text_secondary']})
+        ]), no_update, no_update
     
-    # Подготавливаем данные для таблицы
-    table_df = results_df.copy()
-    table_df.insert(0, '№', range(1, len(table_df) + 1))
+    # Расчет идет в фоне: точки появляются на графике и в таблице по мере готовности,
+    # одинаковый запрос присоединяется к уже идущему заданию
+    # Идентификатор из браузера мог устареть или быть подменен - тогда выдается новый
+    if not valid_session_id(session_id):
+        session_id = new_session_id()
+    # Параметры для подписей графика и экспорта (списки - строкой)
+    substance = ', '.join(substances)
+    G = ', '.join(f"{v:g}" for v in G_values)
+    T = ', '.join(f"{v:g}" for v in T_values)
+    plot_params = {'substance': substance, 'd': d, 'G': G, 'T': T, 'g': g, 'num_points': num_points,
+                   'x_start': x_start, 'x_end': x_end, 'P': P, 'ki': ki}
+    with span('job.start', curves=len(requests)):
+        job_id = JOBS.start_sweep(requests, session_id, params=plot_params)
     
-    # Форматируем числа для таблицы
-    display_df = table_df.copy()
-    for col in display_df.columns:
-        if col != '№' and col != 'Substance':
-            if display_df[col].dtype in [np.float64, np.float32]:
-                display_df[col] = display_df[col].round(6)
-    
-    # Создаем колонки для таблицы
-    columns = [{"name": "№", "id": "№"}]
-    for col in results_df.columns:
-        if col in DIMENSIONS and DIMENSIONS[col]:
-            columns.append({"name": f"{col} ({DIMENSIONS[col]})", "id": col})
-        else:
-            columns.append({"name": col, "id": col})
-    
-    # Стили для таблицы
-    style_conditional = [
-        {
-            'if': {'state': 'selected'},
-            'backgroundColor': COLORS['hover'],
-            'border': f"2px solid {COLORS['primary']}"
-        },
-        {
-            'if': {'column_id': '№'},
-            'fontWeight': '600',
-            'color': COLORS['primary'],
-            'backgroundColor': COLORS['table_header']
-        },
-        {
-            'if': {'row_index': 'odd'},
-            'backgroundColor': COLORS['table_odd']
-        },
-        {
-            'if': {'row_index': 'even'},
-            'backgroundColor': COLORS['table_even']
-        }
-    ]
+    # Пустой график: точки добавит опрос задания
+    fig = progressive_figure(build_calculation_figure(pd.DataFrame(columns=['x', 'DpDz']), 'DpDz',
+                                                      substance, G, d, T), job_id)
     
     # Сводная информация о параметрах расчета
     params_info = f"""
@@ -1017,6 +1298,7 @@ def perform_calculation(n_clicks, substance, d, G, T, g, num_points, x_start, x_
     - Ускорение свободного падения: {g} м/с²
     - Количество точек расчета: {num_points}
     - Диапазон паросодержания: от {x_start} до {x_end}
+    - Кривых: {len(requests)}
     """
     
     if P:
@@ -1024,7 +1306,12 @@ def perform_calculation(n_clicks, substance, d, G, T, g, num_points, x_start, x_
     if ki:
         params_info += f"\n- Коэффициент ki: {ki}"
     
-    return html.Div([
+    # Колонки, доступные для построения по оси Y
+    y_options = [{'label': format_column_name(col), 'value': col}
+                 for col in RESULT_FIELDS if col not in ('x', 'Substance')]
+    total_points = num_points * len(requests)
+    
+    results_content = html.Div([
         html.H4("Результаты расчета", style={
             'color': COLORS['success'], 
             'textAlign': 'center', 
@@ -1050,12 +1337,23 @@ def perform_calculation(n_clicks, substance, d, G, T, g, num_points, x_start, x_
             })
         ]),
         
+        # Ход расчета
+        html.Div(format_progress({'done': 0, 'total': total_points, 'finished': False, 'error': None}),
+                 id='calc-progress', style={'marginBottom': '15px'}),
+        
         # График и таблица
         html.Div([
             # График
             html.Div([
                 html.Div([
-                    dcc.Graph(figure=fig, style={'height': '500px'})
+                    dcc.Dropdown(
+                        id='calc-y-axis-dropdown',
+                        options=y_options,
+                        value='DpDz',
+                        clearable=False,
+                        style={'width': '40%', 'margin': '0 auto 10px'}
+                    ),
+                    dcc.Graph(id='calc-plot', figure=fig, style={'height': '500px'})
                 ], style={
                     'backgroundColor': COLORS['card_background'],
                     'borderRadius': '12px',
@@ -1082,8 +1380,9 @@ def perform_calculation(n_clicks, substance, d, G, T, g, num_points, x_start, x_
                            }),
                     html.Div([
                         dash_table.DataTable(
-                            data=display_df.to_dict('records'),
-                            columns=columns,
+                            id='calc-table',
+                            data=[],
+                            columns=table_columns(('curve',) + RESULT_FIELDS),
                             page_action='none',
                             style_table={
                                 'overflowX': 'auto', 
@@ -1127,7 +1426,7 @@ def perform_calculation(n_clicks, substance, d, G, T, g, num_points, x_start, x_
                                 'color': COLORS['text'],
                                 'borderBottom': '1px solid rgba(255, 255, 255, 0.05)'
                             },
-                            style_data_conditional=style_conditional,
+                            style_data_conditional=TABLE_STYLE_CONDITIONAL,
                             style_as_list_view=True
                         )
                     ], style={
@@ -1149,50 +1448,240 @@ def perform_calculation(n_clicks, substance, d, G, T, g, num_points, x_start, x_
             ], style={'width': '30%', 'display': 'inline-block', 'verticalAlign': 'top'})
         ], style={'width': '100%', 'display': 'flex', 'justifyContent': 'space-between'}),
         
-        # Кнопка экспорта результатов
-        html.Div([
-            html.Button(
-                'Экспорт результатов в CSV',
-                id='export-results-button',
-                n_clicks=0,
-                style={
-                    'width': '25%',
-                    'padding': '12px',
-                    'borderRadius': '8px',
-                    'border': 'none',
-                    'backgroundColor': COLORS['success'],
-                    'color': COLORS['text'],
-                    'fontSize': '14px',
-                    'fontWeight': '600',
-                    'cursor': 'pointer',
-                    'transition': 'all 0.3s ease',
-                    'margin': '20px auto 0',
-                    'display': 'block'
-                }
-            ),
-            html.Div(id='export-status', style={'marginTop': '10px'})
-        ], style={'textAlign': 'center'})
+        # Ссылки для экспорта появятся после окончания расчета
+        html.Div(id='calc-export', style={'textAlign': 'center'}),
+        
+        dcc.Interval(id='calc-progress-interval', interval=PROGRESS_INTERVAL_MS),
+        dcc.Store(id='calc-job-store', data={'job_id': job_id, 'params': plot_params, 'started': time.time()})
     ])
+    
+    # Прежний результат сбрасывается: новый попадет в хранилище по окончании задания
+    return results_content, None, session_id
+
 
-# Callback для экспорта результатов
-@app.callback(
-    Output('export-status', 'children'),
-    Input('export-results-button', 'n_clicks'),
+# Callback опроса фонового задания и перестроения графика по выбранной колонке.
+# Пока задание идет, в браузер уходят только точки, готовые с прошлого опроса (Patch),
+# после окончания - весь график и таблица, результат берется из хранилища результатов
+@callback(
+    [Output('calc-plot', 'figure'),
+     Output('calc-table', 'data'),
+     Output('calc-progress', 'children'),
+     Output('calc-progress-interval', 'disabled'),
+     Output('calc-export', 'children'),
+     Output('calculation-data-store', 'data', allow_duplicate=True),
+     Output('calc-job-store', 'data')],
+    [Input('calc-progress-interval', 'n_intervals'),
+     Input('calc-y-axis-dropdown', 'value')],
+    [State('calc-job-store', 'data'),
+     State('calculation-data-store', 'data'),
+     State('session-id-store', 'data')],
     prevent_initial_call=True
 )
-def export_results(n_clicks):
-    if n_clicks > 0:
-        return html.P("Функция экспорта будет реализована в будущей версии", 
-                     style={'color': COLORS['success'], 'textAlign': 'center'})
-    return ""
+@timed_callback
+def update_calculation_plot(n_intervals, y_axis, job_ref, handle, session_id):
+    entry = RESULT_STORE.get_handle(handle) if handle else None
+    if entry is not None:
+        if ctx.triggered_id != 'calc-y-axis-dropdown' or not y_axis:
+            return (no_update,) * 7
+        params = entry['params']
+        fig = build_calculation_figure(entry['results'], y_axis, params['substance'],
+                                       params['G'], params['d'], params['T'])
+        return fig, no_update, no_update, True, no_update, no_update, no_update
+    
+    if not job_ref:
+        return (no_update,) * 7
+    job_id = job_ref['job_id']
+    job = JOBS.get(job_id, session_id)
+    with span('job.snapshot', job_id=job_id, local=job is not None):
+        if job is not None:
+            results_df, state = job.snapshot()
+        else:
+            # Задание идет в другом рабочем процессе: его ход - в общем хранилище
+            results_df, state = shared_job_snapshot(session_id, job_id)
+    if results_df is None:
+        if time.time() - job_ref.get('started', 0) < JOB_VISIBILITY_GRACE:
+            # Первый снимок задания еще не записан - опрос продолжается
+            return (no_update,) * 7
+        message = html.P("Расчет недоступен, выполните его повторно",
+                         style={'textAlign': 'center', 'color': COLORS['error']})
+        return no_update, no_update, message, True, no_update, no_update, no_update
+    
+    params = job_ref['params']
+    y_axis = y_axis or 'DpDz'
+    progress = format_progress(state)
+    if not state['finished']:
+        curves = state.get('curves', [state])
+        done = [curve['done'] for curve in curves]
+        sent = job_ref.get('sent') or [0] * len(curves)
+        axis_changed = ctx.triggered_id == 'calc-y-axis-dropdown'
+        if done == sent and not axis_changed:
+            return (no_update,) * 7
+        with span('job.patch', points=sum(done) - sum(sent)):
+            fig, records = progress_updates(results_df, curves, sent, y_axis, params, job_id, axis_changed)
+        return fig, records, progress, False, no_update, no_update, {**job_ref, 'sent': done}
+    
+    fig = progressive_figure(build_calculation_figure(results_df, y_axis, params['substance'],
+                                                      params['G'], params['d'], params['T']), job_id)
+    # Серия с ошибкой в части кривых сохраняется с тем, что удалось посчитать
+    with span('table', rows=len(results_df)):
+        records = table_records(results_df)
+    if results_df.empty:
+        return fig, records, progress, True, no_update, no_update, no_update
+    
+    # Результат хранится на сервере под идентификатором задания, в браузер уходит только ссылка.
+    # Обычно его уже записал publish_job_progress, иначе (опрос раньше издателя) - записываем сами
+    if not valid_session_id(session_id):
+        session_id = new_session_id()
+    if RESULT_STORE.get(session_id, job_id) is None:
+        with span('result_store.put', rows=len(results_df)):
+            RESULT_STORE.put(session_id, results_df, result_params(params, state), run_id=job_id)
+    return (fig, records, progress, True, build_export_links(session_id, job_id),
+            {'session_id': session_id, 'run_id': job_id}, no_update)
+
+def progress_updates(results_df, curves, sent, y_axis, params, job_id, axis_changed):
+    """
+    График и таблица для точек, готовых после sent (по кривым). Новые точки
+    вставляются операциями Patch на свои места по возрастанию позиции, поэтому
+    уже отправленные точки повторно не передаются. График строится заново,
+    только если сменилась колонка или появилась новая кривая (новая линия)
+    """
+    done = [curve['done'] for curve in curves]
+    grid = [done_indices(curve['total'], curve['done']) for curve in curves]
+    # Номер строки - номер узла сетки серии, он не меняется при вставке точек
+    offsets = np.cumsum([0] + [curve['total'] for curve in curves])
+    numbers = [offsets[c] + i + 1 for c, indices in enumerate(grid) for i in indices]
+    
+    if axis_changed or [n > 0 for n in done] != [n > 0 for n in sent]:
+        fig = progressive_figure(build_calculation_figure(results_df, y_axis, params['substance'],
+                                                          params['G'], params['d'], params['T']), job_id)
+    else:
+        fig = Patch()
+    records = table_records(results_df, numbers) if not any(sent) else Patch()
+    
+    start = 0
+    trace = 0
+    for c, indices in enumerate(grid):
+        old = set(done_indices(curves[c]['total'], sent[c]))
+        for position, i in enumerate(indices):
+            if i in old:
+                continue
+            row = results_df.iloc[[start + position]]
+            if isinstance(fig, Patch):
+                fig['data'][trace]['x'].insert(position, float(row['x'].iloc[0]))
+                fig['data'][trace]['y'].insert(position, _json_value(row[y_axis].iloc[0]))
+            if isinstance(records, Patch):
+                records.insert(start + position, table_records(row, [numbers[start + position]])[0])
+        start += len(indices)
+        trace += done[c] > 0
+    return fig, records
+
+def _json_value(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+def progressive_figure(fig, revision):
+    """
+    Фигура словарем с обычными списками x и y: точки дописываются в них
+    операциями Patch (в типизированный массив plotly их не вставить).
+    Масштаб, выбранный пользователем, сохраняется между обновлениями
+    """
+    fig.update_layout(uirevision=revision)
+    traces = []
+    for trace in fig.data:
+        trace = trace.to_plotly_json()
+        for axis in ('x', 'y'):
+            trace[axis] = [_json_value(v) for v in trace.get(axis, ())]
+        traces.append(trace)
+    return {'data': traces, 'layout': fig.layout.to_plotly_json()}
+
+def result_params(params, state):
+    """Параметры сохраняемого результата: подписи, время и ошибка части кривых, если была"""
+    params = {**params, 'timestamp': datetime.datetime.now().isoformat()}
+    if state.get('error'):
+        params['error'] = state['error']
+    return params
+
+@functools.lru_cache(maxsize=None)
+def _progress_store(directory):
+    return DiskResultStore(os.path.join(directory, 'progress'))
+
+def progress_store():
+    """
+    Ход идущих заданий - в отдельном подкаталоге общего хранилища: снимки
+    не вытесняют готовые результаты и не выгружаются через /export.
+    None - хранилище результатов в памяти процесса
+    """
+    if not isinstance(RESULT_STORE, DiskResultStore):
+        return None
+    return _progress_store(RESULT_STORE.directory)
+
+def shared_job_snapshot(session_id, job_id):
+    """Снимок задания другого рабочего процесса: (DataFrame, состояние) или (None, None)"""
+    store = progress_store()
+    shared = store.get(session_id, job_id) if store is not None else None
+    if shared is not None:
+        return shared['results'], shared['params']['state']
+    # Задание уже завершено: результат лежит в хранилище результатов
+    final = RESULT_STORE.get(session_id, job_id)
+    if final is None:
+        return None, None
+    rows = len(final['results'])
+    return final['results'], {'done': rows, 'total': rows, 'finished': True,
+                              'error': final['params'].get('error')}
+
+def publish_job_progress(job):
+    """
+    Ход задания для опроса из другого рабочего процесса WSGI-сервера: снимок
+    в хранилище хода под ключом (сессия, задание). По окончании результат
+    записывается в хранилище результатов под идентификатором задания, а снимок
+    удаляется. Хранилище в памяти процесса другим процессам не видно - тогда
+    нужен один рабочий процесс или привязка сессии к процессу (sticky sessions)
+    """
+    results_df, state = job.snapshot()
+    sessions = [session_id for session_id in list(job.sessions) if valid_session_id(session_id)]
+    store = progress_store()
+    if not state['finished']:
+        for session_id in sessions if store is not None else ():
+            store.put(session_id, results_df, {'state': state}, run_id=job.job_id)
+        return
+    for session_id in sessions:
+        if not results_df.empty and job.params is not None:
+            RESULT_STORE.put(session_id, results_df, result_params(job.params, state), run_id=job.job_id)
+        if store is not None:
+            store.delete(session_id, job.job_id)
+
+JOBS.publisher = publish_job_progress
+
+# Потоковая выгрузка результатов расчета по идентификатору (маршрут /export/<session_id>/<run_id>.<fmt>)
+def export_results(session_id, run_id, fmt):
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+
+    entry = RESULT_STORE.get(session_id, run_id)
+    if entry is None:
+        abort(404)
+
+    params = entry['params']
+    try:
+        chunks = stream_export(entry['results'], fmt, params)
+    except RuntimeError as e:
+        return Response(str(e), status=501, mimetype='text/plain')
+
+    filename = generate_filename(str(params.get('substance')).replace(', ', '_'), fmt)
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[fmt][0],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
 
 # Все остальные callback'ы остаются без изменений
 # Callback для обновления параметров
-@app.callback(
+@callback(
     [Output('param-dropdown', 'options'),
      Output('param-dropdown', 'value')],
     Input('substance-dropdown', 'value')
 )
+@timed_callback
 def update_param_options(selected_substance):
     if not selected_substance:
         return [], None
@@ -1212,12 +1701,13 @@ def update_param_options(selected_substance):
     return options, value
 
 # Callback для обновления режимов
-@app.callback(
+@callback(
     [Output('mode-dropdown', 'options'),
      Output('mode-dropdown', 'value')],
     [Input('substance-dropdown', 'value'),
      Input('param-dropdown', 'value')]
 )
+@timed_callback
 def update_mode_options(selected_substance, selected_param):
     if not selected_substance or not selected_param:
         return [], None
@@ -1242,7 +1732,7 @@ def update_mode_options(selected_substance, selected_param):
     return options, value
 
 # Callback для обновления доступных колонок для осей
-@app.callback(
+@callback(
     [Output('x-axis-dropdown', 'options'),
      Output('x-axis-dropdown', 'value'),
      Output('y-axis-dropdown', 'options'),
@@ -1251,6 +1741,7 @@ def update_mode_options(selected_substance, selected_param):
      Input('param-dropdown', 'value'),
      Input('mode-dropdown', 'value')]
 )
+@timed_callback
 def update_axis_options(selected_substance, selected_param, selected_mode):
     if not all([selected_substance, selected_param, selected_mode]):
         return [], None, [], None
@@ -1273,7 +1764,7 @@ def update_axis_options(selected_substance, selected_param, selected_mode):
         return options, x_value, options, y_value
         
     except Exception as e:
-        print(f"Error reading file: {e}")
+        record_exception(e, "Error reading file")
         return [], None, [], None
 
 # Функция для получения пути к файлу
@@ -1281,7 +1772,7 @@ def get_file_path(selected_substance, selected_param, selected_mode):
     return os.path.join(DATA_DIR, selected_substance, selected_param, f"{selected_mode}.csv")
 
 # Основной callback для обновления графика и таблицы
-@app.callback(
+@callback(
     [Output('data-plot', 'figure'),
      Output('data-table', 'data'),
      Output('data-table', 'columns'),
@@ -1292,6 +1783,7 @@ def get_file_path(selected_substance, selected_param, selected_mode):
      Input('x-axis-dropdown', 'value'),
      Input('y-axis-dropdown', 'value')]
 )
+@timed_callback
 def update_content(selected_substance, selected_param, selected_mode, x_axis, y_axis):
     if not all([selected_substance, selected_param, selected_mode, x_axis, y_axis]):
         return {}, [], [], []
@@ -1308,7 +1800,7 @@ def update_content(selected_substance, selected_param, selected_mode, x_axis, y_
         df_with_index.insert(0, '№', range(1, len(df_with_index) + 1))
         
     except Exception as e:
-        print(f"Error reading file: {e}")
+        record_exception(e, "Error reading file")
         return {}, [], [], []
     
     # Строим график с выбранными осями
@@ -1372,7 +1864,7 @@ def update_content(selected_substance, selected_param, selected_mode, x_axis, y_
         )
         
     except Exception as e:
-        print(f"Error creating plot: {e}")
+        record_exception(e, "Error creating plot")
         fig = px.line(title="Ошибка построения графика")
     
     # Создаем колонки для таблицы с форматированными названиями
@@ -1435,15 +1927,15 @@ def run_dashboard(port=8050, host='127.0.0.1', open_browser=True, debug=False):
     print("⏹️  Для остановки нажмите Ctrl+C")
     
     try:
-        app.run(debug=debug, port=port, host=host)
+        get_app().run(debug=debug, port=port, host=host)
     except Exception as e:
         print(f"❌ Ошибка при запуске: {e}")
         return False
     
     return True
 
-# Добавляем CSS для стилизации выпадающих списков и вкладок
-app.index_string = '''
+# CSS для стилизации выпадающих списков и вкладок
+INDEX_STRING = '''
 <!DOCTYPE html>
 <html>
     <head>
@@ -1574,6 +2066,47 @@ app.index_string = '''
 </html>
 '''
 
+# Фабрика приложения
+def create_app():
+    """Создает Dash-приложение: layout строится по запросу, callback'и зарегистрированы глобально"""
+    app = dash.Dash(__name__)
+    
+    # Отключаем окно с ошибками в режиме разработки
+    app.config.suppress_callback_exceptions = True
+    
+    app.layout = serve_layout
+    app.index_string = INDEX_STRING
+    
+    app.server.add_url_rule('/export/<session_id>/<run_id>.<fmt>', 'export_results', export_results)
+    
+    # HTTP API пакетного расчета на том же Flask-сервере
+    register_api(app.server)
+    
+    # Метрики Prometheus: /metrics
+    register_metrics(app.server)
+    
+    # Спаны этапов расчета (включаются переменной DPDZ_TRACE, см. tracing.py)
+    register_tracing(app.server)
+    return app
+
+@REGISTRY.register_collector
+def _collect_metrics():
+    return [('dpdz_stored_results', 'gauge', "Результаты расчетов в хранилище",
+             [({'store': type(RESULT_STORE).__name__}, len(RESULT_STORE))])]
+
+def get_app():
+    """Единственный экземпляр приложения в процессе"""
+    global _app
+    if _app is None:
+        _app = create_app()
+    return _app
+
+def __getattr__(name):
+    # dashboard.app создается при первом обращении
+    if name == 'app':
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__ == '__main__':
     # Стандартный запуск для разработки
     run_dashboard(debug=False)  # Отключаем debug mode для устранения белого окна с ошибками
\ No newline at end of file
@@ -6,9 +6,10 @@ import plotly.express as px
 from dash.dash import no_update
 import numpy as np
 from class_DpDz import DpDz  # Импортируем класс для расчетов
-import base64
 import datetime
-import io
+from flask import Response, abort, stream_with_context
+from result_store import ResultStore, new_session_id
+from result_export import stream_export
 
 # Инициализация приложения
 app = dash.Dash(__name__)
@@ -222,6 +223,9 @@ def format_mode_value(param, value):
         return f"{value} {DIMENSIONS[param]}"
     return str(value)
 
+# Серверное хранилище результатов расчета (в браузер уходит только идентификатор)
+RESULT_STORE = ResultStore()
+
 # Функция для генерации имени файла с временной меткой
 def generate_filename(substance, timestamp=None):
     if timestamp is None:
@@ -232,6 +236,7 @@ def generate_filename(substance, timestamp=None):
 app.layout = html.Div([
     # Скрытый компонент для хранения данных расчета
     dcc.Store(id='calculation-data-store'),
+    dcc.Store(id='session-id-store', storage_type='session'),
     
     html.Div([
         html.H1("Исследование гидродинамических характеристик", 
@@ -807,7 +812,8 @@ def toggle_advanced_params(n_clicks, current_style):
 # Callback для выполнения расчета и сохранения данных
 @app.callback(
     [Output('calculation-results', 'children'),
-     Output('calculation-data-store', 'data')],
+     Output('calculation-data-store', 'data'),
+     Output('session-id-store', 'data')],
     Input('calculate-button', 'n_clicks'),
     [State('substance-calc-dropdown', 'value'),
      State('d-input', 'value'),
@@ -824,14 +830,15 @@ def toggle_advanced_params(n_clicks, current_style):
      State('gas-density-input', 'value'),
      State('gas-viscosity-input', 'value'),
      State('SV-liquid-input', 'value'),
-     State('SV-gas-input', 'value')]
+     State('SV-gas-input', 'value'),
+     State('session-id-store', 'data')]
 )
 def perform_calculation(n_clicks, substance, d, G, T, g, num_points, x_start, x_end, P, ki, 
                        liquid_density, liquid_viscosity, gas_density, gas_viscosity, 
-                       SV_liquid, SV_gas):
+                       SV_liquid, SV_gas, session_id):
     if n_clicks == 0:
         return html.P("Введите параметры и нажмите 'Выполнить расчет'", 
-                     style={'textAlign': 'center', 'color': COLORS['text_secondary']}), no_update
+                     style={'textAlign': 'center', 'color': COLORS['text_secondary']}), no_update, no_update
     
     # Проверка обязательных полей
     required_fields = {
@@ -850,7 +857,7 @@ def perform_calculation(n_clicks, substance, d, G, T, g, num_points, x_start, x_
             html.H4("Ошибка", style={'color': COLORS['error'], 'textAlign': 'center'}),
             html.P(f"Заполните все обязательные параметры: {', '.join(missing_fields)}",
                   style={'textAlign': 'center', 'color': COLORS['text_secondary']})
-        ]), no_update
+        ]), no_update, no_update
     
     # Проверка количества точек
     if num_points < 2:
@@ -858,7 +865,7 @@ def perform_calculation(n_clicks, substance, d, G, T, g, num_points, x_start, x_
             html.H4("Ошибка", style={'color': COLORS['error'], 'textAlign': 'center'}),
             html.P("Количество точек расчета должно быть целым числом больше 1",
                   style={'textAlign': 'center', 'color': COLORS['text_secondary']})
-        ]), no_update
+        ]), no_update, no_update
     
     # Проверка диапазона паросодержания
     if x_start is None or x_end is None:
@@ -866,7 +873,7 @@ def perform_calculation(n_clicks, substance, d, G, T, g, num_points, x_start, x_
             html.H4("Ошибка", style={'color': COLORS['error'], 'textAlign': 'center'}),
             html.P("Заполните диапазон паросодержания",
                   style={'textAlign': 'center', 'color': COLORS['text_secondary']})
-        ]), no_update
+        ]), no_update, no_update
     
     try:
         # Создаем диапазон значений x
@@ -898,7 +905,7 @@ def perform_calculation(n_clicks, substance, d, G, T, g, num_points, x_start, x_
         
         # Создаем экземпляр класса DpDz и выполняем расчет
         # value_fb = True - учитывать скорость на границе раздела фаз
-        calculator = DpDz(g=g, d=d, ki=ki, thermodinamic_params=thermodynamic_params, value_fb=True)
+        calculator = DpDz(g=g, d=d, ki=ki, thermodynamic_params=thermodynamic_params, value_fb=True)
         results = calculator.calculate()
         
         # Преобразуем результаты в DataFrame
@@ -920,7 +927,7 @@ def perform_calculation(n_clicks, substance, d, G, T, g, num_points, x_start, x_
             html.H4("Ошибка расчета", style={'color': COLORS['error'], 'textAlign': 'center'}),
             html.P(f"Произошла ошибка при выполнении расчета: {str(e)}",
                   style={'textAlign': 'center', 'color': COLORS['text_secondary']})
-        ]), no_update
+        ]), no_update, no_update
     
     # Строим график DpDz от x
     try:
@@ -1037,23 +1044,23 @@ def perform_calculation(n_clicks, substance, d, G, T, g, num_points, x_start, x_
     if ki:
         params_info += f"\n- Коэффициент ki: {ki}"
     
-    # Сохраняем данные для экспорта
-    export_data = {
-        'results': results_df.to_dict('records'),
-        'params': {
-            'substance': substance,
-            'd': d,
-            'G': G,
-            'T': T,
-            'g': g,
-            'num_points': num_points,
-            'x_start': x_start,
-            'x_end': x_end,
-            'P': P,
-            'ki': ki,
-            'timestamp': datetime.datetime.now().isoformat()
-        }
-    }
+    # Сохраняем данные для экспорта на сервере, в браузер уходит только ссылка
+    if not session_id:
+        session_id = new_session_id()
+    run_id = RESULT_STORE.put(session_id, results_df, {
+        'substance': substance,
+        'd': d,
+        'G': G,
+        'T': T,
+        'g': g,
+        'num_points': num_points,
+        'x_start': x_start,
+        'x_end': x_end,
+        'P': P,
+        'ki': ki,
+        'timestamp': datetime.datetime.now().isoformat()
+    })
+    export_data = {'session_id': session_id, 'run_id': run_id}
     
     results_content = html.Div([
         html.H4("Результаты расчета", style={
@@ -1211,7 +1218,7 @@ def perform_calculation(n_clicks, substance, d, G, T, g, num_points, x_start, x_
         ], style={'textAlign': 'center'})
     ])
     
-    return results_content, export_data
+    return results_content, export_data, session_id
 
 # Callback для генерации и скачивания CSV файла
 @app.callback(
@@ -1226,55 +1233,38 @@ def export_results(n_clicks, stored_data):
     if n_clicks is None or n_clicks == 0 or stored_data is None:
         return "", "", ""
     
-    try:
-        # Восстанавливаем DataFrame из сохраненных данных
-        results_df = pd.DataFrame(stored_data['results'])
-        params = stored_data['params']
-        
-        # Создаем CSV строку
-        csv_string = results_df.to_csv(index=False, encoding='utf-8')
-        
-        # Создаем строку с метаданными
-        meta_info = f"# Результаты расчета гидродинамических характеристик\n"
-        meta_info += f"# Вещество: {params['substance']}\n"
-        meta_info += f"# Диаметр: {params['d']} м\n"
-        meta_info += f"# Массовый расход: {params['G']} кг/м²с\n"
-        meta_info += f"# Температура: {params['T']} °C\n"
-        meta_info += f"# Ускорение свободного падения: {params['g']} м/с²\n"
-        meta_info += f"# Количество точек: {params['num_points']}\n"
-        meta_info += f"# Диапазон паросодержания: {params['x_start']} - {params['x_end']}\n"
-        if params.get('P'):
-            meta_info += f"# Давление: {params['P']} Па\n"
-        if params.get('ki'):
-            meta_info += f"# Коэффициент ki: {params['ki']}\n"
-        meta_info += f"# Дата расчета: {params['timestamp']}\n"
-        meta_info += f"# \n"
-        
-        # Объединяем метаданные с данными
-        full_csv = meta_info + csv_string
-        
-        # Кодируем в base64 для скачивания
-        csv_base64 = base64.b64encode(full_csv.encode('utf-8')).decode()
-        
-        # Генерируем имя файла
-        filename = generate_filename(params['substance'])
-        
-        # Создаем href для скачивания
-        href = f"data:text/csv;base64,{csv_base64}"
-        
-        status_message = html.P(
-            "✅ Файл готов к скачиванию. Нажмите на кнопку выше.",
-            style={'color': COLORS['success'], 'textAlign': 'center'}
-        )
-        
-        return href, filename, status_message
-        
-    except Exception as e:
+    entry = RESULT_STORE.get_handle(stored_data)
+    if entry is None:
         error_message = html.P(
-            f"❌ Ошибка при экспорте: {str(e)}",
+            "❌ Результаты расчета устарели, выполните расчет заново",
             style={'color': COLORS['error'], 'textAlign': 'center'}
         )
         return "", "", error_message
+    
+    # Файл формируется на сервере и отдается потоком по ссылке
+    href = f"/export/{stored_data['session_id']}/{stored_data['run_id']}.csv"
+    filename = generate_filename(entry['params']['substance'])
+    
+    status_message = html.P(
+        "✅ Файл готов к скачиванию. Нажмите на кнопку выше.",
+        style={'color': COLORS['success'], 'textAlign': 'center'}
+    )
+    
+    return href, filename, status_message
+
+# Потоковая выгрузка CSV из серверного хранилища
+@app.server.route('/export/<session_id>/<run_id>.csv')
+def download_results_csv(session_id, run_id):
+    entry = RESULT_STORE.get(session_id, run_id)
+    if entry is None:
+        abort(404)
+    
+    filename = generate_filename(entry['params']['substance'])
+    return Response(
+        stream_with_context(stream_export(entry['results'], 'csv', entry['params'])),
+        mimetype='text/csv; charset=utf-8',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
 
 # Все остальные callback'ы остаются без изменений
 # Callback для обновления параметров
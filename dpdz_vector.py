@@ -0,0 +1,266 @@
+"""
+Векторный расчет модели DpDz для массивов рабочих точек.
+
+Те же формулы, что в class_DpDz.DpDz, но записанные через numpy для
+массивов (jg, jl, свойства фаз) и с поэлементным поиском толщины пленки
+scipy.optimize.elementwise.find_root вместо brentq в цикле по точкам.
+Все аргументы транслируются (broadcast) друг с другом.
+
+Для больших карт результат можно хранить компактно (precision='float32'):
+производные поля во float32, Substance - категория, status - int8.
+Решение при этом всегда считается во float64, поэтому ошибка - только
+округление при хранении, относительная не больше 2**-24 ~ 6e-8
+(см. precision_report). Память на точку примерно в 2 раза меньше.
+
+Отчет о точности хранения для сетки G x x (по умолчанию CO2, T=-10 °C):
+
+    python -m dpdz_vector CO2 --T=-10 --G 100:1000:100 --x 0.01:0.99:1000 [--out report.csv]
+
+На этой сетке (100 000 точек) наибольшая относительная ошибка 5.95e-8
+(jl, jg, Re, B, fi, alpha, DpDz; у свойств фаз 5e-9..4e-8), входные x, G, T
+хранятся без потерь, память на точку 163 -> 86 байт.
+"""
+import argparse
+import functools
+import sys
+
+import numpy as np
+
+from class_DpDz import saturation_properties
+from grids import parse_axis
+from lazy_import import lazy_module
+from metrics import POINTS_SOLVED, SOLVER_FAILURES
+from properties import get_provider
+from tracing import span
+
+elementwise = lazy_module('scipy.optimize.elementwise')
+pd = lazy_module('pandas')
+
+# Отступ от границ интервала поиска толщины пленки, как в DpDz.calcOnePoint
+B_MARGIN = 1.0e-6
+
+# Абсолютная точность по толщине пленки (как xtol у brentq)
+B_XATOL = 2.0e-12
+
+# Полуширина интервала поиска вокруг начального приближения (доля B)
+WARM_START_WIDTH = 0.1
+
+# Коды состояния точки
+STATUS_OK = 0
+STATUS_NO_ROOT = 1
+
+# Точность хранения результата
+PRECISIONS = ('float64', 'float32')
+
+# Входные столбцы остаются float64: по ним ищут и группируют точки
+INPUT_COLUMNS = ('x', 'G', 'T')
+
+
+@functools.lru_cache(maxsize=4096)
+def saturation_extras(substance, T):
+    """Теплопроводность жидкости и приведенное давление на линии насыщения при T, °C"""
+    provider = get_provider(substance)
+    return float(provider.conductivity(float(T))), float(provider.reduced_pressure(float(T)))
+
+
+def effective_ki(ki, rho_l, rho_g):
+    """Коэффициент Уоллиса: NaN означает ki=None (зависимость от отношения плотностей)"""
+    ki = np.asarray(ki, dtype=float)
+    return np.where(np.isnan(ki), 24 * (rho_l / rho_g) ** (1 / 3), ki)
+
+
+def friction_liquid(Re_l):
+    """Ec: ламинарный 64/Re или турбулентный (1.82 lg Re - 1.64)^-2"""
+    # Сравнение по вещественной части: sensitivity.py передает комплексные Re
+    laminar = np.real(Re_l) <= 2000
+    safe = np.where(laminar, 2001.0, Re_l)
+    return np.where(laminar, 64 / Re_l, (1.82 * np.log10(safe) - 1.64) ** (-2))
+
+
+def interfacial_stress(B, jg, d, ki_eff, rho_g, mu_g):
+    """Ti при w_b = 0 (DpDz.wb всегда возвращает 0)"""
+    fi = ((d - 2 * B) / d) ** 2
+    di = d - 2 * B
+    Re_G = (rho_g * jg / fi * di) / mu_g
+    e0 = 1 / (1.82 * np.log10(Re_G) - 1.64) ** 2
+    Ei = e0 * (1 + ki_eff * B / d)
+    return Ei * rho_g * (jg / fi) ** 2 / 8
+
+
+def residual(B, jg, jl, d, ki_eff, rho_l, rho_g, mu_l, mu_g):
+    """DpDz.equation: Ti - Tc * Di / d"""
+    fi = ((d - 2 * B) / d) ** 2
+    Re_l = (rho_l * jl * d) / mu_l
+    Tc = friction_liquid(Re_l) * rho_l * jl ** 2 / (8 * (1 - fi) ** 2)
+    return interfacial_stress(B, jg, d, ki_eff, rho_g, mu_g) - Tc * (d - 2 * B) / d
+
+
+def _bracketed(f_lo, f_hi):
+    return np.isfinite(f_lo) & np.isfinite(f_hi) & (np.sign(f_lo) != np.sign(f_hi))
+
+
+def solve_film(jg, jl, d, ki_eff, rho_l, rho_g, mu_l, mu_g, guess=None):
+    """
+    Толщина пленки B для всех точек сразу.
+    guess - прошлое решение (например, на предыдущем шаге по длине канала):
+    поиск начинается с узкого интервала вокруг него, где смены знака нет -
+    с полного интервала.
+    Возвращает (B, status); там, где на интервале нет смены знака, B = NaN
+    """
+    args = np.broadcast_arrays(*(np.asarray(a, dtype=float)
+                                 for a in (jg, jl, d, ki_eff, rho_l, rho_g, mu_l, mu_g)))
+    d_arr = args[2]
+    lo = np.full_like(d_arr, B_MARGIN)
+    hi = d_arr / 2 - B_MARGIN
+
+    with np.errstate(all='ignore'):
+        if guess is not None:
+            guess = np.broadcast_to(np.asarray(guess, dtype=float), d_arr.shape)
+            warm_lo = np.clip(guess * (1 - WARM_START_WIDTH), lo, hi)
+            warm_hi = np.clip(guess * (1 + WARM_START_WIDTH), lo, hi)
+            warm = _bracketed(residual(warm_lo, *args), residual(warm_hi, *args))
+            lo = np.where(warm, warm_lo, lo)
+            hi = np.where(warm, warm_hi, hi)
+
+        f_lo = residual(lo, *args)
+        f_hi = residual(hi, *args)
+        bracketed = _bracketed(f_lo, f_hi)
+
+        B = np.full(d_arr.shape, np.nan)
+        if bracketed.any():
+            sub = tuple(a[bracketed] for a in args)
+            res = elementwise.find_root(residual, (lo[bracketed], hi[bracketed]), args=sub,
+                                        tolerances={'xatol': B_XATOL})
+            B[bracketed] = np.where(res.success, res.x, np.nan)
+
+    status = np.where(np.isnan(B), STATUS_NO_ROOT, STATUS_OK)
+    POINTS_SOLVED.inc(B.size, engine='vector')
+    SOLVER_FAILURES.inc(int(np.count_nonzero(status)), engine='vector')
+    return B, status
+
+
+def calculate_points(substance, T, d, ki, G, x, properties=None, precision='float64'):
+    """
+    Векторный аналог DpDz(...).calculate() для пар (G, x) при одном веществе и T.
+    properties - источник свойств (properties.py), по умолчанию насыщение по CoolProp.
+    Возвращает DataFrame с теми же столбцами, что DpDz.calculate_one_point, и status
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision должен быть одним из {PRECISIONS}")
+    with span('properties.lookup', substance=substance, T=T):
+        if properties is None:
+            rho_l, mu_l, rho_g, mu_g = saturation_properties(substance, T)
+            lam, p_red = saturation_extras(substance, T)
+        else:
+            rho_l, mu_l, rho_g, mu_g = (float(v) for v in properties.phase_properties(T))
+            lam, p_red = float(properties.conductivity(T)), float(properties.reduced_pressure(T))
+
+    G, x = np.broadcast_arrays(np.asarray(G, dtype=float), np.asarray(x, dtype=float))
+    G, x = G.ravel(), x.ravel()
+    jl = G * (1 - x) / rho_l
+    jg = G * x / rho_g
+    ki_eff = effective_ki(np.nan if ki is None else ki, rho_l, rho_g)
+
+    with span('dpdz.solve', points=len(G)):
+        B, status = solve_film(jg, jl, d, ki_eff, rho_l, rho_g, mu_l, mu_g)
+
+    with np.errstate(all='ignore'):
+        fi = ((d - 2 * B) / d) ** 2
+        di = d - 2 * B
+        dpdz = 4.0 * interfacial_stress(B, jg, d, ki_eff, rho_g, mu_g) / di
+        Re_l = (rho_l * jl * d) / mu_l
+        Re_g = (rho_g * jg / fi * di) / mu_g
+        alpha = lam / B
+
+    with span('dataframe', rows=len(G)):
+        results_df = pd.DataFrame({
+            'Substance': substance,
+            'x': x,
+            'G': G,
+            'T': T,
+            'Liquid density': rho_l,
+            'Gas density': rho_g,
+            'Lquid viscosity': mu_l,
+            'Gas viscosity': mu_g,
+            'Simplex density': rho_g / rho_l,
+            'Simplex viscosity': mu_g / mu_l,
+            'jl': jl,
+            'jg': jg,
+            'Re liquid': Re_l,
+            'Re gas': Re_g,
+            'fi': fi,
+            'alpha': alpha,
+            'Pred': p_red,
+            'B': B,
+            'DpDz': dpdz,
+            'status': status,
+        })
+    return results_df if precision == 'float64' else compact_results(results_df, precision)
+
+
+def compact_results(results_df, precision='float32'):
+    """Компактное хранение: производные поля -> precision, Substance -> категория, status -> int8"""
+    columns = {}
+    for col in results_df.columns:
+        values = results_df[col]
+        if col == 'Substance':
+            columns[col] = values.astype('category')
+        elif col == 'status':
+            columns[col] = values.astype(np.int8)
+        elif col not in INPUT_COLUMNS and values.dtype == np.float64:
+            columns[col] = values.astype(precision)
+        else:
+            columns[col] = values
+    return pd.DataFrame(columns)
+
+
+def precision_report(results_df, precision='float32'):
+    """
+    Сравнение хранения во float64 и в precision по каждому столбцу:
+    максимальные абсолютная и относительная ошибки и размер в памяти
+    """
+    compact = compact_results(results_df, precision)
+    rows = []
+    for col in results_df.columns:
+        row = {'column': col, 'dtype': str(compact[col].dtype),
+               'bytes_float64': int(results_df[col].memory_usage(index=False, deep=True)),
+               'bytes_compact': int(compact[col].memory_usage(index=False, deep=True)),
+               'max_abs_error': 0.0, 'max_rel_error': 0.0}
+        if results_df[col].dtype == np.float64:
+            exact = results_df[col].to_numpy()
+            stored = compact[col].to_numpy(dtype=np.float64)
+            with np.errstate(all='ignore'):
+                abs_err = np.abs(stored - exact)
+                rel_err = np.where(exact != 0, abs_err / np.abs(exact), 0.0)
+            row['max_abs_error'] = float(np.nanmax(abs_err, initial=0.0))
+            row['max_rel_error'] = float(np.nanmax(rel_err, initial=0.0))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Отчет о точности компактного хранения результатов DpDz")
+    parser.add_argument('substance', nargs='?', default='CO2', help="вещество CoolProp")
+    parser.add_argument('--T', type=float, default=-10.0, help="температура, °C")
+    parser.add_argument('--d', type=float, default=0.00142, help="диаметр, м")
+    parser.add_argument('--G', default='100:1000:100', help="сетка G: start:stop:num")
+    parser.add_argument('--x', default='0.01:0.99:1000', help="сетка x: start:stop:num")
+    parser.add_argument('--precision', choices=[p for p in PRECISIONS if p != 'float64'], default='float32')
+    parser.add_argument('--out', default=None, help="CSV-файл отчета")
+    args = parser.parse_args(argv)
+
+    G, x = parse_axis(args.G), parse_axis(args.x)
+    results_df = calculate_points(args.substance, args.T, args.d, None, G[:, None], x[None, :])
+    report = precision_report(results_df, args.precision)
+    if args.out:
+        report.to_csv(args.out, index=False)
+    n = len(results_df)
+    print(f"{args.substance}, T={args.T:g} °C, d={args.d:g} м: {n} точек, хранение {args.precision}")
+    print(report.to_string(index=False))
+    print(f"Память на точку: {report['bytes_float64'].sum() / n:.0f} -> {report['bytes_compact'].sum() / n:.0f} байт, "
+          f"макс. относительная ошибка {report['max_rel_error'].max():.2e}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
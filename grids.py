@@ -0,0 +1,23 @@
+"""
+Сетки параметров для пакетных расчетов.
+
+В файлах исследований и карт (study, sweep_map) ось - список значений или
+{"start", "stop", "num"}, в командной строке (lookup_table, dpdz_vector) -
+'start:stop:num' или значения через запятую.
+"""
+import numpy as np
+
+
+def expand_grid(value):
+    """Список значений или {"start", "stop", "num"} -> массив"""
+    if isinstance(value, dict):
+        return np.linspace(value['start'], value['stop'], int(value['num']))
+    return np.atleast_1d(np.asarray(value, dtype=float))
+
+
+def parse_axis(text):
+    """'start:stop:num' -> равномерная сетка, '1,2,5' -> список значений"""
+    if ':' in text:
+        start, stop, num = text.split(':')
+        return np.linspace(float(start), float(stop), int(num))
+    return np.array([float(v) for v in text.split(',')])
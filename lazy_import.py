@@ -0,0 +1,42 @@
+"""
+Отложенный импорт тяжелых модулей.
+
+    CP = lazy_module('CoolProp.CoolProp')
+
+Модуль импортируется при первом обращении к атрибуту (CP.PropsSI),
+поэтому импорт class_DpDz и дашборда не ждет загрузки CoolProp, SciPy,
+pandas и Plotly, если они в этом запуске не понадобились.
+"""
+import importlib
+
+
+class LazyModule():
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = importlib.import_module(self.__dict__['_name'])
+            self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        value = getattr(self._load(), attr)
+        # Запоминаем атрибут, чтобы следующие обращения не шли через __getattr__
+        self.__dict__[attr] = value
+        return value
+
+    @property
+    def loaded(self):
+        return self.__dict__['_module'] is not None
+
+    def __repr__(self):
+        state = 'загружен' if self.loaded else 'не загружен'
+        return f"<LazyModule {self.__dict__['_name']} ({state})>"
+
+
+def lazy_module(name):
+    return LazyModule(name)
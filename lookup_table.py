@@ -0,0 +1,235 @@
+"""
+Таблицы DpDz(G, T, x, d) для быстрых расчетов без решения уравнения.
+
+Сборка таблицы для вещества - одна команда:
+
+    python -m lookup_table CO2 --G 100:1000:37 --T=-40:20:61 --x 0.01:0.99:99 --d 0.00142 --out tables
+
+Значения считаются векторным движком (dpdz_vector.calculate_points) по
+срезам (T, d), срезы могут считаться в нескольких процессах. Результат
+пишется в memmap-файлы .npy рядом с JSON-описанием осей. В имени файлов
+после вещества - хэш ki и всех осей, поэтому таблицы с разными d, ki или
+сетками в одном каталоге не перезаписывают друг друга:
+
+    tables/CO2_<хэш>_dpdz.npy   - DpDz, форма (G, T, x, d)
+    tables/CO2_<хэш>_error.npy  - оценка относительной ошибки интерполяции по ячейкам (G, x)
+    tables/CO2_<хэш>_dpdz.json  - оси, ki, дата сборки
+
+Оценка ошибки: в центрах ячеек по (G, x) в каждом узле (T, d) сравнивается
+интерполяция с точным расчетом. Ошибка по T и d в оценку не входит.
+
+    table = DpDzTable.load(meta_path)    # путь, который вернул build_table
+    dpdz, error, inside = table.evaluate(G, T, x, d)
+"""
+import argparse
+import bisect
+import datetime
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dpdz_vector import calculate_points
+from grids import parse_axis
+
+AXES = ('G', 'T', 'x', 'd')
+
+
+def table_paths(directory, substance, ki, axes):
+    """Пути файлов таблицы; axes - оси в порядке AXES"""
+    key = json.dumps({'ki': ki, 'axes': [np.asarray(a, dtype=float).tolist() for a in axes]})
+    base = os.path.join(directory, f"{substance}_{hashlib.sha1(key.encode()).hexdigest()[:12]}")
+    return f"{base}_dpdz.npy", f"{base}_error.npy", f"{base}_dpdz.json"
+
+
+def _interp_axis(axis, q):
+    """Индекс левого узла и вес для каждого значения q; inside - q в пределах оси"""
+    if len(axis) == 1:
+        inside = np.isclose(q, axis[0], rtol=1e-9, atol=0)
+        return np.zeros(q.shape, dtype=np.intp), np.zeros(q.shape), inside
+    inside = (q >= axis[0]) & (q <= axis[-1])
+    idx = np.clip(np.searchsorted(axis, q, side='right') - 1, 0, len(axis) - 2)
+    w = (q - axis[idx]) / (axis[idx + 1] - axis[idx])
+    return idx, np.clip(w, 0.0, 1.0), inside
+
+
+def _next(axis, idx):
+    return idx if len(axis) == 1 else idx + 1
+
+
+def _slice(substance, ki, G, x, T, d):
+    """DpDz на сетке (G, x) при одном (T, d) и ошибка интерполяции в центрах ячеек"""
+    values = calculate_points(substance, T, d, ki, G[:, None], x[None, :])['DpDz'].to_numpy()
+    values = values.reshape(len(G), len(x))
+    G_mid = (G[:-1] + G[1:]) / 2
+    x_mid = (x[:-1] + x[1:]) / 2
+    exact = calculate_points(substance, T, d, ki, G_mid[:, None], x_mid[None, :])['DpDz'].to_numpy()
+    exact = exact.reshape(len(G_mid), len(x_mid))
+    interp = (values[:-1, :-1] + values[1:, :-1] + values[:-1, 1:] + values[1:, 1:]) / 4
+    with np.errstate(all='ignore'):
+        error = np.abs(interp - exact) / np.abs(exact)
+    return values, error
+
+
+def _fill(values, errors, slices, results, T, d, log):
+    for k, ((i, j), (slice_values, slice_error)) in enumerate(zip(slices, results), 1):
+        values[:, i, :, j] = slice_values
+        errors[:, i, :, j] = slice_error
+        log(f"  [{k}/{len(slices)}] T={T[i]:g}, d={d[j]:g}")
+
+
+def build_table(substance, G, T, x, d, directory, ki=None, workers=1, log=print):
+    """Считает таблицу и записывает ее в directory. Возвращает путь к JSON-описанию"""
+    G, T, x, d = (np.asarray(a, dtype=float) for a in (G, T, x, d))
+    for name, axis in zip(AXES, (G, T, x, d)):
+        if axis.ndim != 1 or np.any(np.diff(axis) <= 0):
+            raise ValueError(f"Ось {name} должна строго возрастать")
+    if len(G) < 2 or len(x) < 2:
+        raise ValueError("По G и x нужно не меньше двух узлов")
+
+    os.makedirs(directory, exist_ok=True)
+    values_path, error_path, meta_path = table_paths(directory, substance, ki, (G, T, x, d))
+    values = np.lib.format.open_memmap(values_path, mode='w+', dtype=np.float64,
+                                       shape=(len(G), len(T), len(x), len(d)))
+    errors = np.lib.format.open_memmap(error_path, mode='w+', dtype=np.float32,
+                                       shape=(len(G) - 1, len(T), len(x) - 1, len(d)))
+
+    slices = [(i, j) for i in range(len(T)) for j in range(len(d))]
+    args = [(substance, ki, G, x, T[i], d[j]) for i, j in slices]
+    if workers == 1:
+        _fill(values, errors, slices, (_slice(*a) for a in args), T, d, log)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        try:
+            _fill(values, errors, slices, pool.map(_slice, *zip(*args)), T, d, log)
+        finally:
+            # После ошибки в срезе оставшиеся отменяются, рабочие процессы закрываются в любом случае
+            pool.shutdown(wait=True, cancel_futures=True)
+    values.flush()
+    errors.flush()
+
+    meta = {
+        'substance': substance,
+        'ki': ki,
+        'axes': {name: axis.tolist() for name, axis in zip(AXES, (G, T, x, d))},
+        'values': os.path.basename(values_path),
+        'error': os.path.basename(error_path),
+        'max_error': float(np.nanmax(errors)) if np.isfinite(errors).any() else None,
+        'missing': int(np.isnan(values).sum()),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta_path
+
+
+class DpDzTable():
+    """Многолинейная интерполяция по таблице DpDz(G, T, x, d)"""
+
+    def __init__(self, meta, values, error):
+        self.meta = meta
+        self.axes = [np.asarray(meta['axes'][name], dtype=float) for name in AXES]
+        self.values = values
+        self.error = error
+        self._axis_lists = [axis.tolist() for axis in self.axes]
+
+    @classmethod
+    def load(cls, meta_path):
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        directory = os.path.dirname(meta_path)
+        values = np.load(os.path.join(directory, meta['values']), mmap_mode='r')
+        error = np.load(os.path.join(directory, meta['error']), mmap_mode='r')
+        return cls(meta, values, error)
+
+    def evaluate(self, G, T, x, d):
+        """
+        Возвращает (DpDz, оценка относительной ошибки, inside) для всех точек
+        (аргументы транслируются). Вне таблицы DpDz = NaN и inside = False
+        """
+        query = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (G, T, x, d)))
+        shape = query[0].shape
+        parts = [_interp_axis(axis, q.ravel()) for axis, q in zip(self.axes, query)]
+        inside = np.logical_and.reduce([p[2] for p in parts])
+
+        result = np.zeros(inside.shape)
+        for corner in range(16):
+            index, weight = [], np.ones(inside.shape)
+            for k, ((idx, w, _), axis) in enumerate(zip(parts, self.axes)):
+                upper = (corner >> k) & 1
+                index.append(_next(axis, idx) if upper else idx)
+                weight = weight * (w if upper else 1 - w)
+            result += weight * self.values[tuple(index)]
+
+        # Ошибка ячейки (G, x), худшая по соседним узлам T и d
+        (iG, _, _), (iT, _, _), (ix, _, _), (id_, _, _) = parts
+        error = np.zeros(inside.shape)
+        for t in (iT, _next(self.axes[1], iT)):
+            for j in (id_, _next(self.axes[3], id_)):
+                error = np.fmax(error, self.error[iG, t, ix, j])
+
+        result = np.where(inside, result, np.nan)
+        error = np.where(inside, error, np.nan)
+        return result.reshape(shape), error.reshape(shape), inside.reshape(shape)
+
+    def point(self, G, T, x, d):
+        """Одна точка без массивов numpy (для циклов управления); вне таблицы - NaN"""
+        index, weights = [], []
+        for axis, q in zip(self._axis_lists, (G, T, x, d)):
+            if len(axis) == 1:
+                if abs(q - axis[0]) > 1e-9 * abs(axis[0]):
+                    return float('nan')
+                index.append((0, 0))
+                weights.append(0.0)
+                continue
+            if not axis[0] <= q <= axis[-1]:
+                return float('nan')
+            i = min(bisect.bisect_right(axis, q) - 1, len(axis) - 2)
+            index.append((i, i + 1))
+            weights.append((q - axis[i]) / (axis[i + 1] - axis[i]))
+
+        values = self.values
+        result = 0.0
+        for corner in range(16):
+            w = 1.0
+            idx = []
+            for k in range(4):
+                upper = (corner >> k) & 1
+                idx.append(index[k][upper])
+                w *= weights[k] if upper else 1 - weights[k]
+            if w:
+                result += w * float(values[idx[0], idx[1], idx[2], idx[3]])
+        return result
+
+    def __call__(self, G, T, x, d):
+        if all(np.ndim(v) == 0 for v in (G, T, x, d)):
+            return self.point(float(G), float(T), float(x), float(d))
+        return self.evaluate(G, T, x, d)[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сборка таблицы DpDz(G, T, x, d) для вещества")
+    parser.add_argument('substance', help="вещество CoolProp, например CO2")
+    parser.add_argument('--G', required=True, help="сетка G: start:stop:num или список через запятую")
+    parser.add_argument('--T', required=True, help="сетка T, °C (отрицательное начало: --T=-40:20:61)")
+    parser.add_argument('--x', required=True, help="сетка x")
+    parser.add_argument('--d', required=True, help="диаметры, м")
+    parser.add_argument('--ki', type=float, default=None, help="коэффициент Уоллиса (по умолчанию по плотностям)")
+    parser.add_argument('--out', default='tables', help="каталог таблиц")
+    parser.add_argument('--workers', type=int, default=1, help="число процессов")
+    args = parser.parse_args(argv)
+
+    meta_path = build_table(args.substance, parse_axis(args.G), parse_axis(args.T), parse_axis(args.x),
+                            parse_axis(args.d), args.out, ki=args.ki, workers=args.workers)
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    print(f"Таблица записана: {meta_path}, макс. оценка ошибки {meta['max_error']}, "
+          f"точек без решения {meta['missing']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""
+Метрики процесса в текстовом формате Prometheus (без внешних зависимостей).
+
+    from metrics import Counter, Histogram
+
+    POINTS = Counter('dpdz_points_solved_total', "Решенные точки", ('engine',))
+    POINTS.inc(100, engine='vector')
+
+Счетчики и гистограммы обновляются на месте (блокировка и несколько
+сложений на вызов), значения, которые уже считаются в других модулях
+(статистика кэшей, очереди заданий), снимаются только при запросе
+/metrics через register_collector. Поэтому метрики включены всегда.
+Каждый рабочий процесс gunicorn отдает свои значения; Prometheus
+различает их по адресу цели.
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Границы гистограмм длительности, с
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric():
+    kind = None
+
+    def __init__(self, name, documentation, labels=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name}: ожидаются метки {self.labels}")
+        return tuple(labels[name] for name in self.labels)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Монотонно растущее значение"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self):
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+                                for key, value in items]
+
+
+class Gauge(Counter):
+    """Значение, которое может и расти, и уменьшаться"""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Распределение по корзинам, сумма и число наблюдений"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DURATION_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labels, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def collect(self):
+        with self._lock:
+            items = [(key, (list(counts), total, n)) for key, (counts, total, n) in self._values.items()]
+        lines = self.header()
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', _format_value(bound))])} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {n}")
+        return lines
+
+
+class Registry():
+    """Метрики процесса и функции, снимающие значения при запросе"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+            self._metrics[metric.name] = metric
+
+    def register_collector(self, collector):
+        """
+        collector() -> [(имя, тип, описание, [({метки}, значение), ...]), ...];
+        вызывается при каждом запросе /metrics
+        """
+        with self._lock:
+            self._collectors.append(collector)
+        return collector
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        for collector in collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels, labels.values())} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+CALLBACK_DURATION = Histogram('dpdz_callback_duration_seconds', "Длительность callback'ов Dash", ('callback',))
+CALLBACK_ERRORS = Counter('dpdz_callback_errors_total', "Исключения в callback'ах Dash", ('callback',))
+POINTS_SOLVED = Counter('dpdz_points_solved_total', "Рабочие точки, для которых решалось уравнение пленки",
+                        ('engine',))
+SOLVER_FAILURES = Counter('dpdz_solver_failures_total', "Точки без решения уравнения пленки", ('engine',))
+COOLPROP_CALLS = Counter('dpdz_coolprop_evaluations_total', "Вычисления состояний CoolProp (по температурам)",
+                         ('provider',))
+
+
+def timed_callback(func):
+    """Длительность и исключения callback'а в метриках по имени функции"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            CALLBACK_ERRORS.inc(callback=name)
+            raise
+        finally:
+            CALLBACK_DURATION.observe(time.perf_counter() - start, callback=name)
+    return wrapper
+
+
+def _process_metrics():
+    return [
+        ('dpdz_process_start_time_seconds', 'gauge', "Время запуска процесса (unix)", [({}, _START_TIME)]),
+        ('dpdz_process_threads', 'gauge', "Число потоков процесса", [({}, threading.active_count())]),
+        ('dpdz_process_info', 'gauge', "Идентификатор процесса", [({'pid': os.getpid()}, 1)]),
+    ]
+
+
+_START_TIME = time.time()
+REGISTRY.register_collector(_process_metrics)
+
+
+def metrics_response():
+    """Ответ на запрос /metrics"""
+    # Flask не нужен расчетным модулям, которые пишут метрики, поэтому импорт здесь
+    from flask import Response
+    return Response(REGISTRY.render(), headers={'Content-Type': CONTENT_TYPE})
+
+
+def register_metrics(server):
+    """Добавляет маршрут /metrics на Flask-сервер"""
+    server.add_url_rule('/metrics', 'metrics', metrics_response)
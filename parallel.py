@@ -0,0 +1,106 @@
+"""
+Выбор исполнителя для параллельных расчетов: потоки или процессы.
+
+В сборке CPython без GIL (free-threaded, 3.13t/3.14t) потоки считают
+порции действительно параллельно, без запуска процессов и передачи
+аргументов и результатов через pickle, и пишут прямо в общие массивы.
+В обычной сборке с GIL потоки не дают ускорения, поэтому engine='auto'
+выбирает процессы.
+
+У каждого рабочего потока свой CoolPropProvider (свой AbstractState)
+в threading.local: общий источник из properties.get_provider
+защищен блокировкой и стал бы узким местом. Кэш источников тоже свой
+у потока, поэтому блокировки при обращении к нему не нужны.
+
+    python -m parallel bench --workers 1,2,4    # сравнение потоков и процессов
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from properties import CoolPropProvider
+
+ENGINES = ('auto', 'thread', 'process')
+
+_local = threading.local()
+
+
+def free_threaded():
+    """True, если интерпретатор работает без GIL"""
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def resolve_engine(engine='auto'):
+    if engine not in ENGINES:
+        raise ValueError(f"engine должен быть одним из {ENGINES}")
+    if engine == 'auto':
+        return 'thread' if free_threaded() else 'process'
+    return engine
+
+
+def _init_worker_thread():
+    _local.providers = {}
+
+
+def make_executor(workers=None, engine='auto'):
+    """Пул потоков (с источниками свойств на поток) или процессов"""
+    if resolve_engine(engine) == 'thread':
+        return ThreadPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker_thread)
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def worker_properties(substance):
+    """
+    Источник свойств текущего рабочего потока; None вне пула потоков
+    (тогда расчет берет общий источник по умолчанию)
+    """
+    providers = getattr(_local, 'providers', None)
+    if providers is None:
+        return None
+    if substance not in providers:
+        providers[substance] = CoolPropProvider(substance)
+    return providers[substance]
+
+
+def bench(workers=(1, 2, 4), engines=('thread', 'process'), G_num=200, x_num=200, T_num=8, log=print):
+    """Время заполнения карты sweep_map разными исполнителями. Возвращает {(engine, workers): с}"""
+    import numpy as np
+
+    import sweep_map
+    from dpdz_vector import calculate_points
+
+    # Прогрев: импорт scipy и CoolProp не должен попадать в первое измерение
+    calculate_points('CO2', 0, 0.00142, None, 500, 0.5)
+    timings = {}
+    log(f"free-threaded: {free_threaded()}, CPU: {os.cpu_count()}, точек: {T_num * G_num * x_num}")
+    for engine in engines:
+        for n in workers:
+            with tempfile.TemporaryDirectory() as directory:
+                sweep_map.create_map(directory, 'CO2', np.linspace(-30, 10, T_num), [0.00142],
+                                     np.linspace(100, 1000, G_num), np.linspace(0.01, 0.99, x_num),
+                                     max_points=G_num * x_num // 4)
+                start = time.perf_counter()
+                sweep_map.run_map(directory, workers=n, engine=engine, log=lambda *a: None)
+                timings[engine, n] = time.perf_counter() - start
+            base = timings[engine, workers[0]]
+            log(f"  {engine:8s} workers={n}: {timings[engine, n]:.2f} с, ускорение {base / timings[engine, n]:.2f}")
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сравнение потоков и процессов на расчете карты")
+    parser.add_argument('command', choices=['bench'])
+    parser.add_argument('--workers', default='1,2,4', help="числа рабочих через запятую")
+    parser.add_argument('--engines', default='thread,process')
+    args = parser.parse_args(argv)
+    bench(tuple(int(n) for n in args.workers.split(',')), tuple(args.engines.split(',')))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
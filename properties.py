@@ -0,0 +1,243 @@
+"""
+Источники свойств фаз для модели DpDz.
+
+Все методы принимают температуру T, °C (скаляр или массив) и возвращают
+массивы той же формы, поэтому свойства можно считать сразу для многих
+состояний:
+
+    phase_properties(T) -> (плотность жидкости, вязкость жидкости,
+                            плотность газа, вязкость газа)
+    conductivity(T)     -> теплопроводность жидкости
+    reduced_pressure(T) -> приведенное давление
+
+    CoolPropProvider('CO2')                      - линия насыщения (Q=0 / Q=1)
+    GasLiquidProvider('Nitrogen', 'Water', P)    - некипящая пара газ-жидкость при давлении P
+    ConstantProvider(rho_l, mu_l, rho_g, mu_g)   - постоянные свойства
+    TabulatedProvider(T, rho_l, mu_l, ...)       - линейная интерполяция по таблице
+"""
+import abc
+import functools
+import threading
+
+import numpy as np
+
+from lazy_import import lazy_module
+from metrics import COOLPROP_CALLS
+
+CP = lazy_module('CoolProp.CoolProp')
+
+PHASE_COLUMNS = ('Liquid density', 'Liquid viscosity', 'Gas density', 'Gas viscosity')
+
+
+def _to_kelvin(T):
+    # Во всем проекте T в °C переводится в K прибавлением 273
+    return np.asarray(T, dtype=float) + 273
+
+
+class PropertyProvider(abc.ABC):
+    """Интерфейс источника свойств"""
+
+    @abc.abstractmethod
+    def phase_properties(self, T):
+        """(rho_l, mu_l, rho_g, mu_g) в форме T"""
+
+    @abc.abstractmethod
+    def conductivity(self, T):
+        """Теплопроводность жидкости в форме T"""
+
+    @abc.abstractmethod
+    def reduced_pressure(self, T):
+        """Приведенное давление в форме T"""
+
+
+class _AbstractStateProvider(PropertyProvider):
+    """Общая часть источников на CoolProp AbstractState"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        # AbstractState хранит текущее состояние, поэтому один поток за раз
+        self._lock = threading.Lock()
+
+    def _state(self, fluid, mass_fractions=None):
+        state = CP.AbstractState(self.backend, fluid)
+        if mass_fractions is not None:
+            state.set_mass_fractions(list(mass_fractions))
+        return state
+
+    def _evaluate(self, T, func):
+        """Вызывает func(T_K) для каждого различного T и раскладывает результат по форме T"""
+        T_K = _to_kelvin(T)
+        unique, inverse = np.unique(T_K, return_inverse=True)
+        COOLPROP_CALLS.inc(len(unique), provider=type(self).__name__)
+        with self._lock:
+            values = np.array([func(t) for t in unique], dtype=float)
+        return tuple(column[inverse].reshape(T_K.shape) for column in np.atleast_2d(values.T))
+
+
+class CoolPropProvider(_AbstractStateProvider):
+    """Чистое вещество на линии насыщения: жидкость Q=0, пар Q=1"""
+
+    def __init__(self, substance, backend='HEOS'):
+        super().__init__(backend)
+        self.substance = substance
+        self._as = self._state(substance)
+
+    def _saturated(self, T_K, Q):
+        self._as.update(CP.QT_INPUTS, Q, T_K)
+        return self._as
+
+    def _phases(self, T_K):
+        liquid = self._saturated(T_K, 0)
+        rho_l, mu_l = liquid.rhomass(), liquid.viscosity()
+        gas = self._saturated(T_K, 1)
+        return rho_l, mu_l, gas.rhomass(), gas.viscosity()
+
+    def phase_properties(self, T):
+        return self._evaluate(T, self._phases)
+
+    def conductivity(self, T):
+        return self._evaluate(T, lambda T_K: self._saturated(T_K, 0).conductivity())[0]
+
+    def reduced_pressure(self, T):
+        return self._evaluate(T, lambda T_K: self._saturated(T_K, 0).p() / self._as.p_critical())[0]
+
+    def saturation_pressure(self, T):
+        """Давление насыщения, Па"""
+        return self._evaluate(T, lambda T_K: self._saturated(T_K, 0).p())[0]
+
+    def latent_heat(self, T):
+        """Теплота парообразования, Дж/кг"""
+        return self._evaluate(T, lambda T_K: self._saturated(T_K, 1).hmass() - self._saturated(T_K, 0).hmass())[0]
+
+    def triple_temperature(self):
+        """Температура тройной точки, °C"""
+        return self._as.Ttriple() - 273
+
+    def critical_temperature(self):
+        """Критическая температура, °C"""
+        return self._as.T_critical() - 273
+
+    def __repr__(self):
+        return f"CoolPropProvider({self.substance!r}, backend={self.backend!r})"
+
+
+class GasLiquidProvider(_AbstractStateProvider):
+    """
+    Некипящая пара (например, азот - вода): обе фазы однофазные при давлении P, Па.
+    Смеси задаются строкой CoolProp 'Ethanol&Water' и массовыми долями.
+    Приведенное давление считается по критическому давлению газа
+    """
+
+    def __init__(self, gas, liquid, P, backend='HEOS', gas_fractions=None, liquid_fractions=None):
+        super().__init__(backend)
+        self.gas = gas
+        self.liquid = liquid
+        self.P = P
+        self._gas = self._state(gas, gas_fractions)
+        self._liquid = self._state(liquid, liquid_fractions)
+
+    def _phases(self, T_K):
+        self._liquid.update(CP.PT_INPUTS, self.P, T_K)
+        self._gas.update(CP.PT_INPUTS, self.P, T_K)
+        return (self._liquid.rhomass(), self._liquid.viscosity(),
+                self._gas.rhomass(), self._gas.viscosity())
+
+    def _conductivity(self, T_K):
+        self._liquid.update(CP.PT_INPUTS, self.P, T_K)
+        return self._liquid.conductivity()
+
+    def phase_properties(self, T):
+        return self._evaluate(T, self._phases)
+
+    def conductivity(self, T):
+        return self._evaluate(T, self._conductivity)[0]
+
+    def reduced_pressure(self, T):
+        return np.full(np.shape(T), self.P / self._gas.p_critical())
+
+    def __repr__(self):
+        return f"GasLiquidProvider({self.gas!r}, {self.liquid!r}, P={self.P!r})"
+
+
+class ConstantProvider(PropertyProvider):
+    """Свойства, не зависящие от температуры"""
+
+    def __init__(self, liquid_density, liquid_viscosity, gas_density, gas_viscosity,
+                 conductivity=np.nan, reduced_pressure=np.nan):
+        self.values = (liquid_density, liquid_viscosity, gas_density, gas_viscosity)
+        self._conductivity = conductivity
+        self._reduced_pressure = reduced_pressure
+
+    def phase_properties(self, T):
+        return tuple(np.full(np.shape(T), value, dtype=float) for value in self.values)
+
+    def conductivity(self, T):
+        return np.full(np.shape(T), self._conductivity, dtype=float)
+
+    def reduced_pressure(self, T):
+        return np.full(np.shape(T), self._reduced_pressure, dtype=float)
+
+    def __repr__(self):
+        return f"ConstantProvider{self.values!r}"
+
+
+class TabulatedProvider(PropertyProvider):
+    """Линейная интерполяция по таблице свойств от T, °C; вне таблицы - ValueError"""
+
+    def __init__(self, T, liquid_density, liquid_viscosity, gas_density, gas_viscosity,
+                 conductivity=None, reduced_pressure=None):
+        self.T = np.asarray(T, dtype=float)
+        if self.T.ndim != 1 or len(self.T) < 2 or np.any(np.diff(self.T) <= 0):
+            raise ValueError("Температуры таблицы должны строго возрастать (не меньше двух значений)")
+        self.columns = {
+            'phases': [np.asarray(v, dtype=float) for v in
+                       (liquid_density, liquid_viscosity, gas_density, gas_viscosity)],
+            'conductivity': None if conductivity is None else np.asarray(conductivity, dtype=float),
+            'reduced_pressure': None if reduced_pressure is None else np.asarray(reduced_pressure, dtype=float),
+        }
+
+    @classmethod
+    def from_provider(cls, provider, T):
+        """Таблица из другого источника, например CoolPropProvider, на сетке T"""
+        T = np.asarray(T, dtype=float)
+        return cls(T, *provider.phase_properties(T),
+                   conductivity=provider.conductivity(T),
+                   reduced_pressure=provider.reduced_pressure(T))
+
+    @classmethod
+    def from_csv(cls, path, **read_kw):
+        """CSV со столбцами T, Liquid density, Liquid viscosity, Gas density, Gas viscosity
+        и необязательными conductivity, Pred"""
+        import pandas as pd
+        table = pd.read_csv(path, **read_kw).sort_values('T')
+        optional = {name: table[col].to_numpy() for name, col in
+                    (('conductivity', 'conductivity'), ('reduced_pressure', 'Pred')) if col in table}
+        return cls(table['T'].to_numpy(), *(table[col].to_numpy() for col in PHASE_COLUMNS), **optional)
+
+    def _interp(self, T, values):
+        T = np.asarray(T, dtype=float)
+        if np.any((T < self.T[0]) | (T > self.T[-1])):
+            raise ValueError(f"T вне диапазона таблицы [{self.T[0]:g}, {self.T[-1]:g}] °C")
+        return np.interp(T, self.T, values)
+
+    def phase_properties(self, T):
+        return tuple(self._interp(T, values) for values in self.columns['phases'])
+
+    def conductivity(self, T):
+        if self.columns['conductivity'] is None:
+            return np.full(np.shape(T), np.nan)
+        return self._interp(T, self.columns['conductivity'])
+
+    def reduced_pressure(self, T):
+        if self.columns['reduced_pressure'] is None:
+            return np.full(np.shape(T), np.nan)
+        return self._interp(T, self.columns['reduced_pressure'])
+
+    def __repr__(self):
+        return f"TabulatedProvider(T=[{self.T[0]:g}..{self.T[-1]:g}], {len(self.T)} точек)"
+
+
+@functools.lru_cache(maxsize=None)
+def get_provider(substance):
+    """Источник свойств по умолчанию: насыщение по CoolProp (один на вещество)"""
+    return CoolPropProvider(substance)
@@ -0,0 +1,163 @@
+"""
+Потоковый экспорт результатов расчета в CSV, Parquet и Excel.
+
+Каждая функция iter_* - генератор, который отдает файл кусками (bytes),
+поэтому файл целиком не собирается ни в памяти сервера, ни в браузере.
+"""
+import datetime
+import io
+import tempfile
+
+# Размер порции строк и размер куска при чтении временного файла
+CHUNK_ROWS = 5000
+CHUNK_BYTES = 64 * 1024
+
+# Формат -> (MIME-тип, расширение файла)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+# Подписи параметров для шапки CSV
+META_LABELS = [
+    ('substance', 'Вещество', ''),
+    ('d', 'Диаметр', ' м'),
+    ('G', 'Массовый расход', ' кг/м²с'),
+    ('T', 'Температура', ' °C'),
+    ('g', 'Ускорение свободного падения', ' м/с²'),
+    ('num_points', 'Количество точек', ''),
+    ('P', 'Давление', ' Па'),
+    ('ki', 'Коэффициент ki', ''),
+    ('timestamp', 'Дата расчета', ''),
+]
+
+
+def generate_filename(substance, fmt, timestamp=None):
+    """Имя файла с временной меткой"""
+    if timestamp is None:
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"results_{substance}_{timestamp}.{EXPORT_FORMATS[fmt][1]}"
+
+
+def _meta_header(params):
+    lines = ["# Результаты расчета гидродинамических характеристик"]
+    for key, label, unit in META_LABELS:
+        if params.get(key) is not None:
+            lines.append(f"# {label}: {params[key]}{unit}")
+    if params.get('x_start') is not None:
+        lines.append(f"# Диапазон паросодержания: {params['x_start']} - {params.get('x_end')}")
+    return "\n".join(lines) + "\n# \n"
+
+
+def iter_csv(results_df, params=None, chunk_rows=CHUNK_ROWS):
+    """CSV: шапка с параметрами, затем данные порциями по chunk_rows строк"""
+    if params:
+        yield _meta_header(params).encode('utf-8')
+    for start in range(0, max(len(results_df), 1), chunk_rows):
+        chunk = results_df.iloc[start:start + chunk_rows]
+        yield chunk.to_csv(index=False, header=(start == 0)).encode('utf-8')
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Для экспорта в Parquet установите пакет pyarrow")
+    return pa, pq
+
+
+class _DrainBuffer(io.RawIOBase):
+    """Файлоподобный приемник: копит записанное до вызова drain()"""
+
+    def __init__(self):
+        super().__init__()
+        self._buf = bytearray()
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buf += data
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self):
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+
+def iter_parquet(results_df, params=None, chunk_rows=CHUNK_ROWS):
+    """Parquet: каждая порция строк - отдельная row group, отдается сразу после записи"""
+    pa, pq = _require_pyarrow()
+
+    table = pa.Table.from_pandas(results_df, preserve_index=False)
+    if params:
+        meta = {f'dpdz.{k}': str(v) for k, v in params.items() if v is not None}
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **meta})
+
+    sink = _DrainBuffer()
+    writer = pq.ParquetWriter(sink, table.schema)
+    try:
+        for batch in table.to_batches(max_chunksize=chunk_rows):
+            writer.write_table(pa.Table.from_batches([batch], schema=table.schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_xlsx(results_df, params=None, chunk_rows=CHUNK_ROWS):
+    """
+    Excel: openpyxl в режиме write-only пишет строки во временный файл на диске,
+    готовый xlsx (zip-архив) читается и отдается кусками по CHUNK_BYTES
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Results')
+    ws.append(list(results_df.columns))
+    for start in range(0, len(results_df), chunk_rows):
+        chunk = results_df.iloc[start:start + chunk_rows]
+        for row in chunk.itertuples(index=False, name=None):
+            ws.append([v.item() if hasattr(v, 'item') else v for v in row])
+
+    if params:
+        ws_params = wb.create_sheet('Parameters')
+        for key, value in params.items():
+            if value is not None:
+                ws_params.append([key, str(value)])
+
+    with tempfile.TemporaryFile() as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        while True:
+            data = tmp.read(CHUNK_BYTES)
+            if not data:
+                break
+            yield data
+
+
+EXPORTERS = {
+    'csv': iter_csv,
+    'parquet': iter_parquet,
+    'xlsx': iter_xlsx,
+}
+
+
+def stream_export(results_df, fmt, params=None, chunk_rows=CHUNK_ROWS):
+    """Генератор кусков файла в формате fmt"""
+    if fmt not in EXPORTERS:
+        raise ValueError(f"Неизвестный формат экспорта: {fmt}")
+    if fmt == 'parquet':
+        # Проверяем зависимость до начала отдачи ответа
+        _require_pyarrow()
+    return EXPORTERS[fmt](results_df, params, chunk_rows)
@@ -0,0 +1,204 @@
+"""
+Серверное хранилище результатов расчета.
+
+В браузер уходит только пара (session_id, run_id), сами данные остаются
+на сервере. Хранилище ограничено по числу записей (вытесняются самые
+давно использованные) и по времени жизни записи (TTL).
+
+ResultStore держит данные в памяти процесса, DiskResultStore - в общем
+каталоге на диске, поэтому его видят все рабочие процессы WSGI-сервера.
+"""
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Значения по умолчанию: число записей и время жизни записи, с
+MAX_ENTRIES = 128
+TTL_SECONDS = 60 * 60
+
+# Переменная окружения с каталогом общего хранилища
+RESULT_DIR_ENV = 'DPDZ_RESULT_DIR'
+
+_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+def valid_session_id(session_id):
+    """Идентификатор в формате new_session_id (его принимают оба хранилища)"""
+    return isinstance(session_id, str) and bool(_ID_PATTERN.match(session_id))
+
+
+class ResultStore():
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._items = OrderedDict()   # (session_id, run_id) -> (время записи, запись)
+        self._lock = threading.Lock()
+
+    def _evict_expired(self, now):
+        expired = [key for key, (stamp, _) in self._items.items() if now - stamp > self.ttl]
+        for key in expired:
+            del self._items[key]
+
+    def put(self, session_id, results_df, params=None, run_id=None):
+        """Сохраняет результат и возвращает run_id (новый, если не задан; заданный - перезаписывается)"""
+        run_id = run_id or uuid.uuid4().hex
+        now = self._clock()
+        with self._lock:
+            self._evict_expired(now)
+            self._items.pop((session_id, run_id), None)
+            self._items[(session_id, run_id)] = (now, {'results': results_df, 'params': params or {}})
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return run_id
+
+    def get(self, session_id, run_id):
+        """Возвращает запись {'results': DataFrame, 'params': dict} или None"""
+        key = (session_id, run_id)
+        now = self._clock()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            stamp, entry = item
+            if now - stamp > self.ttl:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return entry
+
+    def get_handle(self, handle):
+        """То же, что get, но по словарю из dcc.Store"""
+        if not handle:
+            return None
+        return self.get(handle.get('session_id'), handle.get('run_id'))
+
+    def delete(self, session_id, run_id):
+        with self._lock:
+            self._items.pop((session_id, run_id), None)
+
+    def drop_session(self, session_id):
+        with self._lock:
+            for key in [k for k in self._items if k[0] == session_id]:
+                del self._items[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+
+class DiskResultStore():
+    """
+    Хранилище результатов в каталоге на диске, общее для нескольких процессов.
+    Время жизни считается по времени изменения файла, чтение обновляет его.
+    """
+
+    def __init__(self, directory, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id, run_id):
+        # Идентификаторы приходят из URL, поэтому пускаем только hex
+        if not (session_id and run_id and _ID_PATTERN.match(session_id) and _ID_PATTERN.match(run_id)):
+            return None
+        return os.path.join(self.directory, f'{session_id}_{run_id}.pkl')
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                path = os.path.join(self.directory, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except FileNotFoundError:
+                    pass
+        return entries
+
+    def _evict(self):
+        now = time.time()
+        entries = sorted(self._entries())
+        alive = []
+        for stamp, path in entries:
+            if now - stamp > self.ttl:
+                _remove(path)
+            else:
+                alive.append(path)
+        for path in alive[:max(len(alive) - self.max_entries, 0)]:
+            _remove(path)
+
+    def put(self, session_id, results_df, params=None, run_id=None):
+        run_id = run_id or uuid.uuid4().hex
+        path = self._path(session_id, run_id)
+        if path is None:
+            raise ValueError(f"Некорректный идентификатор сессии: {session_id}")
+
+        # Атомарная запись: другие процессы не увидят недописанный файл
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump({'results': results_df, 'params': params or {}}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._evict()
+        return run_id
+
+    def get(self, session_id, run_id):
+        path = self._path(session_id, run_id)
+        if path is None:
+            return None
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                _remove(path)
+                return None
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            os.utime(path)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        return entry
+
+    def get_handle(self, handle):
+        if not handle:
+            return None
+        return self.get(handle.get('session_id'), handle.get('run_id'))
+
+    def delete(self, session_id, run_id):
+        path = self._path(session_id, run_id)
+        if path is not None:
+            _remove(path)
+
+    def drop_session(self, session_id):
+        for _, path in self._entries():
+            if os.path.basename(path).startswith(f'{session_id}_'):
+                _remove(path)
+
+    def __len__(self):
+        return len(self._entries())
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def make_result_store(directory=None, **kwargs):
+    """
+    Выбирает хранилище: если задан каталог (аргументом или через DPDZ_RESULT_DIR),
+    результаты хранятся на диске и общие для всех процессов, иначе - в памяти
+    """
+    directory = directory or os.environ.get(RESULT_DIR_ENV)
+    if directory:
+        return DiskResultStore(directory, **kwargs)
+    return ResultStore(**kwargs)
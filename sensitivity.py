@@ -0,0 +1,140 @@
+"""
+Чувствительности DpDz к входным данным по теореме о неявной функции.
+
+Толщина пленки B задана неявно уравнением R(B, p) = 0 (dpdz_vector.residual),
+поэтому после одного решения в каждой точке
+
+    dB/dp    = -(dR/dp) / (dR/dB)
+    dDpDz/dp = dDpDz/dp + dDpDz/dB * dB/dp
+
+Частные производные явных формул считаются комплексным шагом (точно до
+машинной точности), производные свойств фаз по T - центральной разностью
+источника свойств. Перерешивать уравнение для возмущенных входов не нужно.
+
+    sens = sensitivities('CO2', T=-10, d=0.00142, ki=None, G=300, x=np.linspace(0.1, 0.9, 50))
+    sens[['x', 'DpDz', 'dDpDz/dG', 'dDpDz/dx', 'dDpDz/dT', 'dDpDz/dd', 'dDpDz/dki']]
+
+При ki=None dDpDz/dki - производная по фактическому коэффициенту Уоллиса
+24 (rho_l / rho_g)^(1/3).
+"""
+import numpy as np
+
+from dpdz_vector import STATUS_OK, calculate_points, effective_ki, interfacial_stress, residual, solve_film
+from lazy_import import lazy_module
+from properties import get_provider
+
+pd = lazy_module('pandas')
+
+# Шаг комплексного дифференцирования
+COMPLEX_STEP = 1.0e-30
+
+# Шаг по температуре для производных свойств, °C
+T_STEP = 1.0e-3
+
+# Входы, по которым считаются производные
+INPUTS = ('G', 'x', 'T', 'd', 'ki')
+
+# Параметры явных формул: (G, x, d, ki_eff, rho_l, mu_l, rho_g, mu_g)
+PARAMS = ('G', 'x', 'd', 'ki', 'rho_l', 'mu_l', 'rho_g', 'mu_g')
+
+
+def _residual(B, G, x, d, ki_eff, rho_l, mu_l, rho_g, mu_g):
+    jl = G * (1 - x) / rho_l
+    jg = G * x / rho_g
+    return residual(B, jg, jl, d, ki_eff, rho_l, rho_g, mu_l, mu_g)
+
+
+def _dpdz(B, G, x, d, ki_eff, rho_l, mu_l, rho_g, mu_g):
+    jg = G * x / rho_g
+    return 4.0 * interfacial_stress(B, jg, d, ki_eff, rho_g, mu_g) / (d - 2 * B)
+
+
+def _complex_partials(func, B, params):
+    """Частные производные func по B и по каждому параметру (комплексный шаг)"""
+    h = COMPLEX_STEP
+    d_B = np.imag(func(B + 1j * h, *params)) / h
+    d_params = []
+    for i in range(len(params)):
+        shifted = list(params)
+        shifted[i] = params[i] + 1j * h
+        d_params.append(np.imag(func(B, *shifted)) / h)
+    return d_B, d_params
+
+
+def _state(provider, T, ki):
+    rho_l, mu_l, rho_g, mu_g = (float(v) for v in provider.phase_properties(T))
+    ki_eff = float(effective_ki(np.nan if ki is None else ki, rho_l, rho_g))
+    return ki_eff, rho_l, mu_l, rho_g, mu_g
+
+
+def sensitivities(substance, T, d, ki, G, x, properties=None):
+    """
+    DpDz, B и их производные по G, x, T, d, ki для пар (G, x) при одном веществе и T.
+    Возвращает DataFrame со столбцами x, G, B, DpDz, status, dDpDz/d*, dB/d*
+    """
+    provider = properties if properties is not None else get_provider(substance)
+    ki_eff, rho_l, mu_l, rho_g, mu_g = _state(provider, T, ki)
+
+    G, x = np.broadcast_arrays(np.asarray(G, dtype=float), np.asarray(x, dtype=float))
+    G, x = G.ravel(), x.ravel()
+    d = np.full_like(G, d, dtype=float)
+    jl = G * (1 - x) / rho_l
+    jg = G * x / rho_g
+
+    B, status = solve_film(jg, jl, d, ki_eff, rho_l, rho_g, mu_l, mu_g)
+    params = (G, x, d, np.full_like(G, ki_eff), np.full_like(G, rho_l), np.full_like(G, mu_l),
+              np.full_like(G, rho_g), np.full_like(G, mu_g))
+
+    with np.errstate(all='ignore'):
+        dpdz = _dpdz(B, *params)
+        dR_dB, dR_dp = _complex_partials(_residual, B, params)
+        dD_dB, dD_dp = _complex_partials(_dpdz, B, params)
+
+        # Теорема о неявной функции
+        dB = {name: -dR / dR_dB for name, dR in zip(PARAMS, dR_dp)}
+        dD = {name: dDp + dD_dB * dB[name] for name, dDp in zip(PARAMS, dD_dp)}
+
+    # T входит через свойства фаз (и через ki_eff при ki=None)
+    upper = _state(provider, T + T_STEP, ki)
+    lower = _state(provider, T - T_STEP, ki)
+    dstate_dT = [(u - l) / (2 * T_STEP) for u, l in zip(upper, lower)]
+    if ki is not None:
+        dstate_dT[0] = 0.0
+    state_params = ('ki', 'rho_l', 'mu_l', 'rho_g', 'mu_g')
+    dB['T'] = sum(dB[name] * dv for name, dv in zip(state_params, dstate_dT))
+    dD['T'] = sum(dD[name] * dv for name, dv in zip(state_params, dstate_dT))
+
+    columns = {'x': x, 'G': G, 'B': B, 'DpDz': dpdz, 'status': status}
+    columns.update({f'dDpDz/d{name}': dD[name] for name in INPUTS})
+    columns.update({f'dB/d{name}': dB[name] for name in INPUTS})
+    return pd.DataFrame(columns)
+
+
+def finite_difference_check(substance, T, d, ki, G, x, rel_step=1.0e-5, properties=None):
+    """
+    Сравнение производных с центральными разностями по полному пересчету
+    calculate_points. Возвращает DataFrame: вход, максимальная относительная
+    ошибка по точкам
+    """
+    sens = sensitivities(substance, T, d, ki, G, x, properties=properties)
+    base = {'G': sens['G'].to_numpy(), 'x': sens['x'].to_numpy(), 'T': float(T), 'd': float(d), 'ki': ki}
+    ok = (sens['status'] == STATUS_OK).to_numpy()
+
+    rows = []
+    for name in INPUTS:
+        if name == 'ki' and ki is None:
+            continue
+        value = base[name]
+        step = rel_step * np.where(value != 0, np.abs(value), 1.0) if name != 'T' else T_STEP
+        values = []
+        for sign in (1, -1):
+            shifted = dict(base)
+            shifted[name] = value + sign * step
+            values.append(calculate_points(substance, shifted['T'], shifted['d'], shifted['ki'],
+                                           shifted['G'], shifted['x'], properties=properties)['DpDz'].to_numpy())
+        fd = (values[0] - values[1]) / (2 * step)
+        analytic = sens[f'dDpDz/d{name}'].to_numpy()
+        with np.errstate(all='ignore'):
+            error = np.abs(analytic - fd) / np.maximum(np.abs(fd), np.finfo(float).tiny)
+        rows.append({'input': name, 'max_rel_error': float(np.max(error[ok], initial=0.0))})
+    return pd.DataFrame(rows)
@@ -0,0 +1,250 @@
+"""
+Распределенный расчет карты (sweep_map) на нескольких машинах.
+
+Порции карты - это шарды. Они публикуются в очередь SQLite в общем
+каталоге, внешний сервис не нужен. Рабочий на любой машине берет шард в
+аренду (lease), продлевает ее, пока считает, и сдает результат файлом
+shards/<номер>.npz. Аренда, которую не продлили (рабочий пропал), истекает,
+и шард снова выдается: рабочий без свободных шардов не завершается, пока
+другие держат аренды, и забирает шард пропавшего по окончании аренды. Повторная сдача того же шарда ничего не портит:
+файл результата записывается атомарно и одинаков при любом исполнителе.
+Сборка (merge) переносит готовые шарды в массивы карты.
+
+    python -m sweep_map map.json --create-only   # только создать карту
+    python -m shard_queue publish Results/maps/co2
+    python -m shard_queue worker Results/maps/co2  # на каждой машине
+    python -m shard_queue merge Results/maps/co2
+    python -m shard_queue status Results/maps/co2
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import numpy as np
+
+import sweep_map
+
+QUEUE_FILE = 'queue.sqlite'
+SHARDS_DIR = 'shards'
+
+# Длительность аренды, с; рабочий продлевает ее каждые LEASE_SECONDS / 3
+LEASE_SECONDS = 600
+
+STATE_PENDING = 'pending'
+STATE_LEASED = 'leased'
+STATE_DONE = 'done'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated REAL
+)
+"""
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class ShardQueue():
+    """Очередь шардов в файле SQLite"""
+
+    def __init__(self, path, lease_seconds=LEASE_SECONDS, clock=time.time):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+        with self._connect() as db:
+            db.execute(_SCHEMA)
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        db.execute('PRAGMA busy_timeout = 60000')
+        return _Transaction(db)
+
+    def publish(self, shards):
+        """Добавляет шарды {id: payload}; уже опубликованные не меняются"""
+        with self._connect() as db:
+            db.executemany('INSERT OR IGNORE INTO shards (id, payload, updated) VALUES (?, ?, ?)',
+                           [(int(k), json.dumps(payload), self.clock()) for k, payload in shards.items()])
+
+    def claim(self, worker_id):
+        """Берет в аренду свободный шард или шард с истекшей арендой. Возвращает (id, payload) или None"""
+        now = self.clock()
+        with self._connect() as db:
+            row = db.execute(
+                'SELECT id, payload FROM shards WHERE state = ? OR (state = ? AND lease_expires < ?) '
+                'ORDER BY id LIMIT 1', (STATE_PENDING, STATE_LEASED, now)).fetchone()
+            if row is None:
+                return None
+            db.execute('UPDATE shards SET state = ?, owner = ?, lease_expires = ?, attempts = attempts + 1, '
+                       'updated = ? WHERE id = ?', (STATE_LEASED, worker_id, now + self.lease_seconds, now, row[0]))
+        return row[0], json.loads(row[1])
+
+    def renew(self, shard_id, worker_id):
+        """Продлевает аренду; False, если шард уже отдан другому рабочему или сдан"""
+        now = self.clock()
+        with self._connect() as db:
+            cursor = db.execute('UPDATE shards SET lease_expires = ?, updated = ? '
+                                'WHERE id = ? AND owner = ? AND state = ?',
+                                (now + self.lease_seconds, now, shard_id, worker_id, STATE_LEASED))
+            return cursor.rowcount == 1
+
+    def complete(self, shard_id, worker_id):
+        """Отмечает шард готовым (повторная отметка безопасна)"""
+        with self._connect() as db:
+            db.execute('UPDATE shards SET state = ?, owner = ?, lease_expires = NULL, updated = ? '
+                       'WHERE id = ? AND state != ?', (STATE_DONE, worker_id, self.clock(), shard_id, STATE_DONE))
+
+    def counts(self):
+        now = self.clock()
+        with self._connect() as db:
+            rows = db.execute('SELECT state, lease_expires < ? AS expired, COUNT(*) FROM shards '
+                              'GROUP BY state, expired', (now,)).fetchall()
+        counts = {STATE_PENDING: 0, STATE_LEASED: 0, STATE_DONE: 0, 'expired': 0}
+        for state, expired, n in rows:
+            counts[state] += n
+            if state == STATE_LEASED and expired:
+                counts['expired'] += n
+        return counts
+
+    def next_expiry(self):
+        """Ближайшее окончание аренды среди выданных шардов или None, если выданных нет"""
+        with self._connect() as db:
+            return db.execute('SELECT MIN(lease_expires) FROM shards WHERE state = ?', (STATE_LEASED,)).fetchone()[0]
+
+    def done_ids(self):
+        with self._connect() as db:
+            return [row[0] for row in db.execute('SELECT id FROM shards WHERE state = ? ORDER BY id', (STATE_DONE,))]
+
+
+class _Transaction():
+    """Соединение с BEGIN IMMEDIATE: выдача шарда не пересекается с другими рабочими"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, *exc):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
+        self.db.close()
+
+
+def queue_for(directory, **kw):
+    return ShardQueue(os.path.join(directory, QUEUE_FILE), **kw)
+
+
+def shard_path(directory, shard_id):
+    return os.path.join(directory, SHARDS_DIR, f"{shard_id}.npz")
+
+
+def publish_map(directory, **kw):
+    """Публикует все порции карты как шарды"""
+    meta = sweep_map.load_meta(directory)
+    queue = queue_for(directory, **kw)
+    queue.publish({k: {'chunk': chunk} for k, chunk in enumerate(meta['chunks'])})
+    return queue
+
+
+def _save_shard(directory, shard_id, arrays):
+    os.makedirs(os.path.join(directory, SHARDS_DIR), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.join(directory, SHARDS_DIR), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, shard_path(directory, shard_id))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _keep_lease(queue, shard_id, worker_id, stop):
+    while not stop.wait(queue.lease_seconds / 3):
+        if not queue.renew(shard_id, worker_id):
+            return
+
+
+def run_worker(directory, worker_id=None, max_shards=None, log=print, sleep=time.sleep, **kw):
+    """
+    Берет и считает шарды, пока все они не сданы. Если свободных нет, но другие
+    рабочие еще держат аренды, ждет ближайшего их окончания: шард пропавшего
+    рабочего будет взят снова. Возвращает число сданных шардов
+    """
+    worker_id = worker_id or default_worker_id()
+    queue = queue_for(directory, **kw)
+    meta = sweep_map.load_meta(directory)
+    completed = 0
+    while max_shards is None or completed < max_shards:
+        claimed = queue.claim(worker_id)
+        if claimed is None:
+            expiry = queue.next_expiry()
+            if expiry is None:
+                break
+            # Живой рабочий продлевает аренду раньше, тогда ждем следующего окончания
+            sleep(min(max(expiry - queue.clock(), 0.0), queue.lease_seconds) + 0.01)
+            continue
+        shard_id, _ = claimed
+        stop = threading.Event()
+        keeper = threading.Thread(target=_keep_lease, args=(queue, shard_id, worker_id, stop), daemon=True)
+        keeper.start()
+        try:
+            _save_shard(directory, shard_id, sweep_map.compute_chunk(meta, shard_id))
+        finally:
+            stop.set()
+            keeper.join()
+        queue.complete(shard_id, worker_id)
+        completed += 1
+        log(f"{worker_id}: шард {shard_id} готов")
+    return completed
+
+
+def merge(directory, log=print):
+    """Переносит сданные шарды в массивы карты (повторный запуск безопасен)"""
+    meta = sweep_map.load_meta(directory)
+    pending = set(sweep_map.pending_chunks(directory))
+    merged = 0
+    for shard_id in queue_for(directory).done_ids():
+        if shard_id in pending:
+            with np.load(shard_path(directory, shard_id)) as shard:
+                sweep_map.write_chunk(directory, meta, shard_id, {name: shard[name] for name in shard.files})
+            merged += 1
+    left = len(sweep_map.pending_chunks(directory))
+    log(f"Собрано шардов: {merged}, осталось порций: {left}")
+    return merged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Распределенный расчет карты DpDz через очередь шардов")
+    parser.add_argument('command', choices=['publish', 'worker', 'merge', 'status'])
+    parser.add_argument('directory', help="каталог карты (sweep_map)")
+    parser.add_argument('--lease', type=float, default=LEASE_SECONDS, help="длительность аренды, с")
+    parser.add_argument('--max-shards', type=int, default=None, help="сколько шардов взять рабочему")
+    args = parser.parse_args(argv)
+
+    if args.command == 'publish':
+        print(publish_map(args.directory, lease_seconds=args.lease).counts())
+    elif args.command == 'worker':
+        run_worker(args.directory, max_shards=args.max_shards, lease_seconds=args.lease)
+    elif args.command == 'merge':
+        merge(args.directory)
+    else:
+        print(queue_for(args.directory, lease_seconds=args.lease).counts())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""
+Пакетный расчет параметрических исследований из командной строки.
+
+    python -m study spec.json [--workers 4] [--engine auto|thread|process] [--restart] [--overwrite]
+
+Файл исследования (JSON):
+    {
+        "name": "co2_graph9",
+        "substance": "CO2",
+        "d": 0.00142,
+        "ki": null,
+        "T": [-10],
+        "G": [300, 400, 500, 600],
+        "x": {"start": 0.1, "stop": 0.9, "num": 50},
+        "group_by": "G",
+        "output": "Results"
+    }
+
+T, G и x задаются списком значений или диапазоном {"start", "stop", "num"}.
+Каждая кривая (T, G) - отдельная порция. Готовые порции сохраняются в
+<output>/<substance>/.study_<name>/, поэтому прерванный запуск (в том числе
+Ctrl-C) продолжается с места остановки. Контрольные точки помечены
+отпечатком вещества, d, ki и сетки x: если они поменялись, запуск
+отказывается продолжать старые порции (нужен --restart).
+
+После расчета всех порций результаты раскладываются так же, как в ноутбуках:
+<output>/<substance>/<group_by>/<значение>.csv (те же столбцы, без status).
+Файлы, которые записало не это исследование, перезаписываются только
+с --overwrite.
+
+Скорость на границе раздела фаз (value_fb) векторный движок не учитывает
+(DpDz.wb всегда 0), поэтому "value_fb": true отклоняется.
+
+Результаты - текст CSV, поэтому компактного хранения (precision) здесь
+нет: для больших сеток - sweep_map с "precision": "float32".
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import as_completed
+
+import pandas as pd
+
+from dpdz_vector import calculate_points
+from grids import expand_grid
+from parallel import ENGINES, make_executor, worker_properties
+
+REQUIRED_FIELDS = ('name', 'substance', 'd', 'T', 'G', 'x')
+
+# Файлы в каталоге контрольных точек: отпечаток исследования и записанные им результаты
+FINGERPRINT_FILE = 'fingerprint'
+WRITTEN_FILE = 'written.json'
+
+
+def load_spec(path):
+    with open(path, encoding='utf-8') as f:
+        return load_spec_dict(json.load(f))
+
+
+def load_spec_dict(spec):
+    """Проверяет описание исследования и заполняет значения по умолчанию"""
+    missing = [field for field in REQUIRED_FIELDS if field not in spec]
+    if missing:
+        raise ValueError(f"В файле исследования не заданы поля: {', '.join(missing)}")
+    spec.setdefault('ki', None)
+    spec.setdefault('group_by', 'G')
+    spec.setdefault('output', 'Results')
+    if spec['group_by'] not in ('G', 'T'):
+        raise ValueError("group_by должен быть 'G' или 'T'")
+    if spec.get('precision', 'float64') != 'float64':
+        raise ValueError("precision в исследованиях не поддерживается: результаты пишутся в CSV "
+                         "(компактное хранение - sweep_map)")
+    if spec.pop('value_fb', False):
+        raise ValueError("value_fb в исследованиях не поддерживается: векторный движок считает при w_b = 0")
+    return spec
+
+
+def _format_value(value):
+    # 300.0 -> "300", -10.0 -> "-10" (как имена файлов в Results)
+    return f"{value:g}"
+
+
+def plan_chunks(spec):
+    """Порции расчета: одна кривая по x для каждой пары (T, G)"""
+    return [
+        {'id': f"T{_format_value(T)}_G{_format_value(G)}", 'T': float(T), 'G': float(G)}
+        for T in expand_grid(spec['T'])
+        for G in expand_grid(spec['G'])
+    ]
+
+
+def checkpoint_dir(spec):
+    return os.path.join(spec['output'], spec['substance'], f".study_{spec['name']}")
+
+
+def spec_fingerprint(spec):
+    """Хэш того, от чего зависит каждая порция (кроме ее T и G): вещество, d, ki и сетка x"""
+    key = json.dumps({'substance': spec['substance'], 'd': float(spec['d']), 'ki': spec['ki'],
+                      'x': expand_grid(spec['x']).tolist()})
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def _check_fingerprint(spec, directory):
+    path = os.path.join(directory, FINGERPRINT_FILE)
+    fingerprint = spec_fingerprint(spec)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            if f.read().strip() != fingerprint:
+                raise ValueError(f"Контрольные точки в {directory} посчитаны для другого вещества, d, ki "
+                                 "или сетки x: запустите с --restart")
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(fingerprint)
+
+
+def _read_written(directory):
+    path = os.path.join(directory, WRITTEN_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_atomic(df, path):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        # Прерванная запись не должна оставлять мусор в контрольных точках
+        os.remove(tmp_path)
+        raise
+
+
+def run_chunk(spec, chunk, directory):
+    """Расчет одной порции в рабочем процессе, результат сразу пишется на диск"""
+    x = expand_grid(spec['x'])
+    results_df = calculate_points(spec['substance'], chunk['T'], spec['d'], spec['ki'], chunk['G'], x,
+                                  properties=worker_properties(spec['substance']))
+    _write_atomic(results_df, os.path.join(directory, f"{chunk['id']}.csv"))
+    return chunk['id'], int((results_df['status'] != 0).sum())
+
+
+def assemble(spec, chunks, directory, overwrite=False):
+    """
+    Раскладывает готовые порции по файлам <output>/<substance>/<group_by>/<значение>.csv.
+    Чужие файлы (их записало не это исследование) перезаписываются только при overwrite
+    """
+    if not chunks:
+        return []
+    group_by = spec['group_by']
+    out_dir = os.path.join(spec['output'], spec['substance'], group_by)
+
+    frames = pd.concat([pd.read_csv(os.path.join(directory, f"{chunk['id']}.csv")) for chunk in chunks],
+                       ignore_index=True)
+    groups = [(os.path.join(out_dir, f"{_format_value(value)}.csv"), group)
+              for value, group in frames.groupby(group_by, sort=True)]
+    owned = set(_read_written(directory))
+    foreign = [path for path, _ in groups if os.path.exists(path) and path not in owned]
+    if foreign and not overwrite:
+        raise FileExistsError(f"Файлы уже существуют и записаны не этим исследованием: {', '.join(foreign)} "
+                              "(перезапись - --overwrite)")
+
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for path, group in groups:
+        # Столбцы как в файлах ноутбуков: статус решения остается в контрольных точках
+        group.drop(columns='status').reset_index(drop=True).to_csv(path, index=True)
+        written.append(path)
+    with open(os.path.join(directory, WRITTEN_FILE), 'w', encoding='utf-8') as f:
+        json.dump(sorted(owned | set(written)), f, ensure_ascii=False, indent=2)
+    return written
+
+
+def run_study(spec, workers=None, restart=False, engine='auto', log=print, overwrite=False):
+    """
+    Считает все незавершенные порции исследования и собирает результаты.
+    Возвращает список записанных файлов
+    """
+    directory = checkpoint_dir(spec)
+    written = _read_written(directory)
+    if restart and os.path.isdir(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory, exist_ok=True)
+    if restart and written:
+        # Свои результаты исследование перезаписывает и после --restart
+        with open(os.path.join(directory, WRITTEN_FILE), 'w', encoding='utf-8') as f:
+            json.dump(written, f, ensure_ascii=False, indent=2)
+    _check_fingerprint(spec, directory)
+
+    for name in os.listdir(directory):
+        if name.endswith('.tmp'):
+            os.remove(os.path.join(directory, name))
+
+    chunks = plan_chunks(spec)
+    done = {name[:-4] for name in os.listdir(directory) if name.endswith('.csv')}
+    pending = [chunk for chunk in chunks if chunk['id'] not in done]
+    log(f"Исследование {spec['name']}: порций {len(chunks)}, готово {len(chunks) - len(pending)}")
+
+    if pending:
+        executor = make_executor(workers, engine)
+        try:
+            futures = [executor.submit(run_chunk, spec, chunk, directory) for chunk in pending]
+            for i, future in enumerate(as_completed(futures), 1):
+                chunk_id, failed = future.result()
+                note = f", без решения: {failed} точек" if failed else ""
+                log(f"  [{len(chunks) - len(pending) + i}/{len(chunks)}] {chunk_id}{note}")
+        except KeyboardInterrupt:
+            log(f"Прервано. Готовые порции сохранены в {directory}, повторный запуск продолжит расчет")
+            raise
+        finally:
+            # После ошибки или прерывания оставшиеся порции отменяются, пул закрывается в любом случае
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    written = assemble(spec, chunks, directory, overwrite=overwrite)
+    if written:
+        log(f"Записано файлов: {len(written)} в {os.path.dirname(written[0])}")
+    else:
+        log("Сетка исследования пуста, файлы не записаны")
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный расчет параметрического исследования DpDz")
+    parser.add_argument('spec', help="JSON-файл исследования")
+    parser.add_argument('--workers', type=int, default=None, help="число рабочих процессов")
+    parser.add_argument('--engine', choices=ENGINES, default='auto', help="потоки или процессы (parallel.py)")
+    parser.add_argument('--restart', action='store_true', help="удалить контрольные точки и начать заново")
+    parser.add_argument('--overwrite', action='store_true', help="перезаписать существующие файлы результатов")
+    args = parser.parse_args(argv)
+
+    try:
+        run_study(load_spec(args.spec), workers=args.workers, restart=args.restart, engine=args.engine,
+                  overwrite=args.overwrite)
+    except KeyboardInterrupt:
+        return 130
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
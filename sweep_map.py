@@ -0,0 +1,227 @@
+"""
+Карты расчета, которые не помещаются в память: результаты пишутся прямо
+в файлы np.memmap на диске.
+
+    python -m sweep_map map.json [--workers 4] [--engine auto|thread|process] [--create-only]
+
+Файл карты (JSON), T, d, G и x - списки или {"start", "stop", "num"}:
+    {
+        "substance": "CO2",
+        "T": {"start": -40, "stop": 20, "num": 61},
+        "d": [0.00142],
+        "G": {"start": 100, "stop": 1000, "num": 1000},
+        "x": {"start": 0.01, "stop": 0.99, "num": 1000},
+        "ki": null,
+        "precision": "float32",
+        "output": "Results/maps/co2"
+    }
+
+В каталоге output создаются массивы B.npy, DpDz.npy, fi.npy, status.npy
+формы (T, d, G, x) и map.json с осями. Порция - часть строк G одного
+среза (T, d), поэтому порции не пересекаются и процессы пишут их в общие
+файлы без сборки результатов. Готовые порции отмечаются в progress.npy,
+повторный запуск продолжает с места остановки. В сборке Python без GIL
+порции считаются потоками (parallel.py), которые пишут в одни и те же
+открытые memmap-массивы. Чтение без копирования:
+
+    sweep = open_map('Results/maps/co2')
+    sweep['DpDz'][i_T, i_d]          # срез (G, x) прямо из файла
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+from concurrent.futures import as_completed
+
+import numpy as np
+
+from dpdz_vector import PRECISIONS, calculate_points
+from grids import expand_grid
+from parallel import ENGINES, make_executor, resolve_engine, worker_properties
+
+AXES = ('T', 'd', 'G', 'x')
+FIELDS = ('B', 'DpDz', 'fi')
+
+# Предел точек в одной порции (память рабочего процесса)
+MAX_CHUNK_POINTS = 1000000
+
+META_FILE = 'map.json'
+PROGRESS_FILE = 'progress.npy'
+
+
+def plan_chunks(shape, max_points=MAX_CHUNK_POINTS):
+    """Порции (i_T, i_d, G_start, G_stop), не больше max_points точек каждая"""
+    n_T, n_d, n_G, n_x = shape
+    rows = max(1, max_points // n_x)
+    return [(i, j, start, min(start + rows, n_G))
+            for i in range(n_T) for j in range(n_d) for start in range(0, n_G, rows)]
+
+
+def create_map(directory, substance, T, d, G, x, ki=None, precision='float64', max_points=MAX_CHUNK_POINTS):
+    """Создает пустые массивы и описание карты. Возвращает описание"""
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision должен быть одним из {PRECISIONS}")
+    axes = dict(zip(AXES, (np.atleast_1d(np.asarray(a, dtype=float)) for a in (T, d, G, x))))
+    shape = tuple(len(axes[name]) for name in AXES)
+    chunks = plan_chunks(shape, max_points)
+
+    os.makedirs(directory, exist_ok=True)
+    for field in FIELDS:
+        array = np.lib.format.open_memmap(os.path.join(directory, f"{field}.npy"), mode='w+',
+                                          dtype=precision, shape=shape)
+        array[...] = np.nan
+        del array
+    status = np.lib.format.open_memmap(os.path.join(directory, 'status.npy'), mode='w+', dtype=np.int8, shape=shape)
+    status[...] = -1
+    del status
+    progress = np.lib.format.open_memmap(os.path.join(directory, PROGRESS_FILE), mode='w+',
+                                         dtype=np.int8, shape=(len(chunks),))
+    del progress
+
+    meta = {
+        'substance': substance,
+        'ki': ki,
+        'precision': precision,
+        'order': list(AXES),
+        'shape': list(shape),
+        'axes': {name: values.tolist() for name, values in axes.items()},
+        'fields': list(FIELDS) + ['status'],
+        'chunks': [list(chunk) for chunk in chunks],
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+    with open(os.path.join(directory, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return meta
+
+
+def load_meta(directory):
+    with open(os.path.join(directory, META_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compute_chunk(meta, k):
+    """Результаты порции k: {поле: массив (G_stop - G_start, x)}"""
+    i, j, start, stop = meta['chunks'][k]
+    axes = meta['axes']
+    G = np.asarray(axes['G'][start:stop])
+    x = np.asarray(axes['x'])
+    results_df = calculate_points(meta['substance'], axes['T'][i], axes['d'][j], meta['ki'],
+                                  G[:, None], x[None, :], properties=worker_properties(meta['substance']))
+    return {field: results_df[field].to_numpy().reshape(len(G), len(x)) for field in FIELDS + ('status',)}
+
+
+def open_arrays(directory, meta):
+    """Массивы карты и отметки готовности, открытые на запись"""
+    arrays = {field: np.load(os.path.join(directory, f"{field}.npy"), mmap_mode='r+') for field in meta['fields']}
+    return arrays, np.load(os.path.join(directory, PROGRESS_FILE), mmap_mode='r+')
+
+
+def write_chunk(directory, meta, k, values, opened=None):
+    """Записывает результаты порции k в массивы карты и отмечает ее готовой"""
+    i, j, start, stop = meta['chunks'][k]
+    arrays, progress = opened or open_arrays(directory, meta)
+    for field, chunk_values in values.items():
+        arrays[field][i, j, start:stop] = chunk_values
+        arrays[field].flush()
+
+    # Отметка о готовности пишется последней: прерванная порция будет пересчитана
+    progress[k] = 1
+    progress.flush()
+
+
+def fill_chunk(directory, k):
+    """Считает порцию k и пишет ее в массивы карты (вызывается в рабочем процессе)"""
+    meta = load_meta(directory)
+    write_chunk(directory, meta, k, compute_chunk(meta, k))
+    return k
+
+
+def pending_chunks(directory):
+    progress = np.load(os.path.join(directory, PROGRESS_FILE), mmap_mode='r')
+    return [int(k) for k in np.flatnonzero(progress == 0)]
+
+
+def run_map(directory, workers=None, engine='auto', log=print):
+    """Считает все незаполненные порции карты потоками или процессами (parallel.resolve_engine)"""
+    pending = pending_chunks(directory)
+    meta = load_meta(directory)
+    total = len(meta['chunks'])
+    engine = resolve_engine(engine)
+    log(f"Карта {directory}: порций {total}, осталось {len(pending)}, исполнитель: {engine}")
+    if not pending:
+        return
+    with make_executor(workers, engine) as executor:
+        if engine == 'thread':
+            # Потоки пишут непересекающиеся части одних и тех же открытых массивов
+            opened = open_arrays(directory, meta)
+            futures = [executor.submit(_fill_opened, directory, meta, k, opened) for k in pending]
+        else:
+            futures = [executor.submit(fill_chunk, directory, k) for k in pending]
+        for n, future in enumerate(as_completed(futures), total - len(pending) + 1):
+            log(f"  [{n}/{total}] порция {future.result()}")
+
+
+def _fill_opened(directory, meta, k, opened):
+    write_chunk(directory, meta, k, compute_chunk(meta, k), opened)
+    return k
+
+
+class SweepMap():
+    """Карта, открытая только для чтения: массивы - memmap без копирования"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.meta = load_meta(directory)
+        self.axes = {name: np.asarray(values) for name, values in self.meta['axes'].items()}
+        self.arrays = {field: np.load(os.path.join(directory, f"{field}.npy"), mmap_mode='r')
+                       for field in self.meta['fields']}
+
+    def __getitem__(self, field):
+        return self.arrays[field]
+
+    @property
+    def complete(self):
+        return not pending_chunks(self.directory)
+
+    def index(self, axis, value):
+        """Индекс ближайшего узла оси"""
+        return int(np.abs(self.axes[axis] - value).argmin())
+
+    def select(self, field, T, d):
+        """Срез (G, x) при ближайших к T и d узлах"""
+        return self.arrays[field][self.index('T', T), self.index('d', d)]
+
+
+def open_map(directory):
+    return SweepMap(directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Расчет карты DpDz в файлы на диске")
+    parser.add_argument('spec', help="JSON-файл карты")
+    parser.add_argument('--workers', type=int, default=None, help="число рабочих процессов")
+    parser.add_argument('--engine', choices=ENGINES, default='auto', help="потоки или процессы (parallel.py)")
+    parser.add_argument('--restart', action='store_true', help="создать массивы заново")
+    parser.add_argument('--create-only', action='store_true',
+                        help="только создать массивы и описание карты (расчет - через shard_queue)")
+    args = parser.parse_args(argv)
+
+    with open(args.spec, encoding='utf-8') as f:
+        spec = json.load(f)
+    directory = spec['output']
+    if args.restart or not os.path.exists(os.path.join(directory, META_FILE)):
+        create_map(directory, spec['substance'], *(expand_grid(spec[name]) for name in AXES),
+                   ki=spec.get('ki'), precision=spec.get('precision', 'float64'),
+                   max_points=spec.get('max_chunk_points', MAX_CHUNK_POINTS))
+    if args.create_only:
+        return 0
+    try:
+        run_map(directory, workers=args.workers, engine=args.engine)
+    except KeyboardInterrupt:
+        return 130
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
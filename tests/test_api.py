@@ -0,0 +1,115 @@
+"""
+Тесты HTTP API пакетного расчета
+"""
+import io
+import json
+import threading
+import time
+
+import flask
+import pandas as pd
+import pytest
+
+import api
+
+
+@pytest.fixture
+def client():
+    server = flask.Flask(__name__)
+    api.register_api(server)
+    return server.test_client()
+
+
+@pytest.fixture
+def spec():
+    return {'substance': 'CO2', 'd': 0.00142, 'G': 300, 'T': -10,
+            'x_start': 0.1, 'x_end': 0.9, 'num_points': 5}
+
+
+class TestCalculateBatch:
+
+    def test_json_columns(self, client, spec):
+        response = client.post('/api/v1/calculate', json={'specs': [spec, {**spec, 'G': 400}]})
+        assert response.status_code == 200
+        results = response.get_json()['results']
+        assert len(results) == 2
+        assert len(results[0]['columns']['DpDz']) == 5
+        # При большем расходе градиент давления больше
+        assert results[1]['columns']['DpDz'][0] > results[0]['columns']['DpDz'][0]
+
+    def test_invalid_spec_reported_per_item(self, client, spec):
+        response = client.post('/api/v1/calculate', json={'specs': [spec, {'substance': 'CO2'}]})
+        results = response.get_json()['results']
+        assert 'columns' in results[0]
+        assert 'error' in results[1]
+
+    def test_point_limit(self, client, spec):
+        big = {**spec, 'num_points': api.MAX_POINTS_PER_SPEC + 1}
+        results = client.post('/api/v1/calculate', json={'specs': [big]}).get_json()['results']
+        assert 'error' in results[0]
+
+    def test_non_finite_and_non_bool_rejected(self, client):
+        body = ('{"specs": [{"substance": "CO2", "d": 0.00142, "G": 300, "T": -10, "x_start": 0.1, '
+                '"x_end": 0.9, "num_points": Infinity}, '
+                '{"substance": "CO2", "d": 0.00142, "G": NaN, "T": -10, "x_start": 0.1, '
+                '"x_end": 0.9, "num_points": 5}]}')
+        response = client.post('/api/v1/calculate', data=body, content_type='application/json')
+        assert response.status_code == 200
+        assert all('error' in item for item in response.get_json()['results'])
+        with pytest.raises(api.SpecError):
+            api.validate_spec({'substance': 'CO2', 'd': 0.00142, 'G': 300, 'T': -10,
+                               'x_start': 0.1, 'x_end': 0.9, 'num_points': 5, 'value_fb': 'false'})
+
+    @pytest.mark.parametrize('field, value', [('d', -1), ('G', 0), ('x_start', -0.1), ('x_end', 1.5),
+                                              ('num_points', 0)])
+    def test_physical_ranges(self, client, spec, field, value):
+        results = client.post('/api/v1/calculate', json={'specs': [{**spec, field: value}]}).get_json()['results']
+        assert field in results[0]['error']
+
+    def test_single_executor(self, monkeypatch):
+        created = []
+
+        class SlowExecutor():
+            def __init__(self, **kwargs):
+                time.sleep(0.05)
+                created.append(self)
+
+        monkeypatch.setattr(api, '_executor', None)
+        monkeypatch.setattr(api, 'ThreadPoolExecutor', SlowExecutor)
+        threads = [threading.Thread(target=api.get_executor) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(created) == 1
+
+    def test_value_fb_defaults_like_dashboard(self, spec):
+        assert api.validate_spec(spec)['value_fb'] is True
+
+    def test_bad_payload(self, client, spec):
+        assert client.post('/api/v1/calculate', json={'foo': 1}).status_code == 400
+        # JSON - текст, компактное хранение применяется только к parquet/arrow
+        assert client.post('/api/v1/calculate', json={'specs': [spec], 'precision': 'float32'}).status_code == 400
+
+    def test_parquet(self, client, spec):
+        pytest.importorskip('pyarrow')
+        response = client.post('/api/v1/calculate', json={'specs': [spec, spec], 'format': 'parquet'})
+        table = pd.read_parquet(io.BytesIO(response.data))
+        assert len(table) == 10
+        assert sorted(table['spec'].unique()) == [0, 1]
+
+    def test_binary_errors_in_metadata(self, client, spec):
+        pa = pytest.importorskip('pyarrow')
+        response = client.post('/api/v1/calculate', json={'specs': [spec, {**spec, 'd': -1}], 'format': 'arrow'})
+        schema = pa.ipc.open_stream(response.data).schema
+        errors = json.loads(schema.metadata[b'dpdz.errors'])
+        assert list(errors) == ['1'] and 'd' in errors['1']
+        assert response.headers['X-DpDz-Errors'] == '1'
+
+    def test_parquet_float32(self, client, spec):
+        pytest.importorskip('pyarrow')
+        response = client.post('/api/v1/calculate',
+                               json={'specs': [spec], 'format': 'parquet', 'precision': 'float32'})
+        table = pd.read_parquet(io.BytesIO(response.data))
+        assert table['DpDz'].dtype == 'float32' and table['x'].dtype == 'float64'
+        assert client.post('/api/v1/calculate', json={'specs': [spec], 'precision': 'half'}).status_code == 400
@@ -0,0 +1,52 @@
+"""
+Тесты асинхронного сервиса с микропакетами
+"""
+import asyncio
+
+import numpy as np
+
+from async_service import BatchingCalculationService
+from dpdz_vector import calculate_points
+
+
+class TestBatchingCalculationService:
+
+    def test_concurrent_requests_batched(self):
+        x = np.linspace(0.1, 0.9, 10)
+
+        async def run():
+            async with BatchingCalculationService(batch_window=0.05) as service:
+                results = await asyncio.gather(*[
+                    service.calculate('CO2', 0.00142, T, G, x)
+                    for T in (-10, -20) for G in (300, 400, 500)
+                ])
+                return results, service.stats()
+
+        results, stats = asyncio.run(run())
+
+        assert stats['requests'] == 6
+        assert stats['batches'] == 1
+        # Каждый вызывающий получает свою кривую
+        expected = calculate_points('CO2', -20, 0.00142, None, 400, x)
+        assert np.allclose(results[4]['DpDz'], expected['DpDz'])
+        assert results[4]['G'].unique().tolist() == [400.0]
+
+    def test_close_answers_accepted_requests(self):
+        x = np.linspace(0.1, 0.9, 5)
+
+        async def run():
+            service = BatchingCalculationService(batch_window=0.01)
+            dispatched = asyncio.create_task(service.calculate('CO2', 0.00142, -10, 300, x))
+            await asyncio.sleep(0.05)
+            # Второй запрос ждет в собираемом пакете, первый уже считается в пуле
+            service.batch_window = 10
+            collecting = asyncio.create_task(service.calculate('CO2', 0.00142, -10, 400, x))
+            await asyncio.sleep(0.01)
+            await service.close()
+            assert dispatched.done() and collecting.done()
+            return dispatched.result(), collecting.result(), service.stats()
+
+        first, second, stats = asyncio.run(asyncio.wait_for(run(), 60))
+        assert len(first) == len(second) == 5
+        assert second['G'].unique().tolist() == [400.0]
+        assert stats['requests'] == 2
@@ -0,0 +1,33 @@
+"""
+Тесты интегрирования по длине канала
+"""
+import numpy as np
+import pytest
+
+from axial import STATUS_DONE, STATUS_DRYOUT, integrate_channels
+from dpdz_vector import calculate_points
+
+
+class TestIntegrateChannels:
+
+    def test_short_channel_matches_local_gradient(self):
+        summary, _ = integrate_channels('CO2', 0.00142, 0.001, 300, -10, 0.5, q=1e-6)
+        local = calculate_points('CO2', -10, 0.00142, None, 300, 0.5)['DpDz'][0]
+        assert summary['dp'][0] == pytest.approx(local * 0.001, rel=1e-4)
+
+    def test_profiles(self):
+        summary, profiles = integrate_channels('CO2', 0.00142, 1.0, [300, 500], -10, 0.1, q=10000)
+        assert (summary['status'] == STATUS_DONE).all()
+        assert np.allclose(summary['z_end'], 1.0)
+        for channel, profile in profiles.groupby('channel'):
+            assert profile['z'].iloc[0] == 0 and profile['z'].iloc[-1] == pytest.approx(1.0)
+            # Давление и температура падают, паросодержание растет
+            assert (np.diff(profile['p']) < 0).all() and (np.diff(profile['T']) < 0).all()
+            assert (np.diff(profile['x']) > 0).all()
+            assert summary['dp'][channel] == pytest.approx(profile['p'].iloc[0] - profile['p'].iloc[-1])
+
+    def test_dryout_stops_channel(self):
+        summary, _ = integrate_channels('CO2', 0.00142, 5.0, 200, -10, 0.1, q=50000, x_max=0.9)
+        assert summary['status'][0] == STATUS_DRYOUT
+        assert summary['x_out'][0] == pytest.approx(0.9)
+        assert summary['z_end'][0] < 5.0
@@ -0,0 +1,253 @@
+"""
+Тесты пути расчета дашборда и объединения одинаковых запросов
+"""
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from calculation import (IncrementalEvaluator, InFlightCoalescer, JobRegistry, batches, calculate_results,
+                         calculation_key, coarse_to_fine, compute_results, done_indices, parse_values, sweep_requests)
+
+SESSION_A, SESSION_B = 'a' * 32, 'b' * 32
+
+
+def wait_for(condition, timeout=60):
+    """Ждет condition(); зависший фоновый расчет - ошибка теста, а не зависание набора"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "фоновое задание не завершилось"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def request_params():
+    return {
+        'substance': 'CO2',
+        'd': 0.00142,
+        'G': 300,
+        'T': -10,
+        'g': 9.81,
+        'ki': None,
+        'num_points': 10,
+        'x_start': 0.1,
+        'x_end': 0.9,
+        'value_fb': False,
+    }
+
+
+class TestCalculationKey:
+
+    def test_int_and_float_equal(self, request_params):
+        other = {**request_params, 'G': 300.0, 'substance': ' CO2 '}
+        assert calculation_key(request_params) == calculation_key(other)
+
+    def test_different_inputs(self, request_params):
+        other = {**request_params, 'num_points': 11}
+        assert calculation_key(request_params) != calculation_key(other)
+
+
+class TestIncrementalEvaluator:
+
+    def test_matches_full_calculation(self, request_params):
+        evaluator = IncrementalEvaluator()
+        result = evaluator.evaluate(request_params)
+        expected = compute_results(request_params)
+        assert list(result.columns) == list(expected.columns)
+        assert np.allclose(result['DpDz'], expected['DpDz'], rtol=0, atol=0)
+
+    def test_refined_grid_reuses_points(self, request_params):
+        evaluator = IncrementalEvaluator()
+        evaluator.evaluate(request_params)
+        # 10 -> 19 точек: старые x остаются узлами новой сетки
+        refined = {**request_params, 'num_points': 19}
+        result = evaluator.evaluate(refined)
+        stats = evaluator.stats()
+        assert stats['points_reused'] == 10
+        assert stats['points_solved'] == 19
+        assert np.allclose(result['DpDz'], compute_results(refined)['DpDz'])
+
+    def test_model_change_recomputes(self, request_params):
+        evaluator = IncrementalEvaluator()
+        evaluator.evaluate(request_params)
+        evaluator.evaluate({**request_params, 'ki': 300})
+        assert evaluator.stats() == {'requests': 2, 'models': 2, 'points_reused': 0,
+                                     'points_solved': 20, 'reuse_rate': 0.0}
+
+
+class TestInFlightCoalescer:
+
+    def test_concurrent_requests_share_result(self):
+        coalescer = InFlightCoalescer()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return object()
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(coalescer.run('k', slow)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(coalescer.run('k', slow)))
+                     for _ in range(3)]
+        for t in followers:
+            t.start()
+        # Ждем, пока все ведомые запросы присоединятся к расчету
+        while coalescer.stats()['coalesced'] < 3:
+            time.sleep(0.001)
+        release.set()
+        for t in [leader] + followers:
+            t.join(5)
+
+        assert len(calls) == 1
+        assert len(results) == 4 and all(r is results[0] for r in results)
+        stats = coalescer.stats()
+        assert stats['computed'] == 1 and stats['in_flight'] == 0
+        assert stats['coalesce_rate'] == pytest.approx(0.75)
+
+    def test_error_propagates_and_clears(self):
+        coalescer = InFlightCoalescer()
+        with pytest.raises(ValueError):
+            coalescer.run('k', lambda: (_ for _ in ()).throw(ValueError("ошибка")))
+        assert coalescer.run('k', lambda: 42) == 42
+
+
+class TestProgressiveJob:
+
+    def test_coarse_to_fine_order(self):
+        assert coarse_to_fine(9) == [0, 8, 4, 2, 6, 1, 3, 5, 7]
+        for n in (1, 2, 6, 100):
+            assert sorted(coarse_to_fine(n)) == list(range(n))
+        assert [len(b) for b in batches(list(range(100)), first=8, largest=32)] == [8, 16, 32, 32, 12]
+
+    def test_job_matches_full_calculation(self, request_params):
+        request_params = {**request_params, 'num_points': 40}
+        jobs = JobRegistry(IncrementalEvaluator())
+        job = jobs.get(jobs.start(request_params))
+        wait_for(lambda: job.finished)
+        results_df, state = job.snapshot()
+        assert state == {'done': 40, 'total': 40, 'finished': True, 'error': None}
+        expected = compute_results(request_params)
+        assert np.allclose(results_df['x'], expected['x'])
+        assert np.allclose(results_df['DpDz'], expected['DpDz'], rtol=1e-8)
+
+    def test_identical_request_joins_running_job(self, request_params):
+        jobs = JobRegistry(IncrementalEvaluator())
+        gate = threading.Event()
+        evaluator = jobs.evaluator
+        solve = evaluator._solve
+        evaluator._solve = lambda *a: gate.wait() and solve(*a)
+        first = jobs.start(request_params)
+        assert jobs.start({**request_params, 'G': 300.0}) == first
+        gate.set()
+        wait_for(lambda: jobs.get(first).finished)
+        assert jobs.start(request_params) != first
+
+    def test_job_is_visible_only_to_its_sessions(self, request_params):
+        published = []
+        jobs = JobRegistry(IncrementalEvaluator(), publisher=lambda job: published.append(job.snapshot()[1]))
+        gate = threading.Event()
+        solve = jobs.evaluator._solve
+        jobs.evaluator._solve = lambda *a: gate.wait() and solve(*a)
+        job_id = jobs.start(request_params, SESSION_A)
+        # Идентификатор случайный, присоединившаяся сессия тоже видит задание
+        assert len(job_id) == 32 and int(job_id, 16) > 1
+        assert jobs.start(request_params, SESSION_B) == job_id
+        assert jobs.get(job_id, SESSION_B) is jobs.get(job_id, SESSION_A) is not None
+        assert jobs.get(job_id, 'c' * 32) is None and jobs.get(job_id) is None
+        gate.set()
+        wait_for(lambda: published and published[-1]['finished'])
+        assert published[-1]['done'] == 10
+
+    def test_job_finished_during_register(self):
+        class FakeJob():
+            def __init__(self, job_id, states):
+                self.job_id, self.sessions, self.on_progress = job_id, set(), None
+                self._states = iter(states)
+
+            @property
+            def finished(self):
+                return next(self._states, True)
+
+        jobs = JobRegistry(IncrementalEvaluator(), max_jobs=1)
+        # Первое задание идет при чистке _running во втором вызове и завершается к вытеснению
+        jobs._register('a', None, lambda job_id: FakeJob(job_id, [False, False]))
+        jobs._register('b', None, lambda job_id: FakeJob(job_id, [False]))
+        job, created = jobs._register('c', None, lambda job_id: FakeJob(job_id, []))
+        assert created and list(jobs._running) == ['c']
+
+    def test_partial_snapshot_is_sorted(self, request_params):
+        request_params = {**request_params, 'num_points': 33}
+        evaluator = IncrementalEvaluator()
+        jobs = JobRegistry(evaluator)
+        job = jobs.get(jobs.start(request_params))
+        results_df, state = job.snapshot()
+        assert state['done'] <= 33
+        assert results_df['x'].is_monotonic_increasing
+        # Готовые точки - узлы сетки, которые назовет done_indices (по ним дашборд вставляет новые точки)
+        assert results_df['x'].tolist() == job.x_values[done_indices(33, state['done'])].tolist()
+        wait_for(lambda: job.finished)
+
+    def test_error_is_reported(self, request_params):
+        jobs = JobRegistry(IncrementalEvaluator())
+        job = jobs.get(jobs.start({**request_params, 'substance': 'NoSuchFluid'}))
+        wait_for(lambda: job.finished)
+        assert job.snapshot()[1]['error']
+
+
+class TestSweep:
+
+    def test_parse_values(self):
+        assert parse_values(300) == [300]
+        assert parse_values('300, 400;500') == [300.0, 400.0, 500.0]
+        assert parse_values('-20:0:3') == [-20.0, -10.0, 0.0]
+        assert parse_values('300, 300.0, 400') == [300.0, 400.0]
+        for bad in ('abc', '1:2', '1:2:0', 'nan', '300, inf', ','):
+            with pytest.raises(ValueError):
+                parse_values(bad)
+        with pytest.raises(ValueError):
+            parse_values('0, 300', positive=True)
+        assert parse_values('-20, 0') == [-20.0, 0.0]
+
+    def test_sweep_requests(self, request_params):
+        requests = sweep_requests(request_params, ['CO2', 'R134a'], [300, 500], [-10])
+        assert [(r['substance'], r['G'], r['T']) for r in requests] == \
+            [('CO2', 300, -10), ('CO2', 500, -10), ('R134a', 300, -10), ('R134a', 500, -10)]
+        with pytest.raises(ValueError):
+            sweep_requests(request_params, ['CO2'], list(range(100)), [-10])
+
+    def test_sweep_job_combines_curves(self, request_params):
+        requests = sweep_requests(request_params, ['CO2'], [300, 500], [-10, 0])
+        jobs = JobRegistry(IncrementalEvaluator(), curve_workers=2)
+        job_id = jobs.start_sweep(requests)
+        assert jobs.start_sweep(requests) == job_id
+        job = jobs.get(job_id)
+        wait_for(lambda: job.finished)
+        results_df, state = job.snapshot()
+        assert state['done'] == state['total'] == 40 and state['error'] is None
+        assert [curve['curve'] for curve in state['curves']] == \
+            ['CO2, G=300, T=-10', 'CO2, G=300, T=0', 'CO2, G=500, T=-10', 'CO2, G=500, T=0']
+        curve = results_df[results_df['curve'] == 'CO2, G=500, T=0']
+        expected = compute_results(requests[3])
+        assert np.allclose(curve['DpDz'], expected['DpDz'], rtol=1e-8)
+
+    def test_failed_curve_does_not_stop_others(self, request_params):
+        requests = [request_params, {**request_params, 'substance': 'NoSuchFluid'}]
+        jobs = JobRegistry(IncrementalEvaluator())
+        job = jobs.get(jobs.start_sweep(requests))
+        wait_for(lambda: job.finished)
+        results_df, state = job.snapshot()
+        assert state['curves'][0]['done'] == 10
+        assert 'NoSuchFluid' in state['error']
+
+
+def test_calculate_results(request_params):
+    results_df = calculate_results(request_params)
+    assert len(results_df) == 10
+    assert (results_df['DpDz'] > 0).all()
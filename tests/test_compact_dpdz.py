@@ -0,0 +1,53 @@
+"""
+Тесты компактного калькулятора CompactDpDz
+"""
+import numpy as np
+import pytest
+
+from class_DpDz import CompactDpDz, DpDz, saturation_properties
+
+X = np.linspace(0.1, 0.9, 5)
+
+
+def reference(T, G):
+    params = {'Substance': 'CO2', 'Temperature': T, 'G': G, 'x': X}
+    return DpDz(g=9.81, d=0.00142, ki=None, thermodynamic_params=params, value_fb=False).calculate()
+
+
+class TestCompactDpDz:
+
+    def test_no_instance_dict(self):
+        calc = CompactDpDz(g=9.81, d=0.00142, ki=None)
+        assert not hasattr(calc, '__dict__')
+        with pytest.raises(AttributeError):
+            calc.extra = 1
+
+    def test_matches_dpdz(self):
+        calc = CompactDpDz(g=9.81, d=0.00142, ki=None)
+        assert calc.set_state('CO2', -10).set_points(300, X).calculate() == reference(-10, 300)
+
+    def test_rebind_reuses_instance(self):
+        calc = CompactDpDz(g=9.81, d=0.00142, ki=None)
+        calc.set_points(300, X).set_state('CO2', 0)
+        # Смена температуры пересчитывает скорости фаз для уже заданных точек
+        assert calc.set_state('CO2', -10).calculate() == reference(-10, 300)
+        assert calc.set_points(500, X).calculate() == reference(-10, 500)
+
+    def test_points_without_state(self):
+        calc = CompactDpDz(g=9.81, d=0.00142, ki=None).set_points(300, X)
+        assert calc.SV_liquid is None
+
+    def test_state_after_direct_properties(self):
+        calc = CompactDpDz(g=9.81, d=0.00142, ki=None).set_state('CO2', -10).set_points(300, X)
+        calc.set_properties(1.0, 1.0, 1.0, 1.0)
+        # Те же вещество и T после прямого задания свойств снова берут их из источника
+        assert calc.set_state('CO2', -10).calculate() == reference(-10, 300)
+
+    def test_direct_properties_default_fields(self):
+        rho_l, mu_l, rho_g, mu_g = saturation_properties('CO2', -10)
+        calc = CompactDpDz(g=9.81, d=0.00142, ki=None).set_points(300, X)
+        res = calc.set_properties(rho_l, mu_l, rho_g, mu_g).calculate()
+        expected = reference(-10, 300)
+        # Без T нет теплопроводности и приведенного давления - NaN, остальное как с T
+        assert all(np.isnan(r['alpha']) and np.isnan(r['Pred']) for r in res)
+        assert [r['DpDz'] for r in res] == [r['DpDz'] for r in expected]
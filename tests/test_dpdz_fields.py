@@ -0,0 +1,46 @@
+"""
+Тесты выбора полей результата DpDz.calculate(fields=...)
+"""
+from unittest import mock
+
+import numpy as np
+import pytest
+
+from class_DpDz import RESULT_FIELDS, DpDz
+
+
+@pytest.fixture
+def calculator():
+    params = {'Substance': 'CO2', 'Temperature': -10, 'G': 300, 'x': np.linspace(0.1, 0.9, 5)}
+    return DpDz(g=9.81, d=0.00142, ki=None, thermodynamic_params=params, value_fb=False)
+
+
+class TestFields:
+
+    def test_default_all_fields(self, calculator):
+        assert tuple(calculator.calculate()[0]) == RESULT_FIELDS
+
+    def test_subset_matches_full(self, calculator):
+        full = calculator.calculate()
+        subset = calculator.calculate(fields=['DpDz', 'x'])
+        assert [list(r) for r in subset] == [['x', 'DpDz']] * 5
+        assert [r['DpDz'] for r in subset] == [r['DpDz'] for r in full]
+
+    def test_no_film_fields_skip_solver(self, calculator):
+        with mock.patch.object(DpDz, 'calcOnePoint') as solver:
+            result = calculator.calculate(fields=['jl', 'Re liquid'])
+        solver.assert_not_called()
+        assert all(r['Re liquid'] > 0 for r in result)
+
+    def test_complete_from_stored_B(self, calculator):
+        full = calculator.calculate()
+        stored = calculator.calculate(fields=['x', 'G', 'jl', 'jg', 'B'])
+        with mock.patch.object(DpDz, 'calcOnePoint') as solver:
+            completed = calculator.complete_point(stored[2], ['alpha', 'DpDz'])
+        solver.assert_not_called()
+        assert completed['alpha'] == full[2]['alpha']
+        assert completed['DpDz'] == full[2]['DpDz']
+
+    def test_unknown_field(self, calculator):
+        with pytest.raises(ValueError):
+            calculator.calculate(fields=['dpdz'])
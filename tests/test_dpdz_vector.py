@@ -0,0 +1,62 @@
+"""
+Сравнение векторного расчета с исходным классом DpDz
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from class_DpDz import DpDz
+from dpdz_vector import STATUS_OK, calculate_points, precision_report
+
+
+class TestCalculatePoints:
+
+    @pytest.mark.parametrize('T, G, ki', [(-10, 300, None), (-40, 600, None), (0, 200, 24)])
+    def test_matches_class(self, T, G, ki):
+        x = np.linspace(0.1, 0.9, 30)
+        params = {'Substance': 'CO2', 'Temperature': T, 'x': x, 'G': G}
+        reference = pd.DataFrame(DpDz(g=0, ki=ki, d=0.00142, value_fb=False,
+                                      thermodynamic_params=params).calculate())
+
+        result = calculate_points('CO2', T, 0.00142, ki, G, x)
+
+        assert (result['status'] == STATUS_OK).all()
+        for col in ['B', 'DpDz', 'fi', 'Re gas', 'alpha', 'Pred']:
+            # brentq останавливается по xtol=2e-12 м, отсюда расхождение ~1e-7
+            assert np.allclose(result[col], reference[col], rtol=1e-6), col
+
+    def test_pairs_of_G_and_x(self):
+        result = calculate_points('CO2', -10, 0.00142, None, [300, 400], [0.5, 0.5])
+        assert result['DpDz'][1] > result['DpDz'][0]
+
+
+class TestPrecision:
+
+    def test_float32_storage(self):
+        x = np.linspace(0.1, 0.9, 30)
+        full = calculate_points('CO2', -10, 0.00142, None, 300, x)
+        compact = calculate_points('CO2', -10, 0.00142, None, 300, x, precision='float32')
+        assert compact['DpDz'].dtype == np.float32
+        assert compact['x'].dtype == np.float64
+        assert compact['status'].dtype == np.int8
+        assert isinstance(compact['Substance'].dtype, pd.CategoricalDtype)
+        assert np.allclose(compact['DpDz'], full['DpDz'], rtol=2.0 ** -24, atol=0)
+
+    def test_report(self):
+        full = calculate_points('CO2', -10, 0.00142, None, [300, 600], [[0.2], [0.8]])
+        report = precision_report(full).set_index('column')
+        assert report['max_rel_error'].max() <= 2.0 ** -24
+        assert report['bytes_compact'].sum() < report['bytes_float64'].sum()
+
+    def test_report_cli(self, tmp_path, capsys):
+        from dpdz_vector import main
+
+        out = tmp_path / 'report.csv'
+        assert main(['CO2', '--G', '300:600:2', '--x', '0.1:0.9:5', '--out', str(out)]) == 0
+        report = pd.read_csv(out).set_index('column')
+        assert report.loc['DpDz', 'max_rel_error'] <= 2.0 ** -24
+        assert 'байт' in capsys.readouterr().out
+
+    def test_unknown_precision(self):
+        with pytest.raises(ValueError):
+            calculate_points('CO2', -10, 0.00142, None, 300, [0.5], precision='float16')
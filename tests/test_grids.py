@@ -0,0 +1,18 @@
+"""
+Тесты сеток параметров
+"""
+import numpy as np
+
+from grids import expand_grid, parse_axis
+
+
+class TestGrids:
+
+    def test_expand_grid(self):
+        assert expand_grid({'start': 0.1, 'stop': 0.9, 'num': 5}).tolist() == np.linspace(0.1, 0.9, 5).tolist()
+        assert expand_grid(-10).tolist() == [-10.0]
+        assert expand_grid([300, 400]).tolist() == [300.0, 400.0]
+
+    def test_parse_axis(self):
+        assert parse_axis('-40:20:61').tolist() == np.linspace(-40, 20, 61).tolist()
+        assert parse_axis('0.00142,0.002').tolist() == [0.00142, 0.002]
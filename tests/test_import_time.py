@@ -0,0 +1,43 @@
+"""
+Бюджет времени холодного импорта class_DpDz и дашборда.
+
+Импорт выполняется в отдельном процессе, чтобы не мешал кэш модулей
+текущего запуска pytest. Тяжелые библиотеки (CoolProp, SciPy optimize,
+pandas, Plotly Express) должны загружаться только при первом расчете.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['CoolProp', 'scipy.optimize', 'pandas', 'plotly.express']
+
+# Бюджеты, с (с запасом на медленные машины CI)
+BUDGETS = {
+    'class_DpDz': 1.0,
+    'dashboard': 2.5,
+}
+
+
+def cold_import(module):
+    code = (
+        "import json, sys, time\n"
+        "t = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - t\n"
+        f"print(json.dumps({{'elapsed': elapsed, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize('module', sorted(BUDGETS))
+def test_cold_import(module):
+    result = cold_import(module)
+    assert result['loaded'] == [], f"При импорте загружены тяжелые модули: {result['loaded']}"
+    assert result['elapsed'] < BUDGETS[module], f"import {module}: {result['elapsed']:.3f} с"
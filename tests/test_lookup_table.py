@@ -0,0 +1,73 @@
+"""
+Тесты таблиц DpDz и интерполяции по ним
+"""
+import numpy as np
+import pytest
+
+import lookup_table
+from dpdz_vector import calculate_points
+
+
+@pytest.fixture(scope='module')
+def table(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('tables')
+    meta_path = lookup_table.build_table('CO2', G=np.linspace(200, 600, 9), T=[-20, -10, 0],
+                                         x=np.linspace(0.1, 0.9, 17), d=[0.00142],
+                                         directory=str(directory), log=lambda *a: None)
+    return lookup_table.DpDzTable.load(meta_path)
+
+
+def failing_slice(*args):
+    raise RuntimeError("сбой среза")
+
+
+class TestDpDzTable:
+
+    def test_nodes_exact(self, table):
+        expected = calculate_points('CO2', -10, 0.00142, None, 300, 0.4)['DpDz'][0]
+        value, error, inside = table.evaluate(300, -10, 0.4, 0.00142)
+        assert inside and value == pytest.approx(expected, rel=1e-12)
+        assert table(300, -10, 0.4, 0.00142) == pytest.approx(expected, rel=1e-12)
+
+    def test_interpolation_within_estimate(self, table):
+        G, T, x = np.array([333.0, 470.0]), np.array([-10.0, -20.0]), np.array([0.37, 0.61])
+        values, error, inside = table.evaluate(G, T, x, 0.00142)
+        exact = np.array([calculate_points('CO2', t, 0.00142, None, g, xx)['DpDz'][0]
+                          for g, t, xx in zip(G, T, x)])
+        assert inside.all()
+        assert (np.abs(values - exact) / exact <= 2 * error).all()
+        assert [table.point(g, t, xx, 0.00142) for g, t, xx in zip(G, T, x)] == pytest.approx(values)
+
+    def test_out_of_table(self, table):
+        values, error, inside = table.evaluate([300, 900], -10, 0.5, [0.00142, 0.00142])
+        assert inside.tolist() == [True, False]
+        assert np.isnan(values[1]) and np.isnan(error[1])
+        assert np.isnan(table(300, -10, 0.5, 0.002))
+
+    def test_cli(self, tmp_path):
+        argv = ['CO2', '--G', '200,400', '--T=-10', '--x', '0.2:0.8:3', '--d', '0.00142', '--out', str(tmp_path)]
+        assert lookup_table.main(argv) == 0
+        assert len(list(tmp_path.glob('CO2_*_dpdz.json'))) == 1
+
+    def test_grids_do_not_overwrite(self, tmp_path):
+        paths = [lookup_table.build_table('CO2', G=[200, 400], T=[-10], x=[0.2, 0.8], d=[d], directory=str(tmp_path),
+                                          ki=ki, log=lambda *a: None)
+                 for d, ki in ((0.00142, None), (0.002, None), (0.00142, 0.01))]
+        assert len(set(paths)) == 3
+        diameters = [lookup_table.DpDzTable.load(p).meta['axes']['d'] for p in paths]
+        assert diameters == [[0.00142], [0.002], [0.00142]]
+
+    def test_failed_slice_closes_pool(self, tmp_path, monkeypatch):
+        pools = []
+
+        class Pool(lookup_table.ProcessPoolExecutor):
+            def __init__(self, **kwargs):
+                super().__init__(**kwargs)
+                pools.append(self)
+
+        monkeypatch.setattr(lookup_table, 'ProcessPoolExecutor', Pool)
+        monkeypatch.setattr(lookup_table, '_slice', failing_slice)
+        with pytest.raises(RuntimeError):
+            lookup_table.build_table('CO2', G=[200, 400], T=[-10, 0], x=[0.2, 0.8], d=[0.00142],
+                                     directory=str(tmp_path), workers=2, log=lambda *a: None)
+        assert pools[0]._shutdown_thread
@@ -0,0 +1,90 @@
+"""
+Тесты метрик в формате Prometheus
+"""
+import flask
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def registry():
+    return metrics.Registry()
+
+
+class TestMetrics:
+
+    def test_counter_and_gauge(self, registry):
+        counter = metrics.Counter('test_points_total', "Точки", ('engine',), registry=registry)
+        counter.inc(5, engine='vector')
+        counter.inc(engine='vector')
+        gauge = metrics.Gauge('test_queue', "Очередь", registry=registry)
+        gauge.set(3)
+        text = registry.render()
+        assert '# TYPE test_points_total counter' in text
+        assert 'test_points_total{engine="vector"} 6' in text
+        assert 'test_queue 3' in text
+        with pytest.raises(ValueError):
+            counter.inc(engine='vector', extra='x')
+
+    def test_histogram_buckets_are_cumulative(self, registry):
+        histogram = metrics.Histogram('test_seconds', "Длительность", ('callback',), buckets=(0.1, 1.0),
+                                      registry=registry)
+        for value in (0.05, 0.5, 0.5, 3.0):
+            histogram.observe(value, callback='a')
+        text = registry.render()
+        assert 'test_seconds_bucket{callback="a",le="0.1"} 1' in text
+        assert 'test_seconds_bucket{callback="a",le="1.0"} 3' in text
+        assert 'test_seconds_bucket{callback="a",le="+Inf"} 4' in text
+        assert 'test_seconds_count{callback="a"} 4' in text
+        assert 'test_seconds_sum{callback="a"} 4.05' in text
+
+    def test_collector_and_escaping(self, registry):
+        registry.register_collector(lambda: [('test_cache', 'gauge', "Кэш", [({'name': 'a"b'}, 2)])])
+        assert 'test_cache{name="a\\"b"} 2' in registry.render()
+        with pytest.raises(ValueError):
+            metrics.Gauge('test_cache_dup', "", registry=registry)
+            metrics.Gauge('test_cache_dup', "", registry=registry)
+
+    def test_timed_callback(self):
+        @metrics.timed_callback
+        def sample_callback(value):
+            if value is None:
+                raise ValueError
+            return value * 2
+
+        before = metrics.CALLBACK_DURATION.count(callback='sample_callback')
+        assert sample_callback(2) == 4
+        with pytest.raises(ValueError):
+            sample_callback(None)
+        assert metrics.CALLBACK_DURATION.count(callback='sample_callback') == before + 2
+        assert metrics.CALLBACK_ERRORS.value(callback='sample_callback') >= 1
+
+    def test_engine_counters_and_endpoint(self):
+        from dpdz_vector import calculate_points
+
+        before = metrics.POINTS_SOLVED.value(engine='vector')
+        calculate_points('CO2', -10, 0.00142, None, 300, [0.1, 0.5, 0.9])
+        assert metrics.POINTS_SOLVED.value(engine='vector') == before + 3
+
+        server = flask.Flask(__name__)
+        metrics.register_metrics(server)
+        response = server.test_client().get('/metrics')
+        assert response.status_code == 200
+        assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+        assert 'dpdz_points_solved_total{engine="vector"}' in response.get_data(as_text=True)
+
+    def test_scalar_failures_and_job_states(self):
+        from calculation import JOBS, _collect_metrics, _count_points
+
+        def calculate():
+            raise KeyError('NoSuchFluid')
+
+        before = metrics.SOLVER_FAILURES.value(engine='scalar')
+        with pytest.raises(KeyError):
+            _count_points(calculate, 4)
+        assert metrics.SOLVER_FAILURES.value(engine='scalar') == before + 4
+
+        jobs = dict((labels['state'], value) for labels, value in
+                    next(samples for name, _, _, samples in _collect_metrics() if name == 'dpdz_jobs'))
+        assert jobs['running'] + jobs['stored'] == JOBS.stats()['jobs']
@@ -0,0 +1,45 @@
+"""
+Тесты выбора исполнителя (потоки / процессы)
+"""
+import threading
+
+import numpy as np
+import pytest
+
+import parallel
+import sweep_map
+
+G = np.linspace(200, 800, 6)
+X = np.linspace(0.1, 0.9, 5)
+
+
+class TestEngine:
+
+    def test_auto_follows_gil(self):
+        expected = 'thread' if parallel.free_threaded() else 'process'
+        assert parallel.resolve_engine('auto') == expected
+        with pytest.raises(ValueError):
+            parallel.resolve_engine('gpu')
+
+    def test_provider_per_thread(self):
+        assert parallel.worker_properties('CO2') is None
+        with parallel.make_executor(2, 'thread') as executor:
+            barrier = threading.Barrier(2)
+
+            def get():
+                barrier.wait()
+                return parallel.worker_properties('CO2'), parallel.worker_properties('CO2')
+
+            (a1, a2), (b1, b2) = executor.map(lambda _: get(), range(2))
+        assert a1 is a2 and b1 is b2 and a1 is not b1
+
+    def test_thread_map_matches_process_map(self, tmp_path):
+        results = {}
+        for engine in ('thread', 'process'):
+            directory = str(tmp_path / engine)
+            sweep_map.create_map(directory, 'CO2', [-10, 0], [0.00142], G, X, max_points=15)
+            sweep_map.run_map(directory, workers=2, engine=engine, log=lambda *a: None)
+            sweep = sweep_map.open_map(directory)
+            assert sweep.complete
+            results[engine] = np.array(sweep['DpDz'])
+        assert np.array_equal(results['thread'], results['process'])
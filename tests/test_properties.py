@@ -0,0 +1,66 @@
+"""
+Тесты источников свойств фаз
+"""
+import CoolProp.CoolProp as CP
+import numpy as np
+import pytest
+
+from class_DpDz import DpDz, saturation_properties
+from properties import (ConstantProvider, CoolPropProvider, GasLiquidProvider, PropertyProvider,
+                        TabulatedProvider, get_provider)
+
+X = np.linspace(0.1, 0.9, 5)
+
+
+class TestCoolPropProvider:
+
+    def test_matches_propssi(self):
+        rho_l, mu_l, rho_g, mu_g = CoolPropProvider('CO2').phase_properties(-10)
+        T_K = -10 + 273
+        assert float(rho_l) == CP.PropsSI('D', 'T', T_K, 'Q', 0, 'CO2')
+        assert float(mu_l) == CP.PropsSI('VISCOSITY', 'T', T_K, 'Q', 0, 'CO2')
+        assert float(rho_g) == CP.PropsSI('D', 'T', T_K, 'Q', 1, 'CO2')
+        assert float(mu_g) == CP.PropsSI('VISCOSITY', 'T', T_K, 'Q', 1, 'CO2')
+
+    def test_bulk_keeps_shape(self):
+        provider = get_provider('CO2')
+        T = np.array([[-10, 0], [-10, 10]])
+        values = provider.phase_properties(T)
+        assert all(v.shape == T.shape for v in values)
+        assert values[0][0, 0] == values[0][1, 0] == saturation_properties('CO2', -10)[0]
+        assert provider.reduced_pressure(T).shape == T.shape
+
+
+class TestOtherProviders:
+
+    def test_constant_in_dpdz(self):
+        constant = ConstantProvider(*saturation_properties('CO2', -10))
+        params = {'Substance': 'CO2', 'Temperature': -10, 'G': 300, 'x': X}
+        expected = DpDz(9.81, 0.00142, None, params, False).calculate()
+        result = DpDz(9.81, 0.00142, None, params, False, properties=constant).calculate()
+        assert [r['DpDz'] for r in result] == [r['DpDz'] for r in expected]
+        assert np.isnan(result[0]['alpha'])
+
+    def test_tabulated(self):
+        table = TabulatedProvider.from_provider(get_provider('CO2'), [-20, -10, 0])
+        assert table.phase_properties(-10)[0] == pytest.approx(saturation_properties('CO2', -10)[0])
+        assert table.conductivity(-5) > 0
+        with pytest.raises(ValueError):
+            table.phase_properties(5)
+
+    def test_gas_liquid_pair(self):
+        provider = GasLiquidProvider('Nitrogen', 'Water', 2e5)
+        rho_l, _, rho_g, _ = provider.phase_properties(np.array([20.0, 30.0]))
+        assert np.all(rho_l > 990) and np.all(rho_g < 3)
+        params = {'Substance': 'Nitrogen_Water', 'Temperature': 20, 'G': 300, 'x': X}
+        result = DpDz(9.81, 0.00142, None, params, False, properties=provider).calculate()
+        assert all(r['DpDz'] > 0 for r in result)
+
+    def test_incomplete_provider(self):
+        class OnlyPhases(PropertyProvider):
+            def phase_properties(self, T):
+                return (1.0, 1.0, 1.0, 1.0)
+
+        # Без conductivity и reduced_pressure источник нельзя создать
+        with pytest.raises(TypeError):
+            OnlyPhases()
@@ -0,0 +1,45 @@
+"""
+Тесты потокового экспорта результатов
+"""
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from result_export import stream_export
+
+
+class TestStreamExport:
+
+    @pytest.fixture
+    def results_df(self):
+        n = 1200
+        return pd.DataFrame({
+            'Substance': 'CO2',
+            'x': np.linspace(0.1, 0.9, n),
+            'DpDz': np.linspace(1000.0, 9000.0, n),
+        })
+
+    def test_csv_chunks(self, results_df):
+        """CSV отдается несколькими кусками и читается обратно без потерь"""
+        chunks = list(stream_export(results_df, 'csv', {'substance': 'CO2'}, chunk_rows=500))
+        assert len(chunks) == 4  # шапка + 3 порции
+        restored = pd.read_csv(io.BytesIO(b''.join(chunks)), comment='#')
+        pd.testing.assert_frame_equal(restored, results_df)
+
+    def test_xlsx_roundtrip(self, results_df):
+        data = b''.join(stream_export(results_df, 'xlsx', chunk_rows=500))
+        restored = pd.read_excel(io.BytesIO(data), sheet_name='Results')
+        assert restored.shape == results_df.shape
+        assert np.allclose(restored['DpDz'], results_df['DpDz'])
+
+    def test_parquet_roundtrip(self, results_df):
+        pytest.importorskip('pyarrow')
+        data = b''.join(stream_export(results_df, 'parquet', {'d': 0.00142}, chunk_rows=500))
+        restored = pd.read_parquet(io.BytesIO(data))
+        pd.testing.assert_frame_equal(restored, results_df)
+
+    def test_unknown_format(self, results_df):
+        with pytest.raises(ValueError):
+            stream_export(results_df, 'json')
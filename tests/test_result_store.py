@@ -0,0 +1,88 @@
+"""
+Тесты серверного хранилища результатов
+"""
+import pandas as pd
+
+from result_store import DiskResultStore, ResultStore, new_session_id, valid_session_id
+
+
+class FakeClock:
+    """Управляемые часы для проверки TTL"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResultStore:
+
+    def test_put_get_by_session(self):
+        store = ResultStore()
+        df = pd.DataFrame({'x': [0.1, 0.2], 'DpDz': [1.0, 2.0]})
+        run_id = store.put('session-a', df, {'substance': 'CO2'})
+
+        entry = store.get('session-a', run_id)
+        assert entry['results'] is df
+        assert entry['params']['substance'] == 'CO2'
+        # Чужая сессия не видит результат
+        assert store.get('session-b', run_id) is None
+
+    def test_ttl_eviction(self):
+        clock = FakeClock()
+        store = ResultStore(ttl=10, clock=clock)
+        run_id = store.put('s', pd.DataFrame())
+        clock.now = 5
+        assert store.get('s', run_id) is not None
+        clock.now = 16
+        assert store.get('s', run_id) is None
+        assert len(store) == 0
+
+    def test_bounded_lru(self):
+        store = ResultStore(max_entries=2)
+        first = store.put('s', pd.DataFrame())
+        second = store.put('s', pd.DataFrame())
+        # Обращение к первому делает его самым свежим
+        store.get('s', first)
+        store.put('s', pd.DataFrame())
+        assert store.get('s', first) is not None
+        assert store.get('s', second) is None
+        assert len(store) == 2
+
+
+class TestDiskResultStore:
+
+    def test_shared_between_instances(self, tmp_path):
+        """Запись одного экземпляра видна другому (как другому рабочему процессу)"""
+        writer = DiskResultStore(str(tmp_path))
+        reader = DiskResultStore(str(tmp_path))
+        session_id = new_session_id()
+        df = pd.DataFrame({'x': [0.1], 'DpDz': [1.0]})
+        run_id = writer.put(session_id, df, {'substance': 'CO2'})
+
+        entry = reader.get(session_id, run_id)
+        pd.testing.assert_frame_equal(entry['results'], df)
+        assert entry['params']['substance'] == 'CO2'
+
+    def test_rejects_bad_ids(self, tmp_path):
+        store = DiskResultStore(str(tmp_path))
+        assert store.get('../..', 'etc') is None
+        for bad in (None, '', 'not-hex', 42):
+            assert not valid_session_id(bad)
+        assert valid_session_id(new_session_id())
+
+    def test_bounded(self, tmp_path):
+        store = DiskResultStore(str(tmp_path), max_entries=2)
+        session_id = new_session_id()
+        for _ in range(4):
+            store.put(session_id, pd.DataFrame())
+        assert len(store) == 2
+
+    def test_delete(self, tmp_path):
+        store = DiskResultStore(str(tmp_path))
+        session_id = new_session_id()
+        run_id = store.put(session_id, pd.DataFrame())
+        store.delete(session_id, run_id)
+        store.delete(session_id, run_id)
+        assert store.get(session_id, run_id) is None and len(store) == 0
@@ -0,0 +1,24 @@
+"""
+Проверка чувствительностей DpDz по конечным разностям
+"""
+import numpy as np
+import pytest
+
+from dpdz_vector import calculate_points
+from sensitivity import INPUTS, finite_difference_check, sensitivities
+
+
+class TestSensitivities:
+
+    def test_values_match_vector_model(self):
+        x = np.linspace(0.1, 0.9, 10)
+        sens = sensitivities('CO2', -10, 0.00142, None, 300, x)
+        reference = calculate_points('CO2', -10, 0.00142, None, 300, x)
+        assert np.allclose(sens['DpDz'], reference['DpDz'], rtol=1e-12)
+        assert all(f'dDpDz/d{name}' in sens for name in INPUTS)
+
+    @pytest.mark.parametrize('T, ki', [(-10, None), (0, 24)])
+    def test_finite_differences(self, T, ki):
+        report = finite_difference_check('CO2', T, 0.00142, ki, [[300], [600]], [0.2, 0.5, 0.8])
+        # Разности ограничены точностью решения для B, поэтому допуск 1e-4
+        assert (report['max_rel_error'] < 1e-4).all(), report
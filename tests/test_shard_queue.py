@@ -0,0 +1,105 @@
+"""
+Тесты очереди шардов для распределенного расчета карты
+"""
+import numpy as np
+import pytest
+
+import shard_queue
+import sweep_map
+
+G = np.linspace(200, 800, 6)
+X = np.linspace(0.1, 0.9, 5)
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = shard_queue.ShardQueue(str(tmp_path / 'queue.sqlite'), lease_seconds=60, clock=clock)
+    queue.publish({k: {'chunk': k} for k in range(3)})
+    return queue
+
+
+class TestShardQueue:
+
+    def test_claim_each_shard_once(self, queue):
+        claimed = [queue.claim('a'), queue.claim('b'), queue.claim('a')]
+        assert [c[0] for c in claimed] == [0, 1, 2]
+        assert queue.claim('b') is None
+        assert queue.counts()['leased'] == 3
+
+    def test_publish_is_idempotent(self, queue):
+        queue.claim('a')
+        queue.publish({k: {'chunk': k} for k in range(4)})
+        assert queue.counts() == {'pending': 3, 'leased': 1, 'done': 0, 'expired': 0}
+
+    def test_expired_lease_is_reclaimed(self, queue, clock):
+        assert queue.claim('lost')[0] == 0
+        queue.claim('b')
+        queue.claim('b')
+        clock.now += 61
+        assert queue.counts()['expired'] == 3
+        assert queue.claim('c')[0] == 0
+        # Пропавший рабочий больше не может продлить аренду
+        assert not queue.renew(0, 'lost')
+        assert queue.renew(0, 'c')
+
+    def test_complete_is_idempotent(self, queue, clock):
+        queue.claim('a')
+        clock.now += 61
+        queue.claim('b')
+        queue.complete(0, 'b')
+        # Опоздавший рабочий сдает тот же шард - состояние не меняется
+        queue.complete(0, 'a')
+        assert queue.done_ids() == [0]
+        assert queue.counts()['done'] == 1
+        assert queue.claim('c')[0] == 1
+
+
+class TestWorkerMerge:
+
+    def test_workers_and_merge(self, tmp_path):
+        directory = str(tmp_path)
+        sweep_map.create_map(directory, 'CO2', [-10, 0], [0.00142], G, X, max_points=15)
+        shard_queue.publish_map(directory)
+        log = lambda *a: None
+        assert shard_queue.run_worker(directory, worker_id='a', max_shards=1, log=log) == 1
+        assert shard_queue.run_worker(directory, worker_id='b', log=log) == 3
+        assert shard_queue.queue_for(directory).counts()['done'] == 4
+        assert sweep_map.pending_chunks(directory) == [0, 1, 2, 3]
+
+        assert shard_queue.merge(directory, log=log) == 4
+        assert shard_queue.merge(directory, log=log) == 0
+        sweep = sweep_map.open_map(directory)
+        assert sweep.complete
+        reference = sweep_map.compute_chunk(sweep_map.load_meta(directory), 3)
+        assert np.array_equal(sweep['DpDz'][1, 0, 3:6], reference['DpDz'])
+
+    def test_worker_waits_for_lost_lease(self, tmp_path, clock):
+        directory = str(tmp_path)
+        sweep_map.create_map(directory, 'CO2', [-10, 0], [0.00142], G, X, max_points=15)
+        queue = shard_queue.publish_map(directory, lease_seconds=60, clock=clock)
+        # Рабочий взял шард и пропал, не продлевая аренду
+        assert queue.claim('lost')[0] == 0
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            clock.now += seconds
+
+        done = shard_queue.run_worker(directory, worker_id='b', log=lambda *a: None, sleep=sleep,
+                                      lease_seconds=60, clock=clock)
+        assert done == 4 and queue.counts()['done'] == 4
+        assert len(sleeps) == 1 and sleeps[0] == pytest.approx(60, abs=0.1)
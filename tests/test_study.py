@@ -0,0 +1,84 @@
+"""
+Тесты пакетного расчета исследований
+"""
+import os
+
+import pandas as pd
+import pytest
+
+import study
+
+
+@pytest.fixture
+def spec(tmp_path):
+    return study.load_spec_dict({
+        'name': 'test',
+        'substance': 'CO2',
+        'd': 0.00142,
+        'T': [-10],
+        'G': [300, 400],
+        'x': {'start': 0.1, 'stop': 0.9, 'num': 5},
+        'output': str(tmp_path),
+    })
+
+
+class TestRunStudy:
+
+    def test_results_layout(self, spec, tmp_path):
+        written = study.run_study(spec, workers=1, log=lambda *a: None)
+        assert sorted(os.path.basename(p) for p in written) == ['300.csv', '400.csv']
+        df = pd.read_csv(tmp_path / 'CO2' / 'G' / '300.csv', index_col=0)
+        assert len(df) == 5 and (df['DpDz'] > 0).all()
+
+    def test_resume_skips_done_chunks(self, spec):
+        study.run_study(spec, workers=1, log=lambda *a: None)
+        os.remove(os.path.join(study.checkpoint_dir(spec), 'T-10_G400.csv'))
+
+        messages = []
+        study.run_study(spec, workers=1, log=messages.append)
+        assert 'готово 1' in messages[0]
+        assert any('T-10_G400' in m for m in messages[1:])
+
+    def test_changed_spec_needs_restart(self, spec):
+        study.run_study(spec, workers=1, log=lambda *a: None)
+        changed = {**spec, 'x': {'start': 0.1, 'stop': 0.9, 'num': 7}}
+        with pytest.raises(ValueError, match='--restart'):
+            study.run_study(changed, workers=1, log=lambda *a: None)
+        study.run_study(changed, workers=1, restart=True, log=lambda *a: None)
+        df = pd.read_csv(os.path.join(spec['output'], 'CO2', 'G', '300.csv'), index_col=0)
+        assert len(df) == 7 and 'status' not in df
+
+    def test_keeps_foreign_results(self, spec, tmp_path):
+        os.makedirs(tmp_path / 'CO2' / 'G')
+        (tmp_path / 'CO2' / 'G' / '300.csv').write_text('из ноутбука')
+        with pytest.raises(FileExistsError):
+            study.run_study(spec, workers=1, log=lambda *a: None)
+        assert (tmp_path / 'CO2' / 'G' / '300.csv').read_text() == 'из ноутбука'
+        study.run_study(spec, workers=1, overwrite=True, log=lambda *a: None)
+        # Свои файлы исследование перезаписывает без --overwrite
+        assert len(study.run_study(spec, workers=1, log=lambda *a: None)) == 2
+
+    def test_value_fb_rejected(self, spec):
+        with pytest.raises(ValueError):
+            study.load_spec_dict({**spec, 'value_fb': True})
+        assert 'value_fb' not in study.load_spec_dict({**spec, 'value_fb': False})
+
+    def test_empty_grid(self, spec):
+        assert study.run_study({**spec, 'G': []}, workers=1, log=lambda *a: None) == []
+
+    def test_failed_chunk_closes_pool(self, spec, monkeypatch):
+        executors = []
+        make = study.make_executor
+
+        def make_executor(workers, engine):
+            executors.append(make(workers, 'thread'))
+            return executors[-1]
+
+        def run_chunk(*args):
+            raise RuntimeError("сбой порции")
+
+        monkeypatch.setattr(study, 'make_executor', make_executor)
+        monkeypatch.setattr(study, 'run_chunk', run_chunk)
+        with pytest.raises(RuntimeError):
+            study.run_study(spec, workers=1, log=lambda *a: None)
+        assert executors[0]._shutdown
@@ -0,0 +1,52 @@
+"""
+Тесты карт расчета в файлах memmap
+"""
+import json
+
+import numpy as np
+import pytest
+
+import sweep_map
+from dpdz_vector import calculate_points
+
+G = np.linspace(200, 800, 6)
+X = np.linspace(0.1, 0.9, 5)
+
+
+@pytest.fixture
+def directory(tmp_path):
+    sweep_map.create_map(str(tmp_path), 'CO2', [-10, 0], [0.00142], G, X, max_points=15)
+    return str(tmp_path)
+
+
+class TestSweepMap:
+
+    def test_chunks_are_disjoint(self, directory):
+        chunks = sweep_map.load_meta(directory)['chunks']
+        assert len(chunks) == 4
+        assert [c[2:] for c in chunks[:2]] == [[0, 3], [3, 6]]
+
+    def test_fill_and_read(self, directory):
+        for k in sweep_map.pending_chunks(directory):
+            sweep_map.fill_chunk(directory, k)
+        sweep = sweep_map.open_map(directory)
+        assert sweep.complete
+        assert isinstance(sweep['DpDz'], np.memmap) and sweep['DpDz'].shape == (2, 1, 6, 5)
+        expected = calculate_points('CO2', 0, 0.00142, None, G[4], X)['DpDz'].to_numpy()
+        assert np.allclose(sweep.select('DpDz', 0, 0.00142)[4], expected, rtol=1e-12)
+        assert (sweep['status'][:] == 0).all()
+
+    def test_resume(self, directory):
+        sweep_map.fill_chunk(directory, 0)
+        assert sweep_map.pending_chunks(directory) == [1, 2, 3]
+        sweep_map.run_map(directory, workers=1, log=lambda *a: None)
+        assert sweep_map.pending_chunks(directory) == []
+        assert not np.isnan(sweep_map.open_map(directory)['B'][:]).any()
+
+    def test_create_only(self, tmp_path):
+        spec = {'substance': 'CO2', 'T': [-10], 'd': [0.00142], 'G': G.tolist(), 'x': X.tolist(),
+                'output': str(tmp_path / 'map')}
+        spec_path = tmp_path / 'map.json'
+        spec_path.write_text(json.dumps(spec), encoding='utf-8')
+        assert sweep_map.main([str(spec_path), '--create-only']) == 0
+        assert sweep_map.pending_chunks(spec['output']) == [0]
@@ -0,0 +1,61 @@
+"""
+Тесты тайлов двумерных карт
+"""
+import numpy as np
+import pytest
+
+import tiles
+from dpdz_vector import calculate_points
+
+D = 0.00142
+
+
+class TestTiles:
+
+    def test_tile_matches_vector_engine(self):
+        cache = tiles.TileCache()
+        tile = cache.tile('CO2', D, None, 'G', -10, 1, 1, 0)
+        x = tiles.tile_axis(tiles.X_DOMAIN, 1, 1)
+        G = tiles.tile_axis(tiles.G_DOMAIN, 1, 0)
+        expected = calculate_points('CO2', -10, D, None, G[3], x)
+        assert tile['DpDz'].shape == (tiles.TILE_SIZE, tiles.TILE_SIZE)
+        assert np.allclose(tile['DpDz'][3], expected['DpDz'], rtol=1e-10)
+        assert np.allclose(tile['B'][3], expected['B'], rtol=1e-10)
+
+    def test_temperature_plane(self):
+        tile = tiles.TileCache().tile('CO2', D, None, 'T', 400, 2, 3, 2)
+        T = tiles.tile_axis(tiles.plane_domain('CO2', 'T'), 2, 2)
+        x = tiles.tile_axis(tiles.X_DOMAIN, 2, 3)
+        expected = calculate_points('CO2', T[7], D, None, 400, x)['DpDz']
+        assert np.allclose(tile['DpDz'][7], expected, rtol=1e-10)
+
+    def test_view_reuses_tiles(self):
+        cache = tiles.TileCache()
+        view = cache.view('CO2', D, None, 'G', -10, (0.3, 0.5), (300, 500))
+        assert view['x'][0] <= 0.3 and view['x'][-1] >= 0.5 - 1 / 2 ** view['zoom']
+        assert view['fields']['fi'].shape == (len(view['y']), len(view['x']))
+        misses = cache.stats()['misses']
+        # Небольшой сдвиг окна - почти все тайлы из кэша
+        cache.view('CO2', D, None, 'G', -10, (0.31, 0.51), (310, 510))
+        stats = cache.stats()
+        assert stats['hits'] >= view['tiles'] // 2
+        assert stats['misses'] - misses <= view['tiles'] // 2
+
+    def test_zoom_and_limits(self):
+        assert tiles.choose_zoom((0, 1), (50, 2000), tiles.X_DOMAIN, tiles.G_DOMAIN) == 2
+        assert tiles.choose_zoom((0.5, 0.5 + 1e-9), (50, 2000), tiles.X_DOMAIN, tiles.G_DOMAIN) == tiles.MAX_ZOOM
+        assert list(tiles.tile_span((0.3, 0.5), (0, 1), 3)) == [2, 3, 4]
+        view = tiles.TileCache().view('CO2', D, None, 'G', -10, (0, 1), (1000, 1001))
+        assert view['tiles'] <= tiles.MAX_VIEW_TILES
+
+    def test_cache_eviction(self):
+        cache = tiles.TileCache(max_tiles=2)
+        for i in range(3):
+            cache.tile('CO2', D, None, 'G', -10, 2, i, 0)
+        assert cache.stats()['tiles'] == 2
+        with pytest.raises(ValueError):
+            tiles.plane_domain('CO2', 'd')
+
+    def test_temperature_plane_rejects_non_positive_G(self):
+        with pytest.raises(ValueError):
+            tiles.TileCache().view('CO2', D, None, 'T', -10)
@@ -0,0 +1,127 @@
+"""
+Тесты трассировки этапов расчета
+"""
+import json
+import time
+
+import flask
+import pytest
+
+import tracing
+from calculation import IncrementalEvaluator, JobRegistry
+
+
+@pytest.fixture
+def exporter():
+    exporter = tracing.MemoryExporter()
+    previous = tracing.set_exporter(exporter)
+    yield exporter
+    tracing.set_exporter(previous)
+
+
+@pytest.fixture
+def request_params():
+    return {
+        'substance': 'CO2',
+        'd': 0.00142,
+        'G': 300,
+        'T': -10,
+        'g': 9.81,
+        'ki': None,
+        'num_points': 12,
+        'x_start': 0.1,
+        'x_end': 0.9,
+        'value_fb': False,
+    }
+
+
+class TestTracing:
+
+    def test_nested_spans_share_trace(self, exporter):
+        with tracing.span('request', user='a') as root:
+            with tracing.span('stage') as stage:
+                stage.set_attribute('points', 3)
+        inner, outer = exporter.spans
+        assert (inner['name'], outer['name']) == ('stage', 'request')
+        assert inner['trace_id'] == outer['trace_id'] == root.trace_id
+        assert inner['parent_id'] == outer['span_id'] and outer['parent_id'] is None
+        assert inner['attributes'] == {'points': 3} and outer['attributes'] == {'user': 'a'}
+        assert outer['duration_ms'] >= inner['duration_ms'] >= 0
+
+    def test_separate_requests_get_separate_traces(self, exporter):
+        for _ in range(2):
+            with tracing.span('request'):
+                pass
+        assert exporter.spans[0]['trace_id'] != exporter.spans[1]['trace_id']
+
+    def test_exception_is_recorded(self, exporter, capsys):
+        with pytest.raises(ValueError):
+            with tracing.span('dpdz.solve'):
+                raise ValueError("нет корня")
+        recorded = exporter.spans[0]
+        assert recorded['status'] == 'ERROR'
+        assert recorded['events'][0]['attributes'] == {'type': 'ValueError', 'message': 'нет корня'}
+
+        with tracing.span('figure'):
+            tracing.record_exception(KeyError('DpDz'), "Error creating plot")
+        assert exporter.spans[1]['status'] == 'ERROR'
+        assert exporter.spans[1]['events'][0]['attributes']['context'] == "Error creating plot"
+        # Диагностика в журнале не зависит от того, включена ли трассировка
+        assert "Error creating plot: 'DpDz'" in capsys.readouterr().err
+
+    def test_disabled_by_default(self, capsys):
+        previous = tracing.set_exporter(None)
+        try:
+            with tracing.span('stage') as stage:
+                stage.set_attribute('points', 3)
+            assert stage is tracing.NOOP_SPAN
+            tracing.record_exception(ValueError('x'), "Error reading file")
+        finally:
+            tracing.set_exporter(previous)
+        assert 'Error reading file: x' in capsys.readouterr().err
+
+    def test_job_trace_links_to_request(self, exporter, request_params):
+        jobs = JobRegistry(IncrementalEvaluator())
+        with tracing.span('request') as root:
+            jobs.start(request_params)
+        deadline = time.monotonic() + 60
+        while not any(s['name'] == 'job.run' for s in exporter.spans):
+            assert time.monotonic() < deadline, "фоновое задание не завершилось"
+            time.sleep(0.01)
+        # В трассе запроса только сам запрос, у задания своя трасса со ссылкой на него
+        assert [s['name'] for s in exporter.spans if s['trace_id'] == root.trace_id] == ['request']
+        job_root = next(s for s in exporter.spans if s['name'] == 'job.run')
+        assert job_root['parent_id'] is None
+        assert job_root['links'] == [{'trace_id': root.trace_id, 'span_id': root.span_id}]
+        names = {s['name'] for s in exporter.spans if s['trace_id'] == job_root['trace_id']}
+        assert {'job.run', 'job.batch', 'dpdz.construct', 'properties.lookup', 'dpdz.solve'} <= names
+
+    def test_file_exporter_and_summary(self, tmp_path):
+        path = tmp_path / 'trace.jsonl'
+        previous = tracing.set_exporter(tracing.exporter_from_env(f"file:{path}"))
+        try:
+            from dpdz_vector import calculate_points
+            with tracing.span('request'):
+                calculate_points('CO2', -10, 0.00142, None, 300, [0.1, 0.5, 0.9])
+        finally:
+            tracing.set_exporter(previous)
+        spans = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+        assert [s['name'] for s in spans] == ['properties.lookup', 'dpdz.solve', 'dataframe', 'request']
+        summary = tracing.summarize(tracing.load_spans(path))
+        assert 'dpdz.solve' in summary and 'trace ' + spans[0]['trace_id'] in summary
+        with pytest.raises(ValueError):
+            tracing.exporter_from_env('collector')
+
+    def test_flask_request_span(self, exporter):
+        server = flask.Flask(__name__)
+        tracing.register_tracing(server)
+
+        @server.route('/_dash-update-component', methods=['POST'])
+        def update():
+            with tracing.span('figure'):
+                return 'ok'
+
+        server.test_client().post('/_dash-update-component', json={'output': 'calculation-plot.figure'})
+        figure, root = exporter.spans
+        assert root['name'] == 'callback calculation-plot.figure'
+        assert figure['parent_id'] == root['span_id']
@@ -0,0 +1,46 @@
+"""
+Тесты распространения неопределенности методом Монте-Карло
+"""
+import numpy as np
+import pytest
+
+import uncertainty
+from uncertainty import propagate
+
+SIGMA = {'G': 0.02, 'x': 0.01, 'T': 0.2, 'd': 0.01, 'liquid_viscosity': 0.03}
+
+
+class TestPropagate:
+
+    def test_zero_sigma_gives_nominal(self):
+        result = propagate('CO2', -10, 0.00142, None, 300, [0.3, 0.6], {}, n_samples=20, seed=0)
+        assert np.allclose(result['p50'], result['DpDz'], rtol=1e-12)
+        assert np.allclose(result['std'], 0, atol=1e-6)
+
+    def test_percentiles_bracket_nominal(self):
+        result = propagate('CO2', -10, 0.00142, None, 300, [0.3, 0.6], SIGMA, n_samples=4000, seed=0)
+        assert ((result['p2.5'] < result['DpDz']) & (result['DpDz'] < result['p97.5'])).all()
+        assert (result['failed'] == 0).all()
+
+    def test_chunking_is_reproducible(self):
+        # Порции меньше числа выборок одной точки: выборки склеиваются по порциям
+        kwargs = dict(sigma=SIGMA, n_samples=3000, seed=7)
+        small = propagate('CO2', -10, 0.00142, None, 300, [0.5], max_evaluations=700, **kwargs)
+        assert small['std'].iloc[0] > 0
+        again = propagate('CO2', -10, 0.00142, None, 300, [0.5], max_evaluations=700, **kwargs)
+        assert small.equals(again)
+
+    def test_unknown_source(self):
+        with pytest.raises(ValueError):
+            propagate('CO2', -10, 0.00142, None, 300, [0.5], {'P': 0.1})
+
+    def test_no_samples(self):
+        with pytest.raises(ValueError):
+            propagate('CO2', -10, 0.00142, None, 300, [0.5], {'T': 0.1}, n_samples=0)
+
+    def test_draws_outside_property_table_fail(self, monkeypatch):
+        # Таблица на +-0.5 sigma: большая часть разыгранных T за ее пределами
+        monkeypatch.setattr(uncertainty, 'T_TABLE_SIGMAS', 0.5)
+        result = propagate('CO2', -10, 0.00142, None, 300, [0.5], {'T': 0.2}, n_samples=2000, seed=0)
+        assert 0.5 < result['failed'].iloc[0] < 0.75
+        assert np.isfinite(result['mean'].iloc[0])
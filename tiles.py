@@ -0,0 +1,188 @@
+"""
+Тайлы двумерных карт DpDz, B и fi для дашборда.
+
+Плоскость - x по горизонтали и G или T по вертикали (второй параметр
+фиксирован). Область плоскости делится квадродеревом: на уровне zoom
+по каждой оси 2**zoom тайлов, в тайле TILE_SIZE x TILE_SIZE узлов в центрах
+ячеек. Тайл считается одним векторным решением (dpdz_vector.solve_film)
+сразу для всех узлов и кладется в кэш по
+(вещество, d, ki, плоскость, фиксированное значение, zoom, i, j),
+поэтому сдвиг и масштабирование окна досчитывают только новые тайлы.
+
+    view = TILE_CACHE.view('CO2', 0.00142, None, 'G', -10, x_range=(0.2, 0.6), y_range=(200, 600))
+    view['x'], view['y'], view['fields']['DpDz']
+"""
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from dpdz_vector import effective_ki, interfacial_stress, solve_film
+from metrics import REGISTRY
+from properties import get_provider
+
+FIELDS = ('DpDz', 'B', 'fi')
+PLANES = ('G', 'T')
+
+# Узлов в тайле по каждой оси и желаемое число узлов на ширину окна
+TILE_SIZE = 32
+VIEW_SAMPLES = 128
+MAX_ZOOM = 8
+MAX_VIEW_TILES = 64
+
+# Область по x и G; по T - от тройной до критической точки вещества с отступом
+X_DOMAIN = (0.0, 1.0)
+G_DOMAIN = (50.0, 2000.0)
+T_MARGIN = 1.0
+
+TILE_CACHE_SIZE = 1024
+
+
+def plane_domain(substance, plane):
+    """Границы вертикальной оси плоскости"""
+    if plane == 'G':
+        return G_DOMAIN
+    if plane == 'T':
+        provider = get_provider(substance)
+        return (math.ceil(provider.triple_temperature() + T_MARGIN),
+                math.floor(provider.critical_temperature() - T_MARGIN))
+    raise ValueError(f"plane должна быть одной из {PLANES}")
+
+
+def tile_axis(domain, zoom, index):
+    """Узлы тайла index на уровне zoom: центры TILE_SIZE ячеек его отрезка"""
+    lo, hi = domain
+    width = (hi - lo) / 2 ** zoom
+    return lo + width * (index + (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE)
+
+
+def solve_plane(substance, d, ki, G, T, x):
+    """DpDz, B и fi для транслируемых массивов G, T, x одним векторным решением"""
+    G, T, x = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (G, T, x)))
+    rho_l, mu_l, rho_g, mu_g = get_provider(substance).phase_properties(T)
+    jl = G * (1 - x) / rho_l
+    jg = G * x / rho_g
+    ki_eff = effective_ki(np.nan if ki is None else ki, rho_l, rho_g)
+    B, _ = solve_film(jg.ravel(), jl.ravel(), d, ki_eff.ravel(), rho_l.ravel(), rho_g.ravel(),
+                      mu_l.ravel(), mu_g.ravel())
+    B = B.reshape(G.shape)
+    with np.errstate(all='ignore'):
+        dpdz = 4.0 * interfacial_stress(B, jg, d, ki_eff, rho_g, mu_g) / (d - 2 * B)
+        fi = ((d - 2 * B) / d) ** 2
+    return {'DpDz': dpdz, 'B': B, 'fi': fi}
+
+
+def choose_zoom(x_range, y_range, x_domain, y_domain):
+    """Уровень, на котором в окне около VIEW_SAMPLES узлов по более узкой оси"""
+    fraction = min((x_range[1] - x_range[0]) / (x_domain[1] - x_domain[0]),
+                   (y_range[1] - y_range[0]) / (y_domain[1] - y_domain[0]))
+    zoom = math.ceil(math.log2(VIEW_SAMPLES / (TILE_SIZE * max(fraction, 1e-12))))
+    return min(max(zoom, 0), MAX_ZOOM)
+
+
+def tile_span(value_range, domain, zoom):
+    """Индексы тайлов, покрывающих отрезок value_range"""
+    n = 2 ** zoom
+    width = (domain[1] - domain[0]) / n
+    first = int(np.clip((value_range[0] - domain[0]) // width, 0, n - 1))
+    last = int(np.clip((value_range[1] - domain[0]) // width, 0, n - 1))
+    return range(first, last + 1)
+
+
+class TileCache():
+    """Потокобезопасный LRU-кэш тайлов со счетчиками попаданий"""
+
+    def __init__(self, max_tiles=TILE_CACHE_SIZE):
+        self.max_tiles = max_tiles
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def tile(self, substance, d, ki, plane, fixed, zoom, i, j):
+        """Поля тайла (i - по x, j - по вертикальной оси): массивы (TILE_SIZE, TILE_SIZE) [y, x]"""
+        key = (substance, float(d), None if ki is None else float(ki), plane, float(fixed), zoom, i, j)
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return tile
+            self.misses += 1
+
+        x = tile_axis(X_DOMAIN, zoom, i)
+        y = tile_axis(plane_domain(substance, plane), zoom, j)
+        if plane == 'G':
+            tile = solve_plane(substance, d, ki, y[:, None], fixed, x[None, :])
+        else:
+            tile = solve_plane(substance, d, ki, fixed, y[:, None], x[None, :])
+
+        with self._lock:
+            self._tiles[key] = tile
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        return tile
+
+    def view(self, substance, d, ki, plane, fixed, x_range=None, y_range=None):
+        """
+        Сетка для окна просмотра из тайлов одного уровня.
+        Возвращает {'x', 'y', 'fields': {поле: [y, x]}, 'zoom', 'tiles'}
+        """
+        if plane == 'T' and not fixed > 0:
+            raise ValueError("Для плоскости x - T массовый расход G должен быть больше нуля")
+        y_domain = plane_domain(substance, plane)
+        x_range = _clip_range(x_range, X_DOMAIN)
+        y_range = _clip_range(y_range, y_domain)
+        zoom = choose_zoom(x_range, y_range, X_DOMAIN, y_domain)
+        while True:
+            columns = tile_span(x_range, X_DOMAIN, zoom)
+            rows = tile_span(y_range, y_domain, zoom)
+            if len(columns) * len(rows) <= MAX_VIEW_TILES or zoom == 0:
+                break
+            zoom -= 1
+
+        tiles = [[self.tile(substance, d, ki, plane, fixed, zoom, i, j) for i in columns] for j in rows]
+        fields = {field: np.block([[tile[field] for tile in row] for row in tiles]) for field in FIELDS}
+        return {
+            'x': np.concatenate([tile_axis(X_DOMAIN, zoom, i) for i in columns]),
+            'y': np.concatenate([tile_axis(y_domain, zoom, j) for j in rows]),
+            'fields': fields,
+            'zoom': zoom,
+            'tiles': len(columns) * len(rows),
+        }
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'tiles': len(self._tiles),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+
+
+def _clip_range(value_range, domain):
+    if value_range is None:
+        return domain
+    lo, hi = sorted(float(v) for v in value_range)
+    lo, hi = max(lo, domain[0]), min(hi, domain[1])
+    return (lo, hi) if hi > lo else domain
+
+
+TILE_CACHE = TileCache()
+
+
+@REGISTRY.register_collector
+def _collect_metrics():
+    stats = TILE_CACHE.stats()
+    return [
+        ('dpdz_tile_cache_requests_total', 'counter', "Обращения к кэшу тайлов карт",
+         [({'result': 'hit'}, stats['hits']), ({'result': 'miss'}, stats['misses'])]),
+        ('dpdz_tile_cache_entries', 'gauge', "Тайлы в кэше", [({}, stats['tiles'])]),
+    ]
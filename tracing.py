@@ -0,0 +1,305 @@
+"""
+Трассировка этапов расчета: спаны в духе OpenTelemetry без коллектора.
+
+Спан - именованный отрезок времени с атрибутами; вложенные спаны одного
+запроса имеют общий trace_id. Текущий спан хранится в contextvars.
+
+Фоновая работа (задания расчета дашборда) идет после ответа на запрос,
+поэтому ее спаны не вкладываются в спан запроса: функция, обернутая
+detach(), открывает свою трассу, а ее корневой спан ссылается (links)
+на спан запроса, который ее запустил. Трасса запроса показывает только
+время самого запроса (проверка формы, запуск задания, график), трасса
+задания - свойства, решение и сборку таблицы.
+
+    with span('dpdz.solve', points=100) as s:
+        ...
+        s.set_attribute('failed', 0)
+
+Включение - переменная окружения DPDZ_TRACE (или set_exporter):
+    DPDZ_TRACE=console          - JSON-строки в stderr
+    DPDZ_TRACE=file:trace.jsonl - JSON-строки в файл (дописываются)
+Без нее спаны не создаются и не пишутся (span() возвращает пустой спан).
+
+Сводка по этапам и самые медленные запросы:
+    python -m tracing trace.jsonl [--top 5]
+"""
+import argparse
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+
+ENV_VAR = 'DPDZ_TRACE'
+
+_current = contextvars.ContextVar('dpdz_span', default=None)
+# Спан, запустивший фоновую работу (detach): на него ссылается ее корневой спан
+_link = contextvars.ContextVar('dpdz_span_link', default=None)
+
+
+class Span():
+    """Один этап: имя, время, атрибуты, исключения"""
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns', 'attributes', 'events',
+                 'status', 'links')
+
+    def __init__(self, name, parent=None, attributes=None, links=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.status = 'OK'
+        self.links = links or []
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_exception(self, exc, message=None):
+        self.status = 'ERROR'
+        attributes = {'type': type(exc).__name__, 'message': str(exc)}
+        if message:
+            attributes['context'] = message
+        self.events.append({'name': 'exception', 'time_unix_nano': time.time_ns(), 'attributes': attributes})
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_unix_nano': self.start_ns,
+            'duration_ms': (self.end_ns - self.start_ns) / 1e6,
+            'status': self.status,
+            'attributes': self.attributes,
+            'events': self.events,
+            'links': self.links,
+        }
+
+
+class _NoopSpan():
+    """Пустой спан при выключенной трассировке"""
+    trace_id = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_exception(self, exc, message=None):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class ConsoleExporter():
+    """Спаны JSON-строками в поток (по умолчанию stderr)"""
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            print(line, file=self.stream or sys.stderr, flush=True)
+
+
+class FileExporter():
+    """Спаны JSON-строками в файл; процессы и потоки дописывают строки целиком"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str) + '\n'
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+class MemoryExporter():
+    """Спаны в списке (для тестов и отладки)"""
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span.to_dict())
+
+
+def exporter_from_env(value=None):
+    value = os.environ.get(ENV_VAR, '') if value is None else value
+    if not value:
+        return None
+    if value == 'console':
+        return ConsoleExporter()
+    if value.startswith('file:'):
+        return FileExporter(value[len('file:'):])
+    raise ValueError(f"{ENV_VAR}: ожидается 'console' или 'file:<путь>', получено {value!r}")
+
+
+_exporter = exporter_from_env()
+
+
+def set_exporter(exporter):
+    """Включает трассировку (None - выключает). Возвращает прежний экспортер"""
+    global _exporter
+    previous, _exporter = _exporter, exporter
+    return previous
+
+
+def enabled():
+    return _exporter is not None
+
+
+def current_span():
+    return _current.get() or NOOP_SPAN
+
+
+def record_exception(exc, message=None):
+    """Обработанное исключение: строка в stderr всегда, событие в текущем спане - при трассировке"""
+    print(f"{message or 'Ошибка'}: {exc}", file=sys.stderr)
+    active = _current.get()
+    if active is not None:
+        active.record_exception(exc, message)
+
+
+def start_span(name, **attributes):
+    """Открывает спан без with (например, на время HTTP-запроса). Возвращает (спан, токен)"""
+    if _exporter is None:
+        return NOOP_SPAN, None
+    parent = _current.get()
+    link = _link.get() if parent is None else None
+    new = Span(name, parent, attributes, [link] if link else None)
+    return new, _current.set(new)
+
+
+def end_span(active, token):
+    if token is None:
+        return
+    _current.reset(token)
+    active.end_ns = time.time_ns()
+    exporter = _exporter
+    if exporter is not None:
+        exporter.export(active)
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """Спан на время блока with; исключение отмечается в спане и пробрасывается дальше"""
+    active, token = start_span(name, **attributes)
+    try:
+        yield active
+    except BaseException as e:
+        active.record_exception(e)
+        raise
+    finally:
+        end_span(active, token)
+
+
+def traced(name=None):
+    """Декоратор: вызов функции - спан (по умолчанию с именем функции)"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def detach(func):
+    """func для запуска в фоне: ее спаны - отдельная трасса со ссылкой на текущий спан"""
+    active = _current.get()
+    link = {'trace_id': active.trace_id, 'span_id': active.span_id} if active is not None else None
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        return contextvars.Context().run(_run_linked, link, func, args, kwargs)
+    return run
+
+
+def _run_linked(link, func, args, kwargs):
+    _link.set(link)
+    return func(*args, **kwargs)
+
+
+def register_tracing(server):
+    """Корневой спан на каждый HTTP-запрос Flask (один trace_id на запрос)"""
+    from flask import g, request
+
+    @server.before_request
+    def _start_request_span():
+        if _exporter is None:
+            return
+        name = f"HTTP {request.method} {request.path}"
+        attributes = {'http.method': request.method, 'http.path': request.path}
+        if request.path.endswith('_dash-update-component'):
+            # Все callback'и Dash идут на один адрес - спан называется по выходу callback'а
+            output = (request.get_json(silent=True) or {}).get('output')
+            name = f"callback {output}"
+            attributes['dash.output'] = output
+        g.trace_span = start_span(name, **attributes)
+
+    @server.teardown_request
+    def _end_request_span(exc):
+        active, token = g.pop('trace_span', (NOOP_SPAN, None))
+        if exc is not None:
+            active.record_exception(exc)
+        end_span(active, token)
+
+
+def load_spans(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(spans, top=5):
+    """Текст сводки: длительность этапов по именам и разбор самых медленных запросов"""
+    by_name = {}
+    for s in spans:
+        by_name.setdefault(s['name'], []).append(s['duration_ms'])
+    lines = [f"{'этап':40s} {'число':>7s} {'p50, мс':>10s} {'p95, мс':>10s} {'макс, мс':>10s}"]
+    for name, durations in sorted(by_name.items(), key=lambda item: -sum(item[1])):
+        durations.sort()
+        p50 = durations[len(durations) // 2]
+        p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        lines.append(f"{name[:40]:40s} {len(durations):7d} {p50:10.2f} {p95:10.2f} {durations[-1]:10.2f}")
+
+    roots = sorted((s for s in spans if s['parent_id'] is None), key=lambda s: -s['duration_ms'])[:top]
+    children = {}
+    for s in spans:
+        children.setdefault(s['parent_id'], []).append(s)
+
+    def walk(node, depth):
+        lines.append(f"{'  ' * depth}{node['name']}: {node['duration_ms']:.2f} мс"
+                     + (' [ERROR]' if node['status'] == 'ERROR' else ''))
+        for child in sorted(children.get(node['span_id'], []), key=lambda s: s['start_unix_nano']):
+            walk(child, depth + 1)
+
+    for root in roots:
+        origin = ''.join(f" (запущена из trace {link['trace_id']})" for link in root.get('links', []))
+        lines.append(f"\ntrace {root['trace_id']}{origin}")
+        walk(root, 1)
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сводка трассировки по этапам")
+    parser.add_argument('path', help="файл спанов (DPDZ_TRACE=file:<путь>)")
+    parser.add_argument('--top', type=int, default=5, help="сколько самых медленных запросов разобрать")
+    args = parser.parse_args(argv)
+    print(summarize(load_spans(args.path), args.top))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Распространение неопределенности методом Монте-Карло.
+
+Для каждой рабочей точки (G, x) разыгрываются возмущения входов и свойств
+фаз, все выборки решаются одним векторным вызовом dpdz_vector.solve_film.
+Работа идет порциями не больше max_evaluations точек-выборок, поэтому
+1e4+ выборок на точку не требуют памяти на всю карту сразу.
+
+Стандартные отклонения (нормальное распределение):
+    G, d                       - относительные (0.02 = 2 %)
+    x                          - абсолютное, x ограничивается интервалом (0, 1)
+    T                          - абсолютное, °C
+    liquid_density, liquid_viscosity,
+    gas_density, gas_viscosity - относительные ошибки корреляций свойств
+
+    result = propagate('CO2', T=-10, d=0.00142, ki=None, G=300, x=[0.2, 0.5],
+                       sigma={'G': 0.02, 'x': 0.01, 'T': 0.2, 'd': 0.01}, n_samples=10000)
+"""
+import warnings
+
+import numpy as np
+
+from dpdz_vector import calculate_points, effective_ki, interfacial_stress, solve_film
+from lazy_import import lazy_module
+from properties import TabulatedProvider, get_provider
+
+pd = lazy_module('pandas')
+
+SIGMA_KEYS = ('G', 'x', 'T', 'd', 'liquid_density', 'liquid_viscosity', 'gas_density', 'gas_viscosity')
+
+PERCENTILES = (2.5, 50, 97.5)
+
+# Разыгранное x ограничивается интервалом (X_MIN, 1 - X_MIN)
+X_MIN = 1.0e-6
+
+# Предел числа одновременно решаемых точек-выборок
+MAX_EVALUATIONS = 200000
+
+# Узлы таблицы свойств вокруг T (свойства для каждой выборки интерполируются)
+T_TABLE_NODES = 65
+T_TABLE_SIGMAS = 6
+
+
+def _check_sigma(sigma):
+    unknown = set(sigma) - set(SIGMA_KEYS)
+    if unknown:
+        raise ValueError(f"Неизвестные источники неопределенности: {', '.join(sorted(unknown))}")
+    if any(value < 0 for value in sigma.values()):
+        raise ValueError("Стандартные отклонения не могут быть отрицательными")
+    return {key: float(sigma.get(key, 0.0)) for key in SIGMA_KEYS}
+
+
+def _property_table(provider, T, sigma_T):
+    """Провайдер для разыгранных T: таблица вокруг T или исходный провайдер при sigma_T = 0"""
+    if sigma_T == 0:
+        return provider
+    half_width = T_TABLE_SIGMAS * sigma_T
+    return TabulatedProvider.from_provider(provider, np.linspace(T - half_width, T + half_width, T_TABLE_NODES))
+
+
+def _sample_dpdz(rng, n, G, x, T, d, ki, sigma, table):
+    """DpDz для n выборок в каждой из точек (G, x); форма результата (len(G), n)"""
+    shape = (len(G), n)
+    G_s = G[:, None] * (1 + sigma['G'] * rng.standard_normal(shape))
+    x_s = np.clip(x[:, None] + sigma['x'] * rng.standard_normal(shape), X_MIN, 1 - X_MIN)
+    d_s = d * (1 + sigma['d'] * rng.standard_normal(shape))
+    T_s = T + sigma['T'] * rng.standard_normal(shape) if sigma['T'] else np.full(shape, float(T))
+    # Редкие выборки за пределами таблицы свойств (дальше T_TABLE_SIGMAS) считаются без решения
+    outside = np.zeros(shape, dtype=bool)
+    if isinstance(table, TabulatedProvider):
+        outside = (T_s < table.T[0]) | (T_s > table.T[-1])
+        T_s = np.clip(T_s, table.T[0], table.T[-1])
+
+    props = []
+    for key, values in zip(SIGMA_KEYS[4:], table.phase_properties(T_s)):
+        props.append(values * (1 + sigma[key] * rng.standard_normal(shape)))
+    rho_l, mu_l, rho_g, mu_g = props
+
+    jl = G_s * (1 - x_s) / rho_l
+    jg = G_s * x_s / rho_g
+    ki_eff = effective_ki(np.nan if ki is None else ki, rho_l, rho_g)
+
+    B, _ = solve_film(jg, jl, d_s, ki_eff, rho_l, rho_g, mu_l, mu_g)
+    with np.errstate(all='ignore'):
+        dpdz = 4.0 * interfacial_stress(B, jg, d_s, ki_eff, rho_g, mu_g) / (d_s - 2 * B)
+    return np.where(outside, np.nan, dpdz)
+
+
+def propagate(substance, T, d, ki, G, x, sigma, n_samples=10000, percentiles=PERCENTILES,
+              max_evaluations=MAX_EVALUATIONS, seed=None, properties=None):
+    """
+    Монте-Карло для пар (G, x) при одном веществе и T.
+    Возвращает DataFrame по точкам: G, x, DpDz без возмущений, mean, std,
+    перцентили DpDz и доля выборок без решения (failed)
+    """
+    sigma = _check_sigma(sigma)
+    if n_samples < 1 or max_evaluations < 1:
+        raise ValueError("n_samples и max_evaluations должны быть не меньше 1")
+    rng = np.random.default_rng(seed)
+    provider = properties if properties is not None else get_provider(substance)
+    table = _property_table(provider, float(T), sigma['T'])
+
+    G, x = np.broadcast_arrays(np.asarray(G, dtype=float), np.asarray(x, dtype=float))
+    G, x = G.ravel(), x.ravel()
+    nominal = calculate_points(substance, T, d, ki, G, x, properties=properties)['DpDz'].to_numpy()
+
+    # Порция: несколько точек целиком или часть выборок одной точки
+    points_per_chunk = max(1, max_evaluations // n_samples)
+    samples_per_chunk = min(n_samples, max_evaluations)
+
+    rows = []
+    for start in range(0, len(G), points_per_chunk):
+        G_chunk, x_chunk = G[start:start + points_per_chunk], x[start:start + points_per_chunk]
+        parts = []
+        for done in range(0, n_samples, samples_per_chunk):
+            n = min(samples_per_chunk, n_samples - done)
+            parts.append(_sample_dpdz(rng, n, G_chunk, x_chunk, T, d, ki, sigma, table))
+        samples = np.concatenate(parts, axis=1)
+
+        failed = np.isnan(samples).mean(axis=1)
+        with warnings.catch_warnings():
+            # Точка, где ни одна выборка не решилась, дает NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mean = np.nanmean(samples, axis=1)
+            std = np.nanstd(samples, axis=1)
+            quantiles = np.nanpercentile(samples, percentiles, axis=1)
+        for i in range(len(G_chunk)):
+            row = {'G': G_chunk[i], 'x': x_chunk[i], 'DpDz': nominal[start + i],
+                   'mean': mean[i], 'std': std[i]}
+            row.update({f'p{p:g}': quantiles[k][i] for k, p in enumerate(percentiles)})
+            row['failed'] = failed[i]
+            rows.append(row)
+    return pd.DataFrame(rows)
@@ -0,0 +1,137 @@
+"""
+Производственный запуск дашборда под prefork WSGI-сервером.
+
+Пример (модуль грузится и прогревается в мастер-процессе до fork,
+рабочие процессы получают уже импортированные библиотеки и заполненные кэши):
+
+    DPDZ_RESULT_DIR=/var/tmp/dpdz-results \\
+        gunicorn --preload -w 4 -b 0.0.0.0:8050 'wsgi:create_app()'
+
+Фоновые расчеты идут в том процессе, который их запустил; их ход пишется
+в подкаталог progress общего дискового хранилища результатов (create_app
+всегда выбирает его), готовый результат - в само хранилище, поэтому опрос
+через любой рабочий процесс видит точки.
+
+Проверка состояния:
+    /healthz  - процесс жив
+    /readyz   - прогрев завершен (иначе 503)
+    /metrics  - метрики процесса в формате Prometheus (metrics.py)
+"""
+import os
+import time
+
+import CoolProp.CoolProp as CP
+from flask import jsonify
+
+import dashboard
+from calculation import COALESCER, EVALUATOR, JOBS
+from class_DpDz import saturation_properties
+from result_store import make_result_store, DiskResultStore
+from tiles import TILE_CACHE
+
+# Вещества и температуры, °C, для прогрева кэша свойств, если в Results ничего нет
+DEFAULT_SUBSTANCES = ['CO2']
+DEFAULT_TEMPERATURES = [0, -10, -20, -30, -35, -40]
+
+# Каталог общего хранилища результатов по умолчанию
+DEFAULT_RESULT_DIR = os.path.join('.cache', 'results')
+
+WARM_STATE = {
+    'ready': False,
+    'started': None,
+    'duration': None,
+    'substances': [],
+    'property_cache': 0,
+    'errors': [],
+}
+
+
+def _warm_temperatures(substance):
+    """Температуры из сохраненных режимов Results/<вещество>/T/*.csv"""
+    temps = set(DEFAULT_TEMPERATURES)
+    t_dir = os.path.join(dashboard.DATA_DIR, substance, 'T')
+    if os.path.isdir(t_dir):
+        for name in os.listdir(t_dir):
+            if name.endswith('.csv'):
+                try:
+                    temps.add(float(name[:-4]))
+                except ValueError:
+                    pass
+    return sorted(temps)
+
+
+def warm_up(substances=None):
+    """
+    Прогрев перед fork: тяжелые модули, таблицы CoolProp для веществ,
+    кэш свойств насыщения, шаблоны Plotly и первый запрос к Dash
+    """
+    WARM_STATE['started'] = time.time()
+    t0 = time.perf_counter()
+
+    # Ленивые части SciPy и Plotly подгружаются при первом использовании
+    import scipy.optimize  # noqa: F401
+    import plotly.express as px
+    import pandas as pd
+    px.line(pd.DataFrame({'x': [0.0, 1.0], 'y': [0.0, 1.0]}), x='x', y='y').to_dict()
+
+    substances = substances or dashboard.get_substances() or DEFAULT_SUBSTANCES
+    for substance in substances:
+        try:
+            # Первое обращение загружает вещество в CoolProp
+            CP.PropsSI('Pcrit', substance)
+            for T in _warm_temperatures(substance):
+                saturation_properties(substance, T)
+            WARM_STATE['substances'].append(substance)
+        except ValueError as e:
+            WARM_STATE['errors'].append(f"{substance}: {e}")
+
+    # Первый запрос к Dash собирает индекс, layout и зависимости callback'ов
+    client = dashboard.app.server.test_client()
+    client.get('/')
+    client.get('/_dash-layout')
+    client.get('/_dash-dependencies')
+
+    WARM_STATE['property_cache'] = saturation_properties.cache_info().currsize
+    WARM_STATE['duration'] = time.perf_counter() - t0
+    WARM_STATE['ready'] = True
+    return WARM_STATE
+
+
+def _register_health_routes(server):
+    if 'healthz' in server.view_functions:
+        return
+
+    @server.route('/healthz')
+    def healthz():
+        return jsonify(status='ok', pid=os.getpid())
+
+    @server.route('/readyz')
+    def readyz():
+        state = {
+            **WARM_STATE,
+            'pid': os.getpid(),
+            'property_cache': saturation_properties.cache_info().currsize,
+            'result_store': type(dashboard.RESULT_STORE).__name__,
+            'stored_results': len(dashboard.RESULT_STORE),
+            'coalescing': COALESCER.stats(),
+            'incremental': EVALUATOR.stats(),
+            'jobs': JOBS.stats(),
+            'tiles': TILE_CACHE.stats(),
+        }
+        return jsonify(state), (200 if WARM_STATE['ready'] else 503)
+
+
+def create_app(result_dir=None, warm=True):
+    """
+    Фабрика WSGI-приложения: общий дисковый кэш результатов,
+    маршруты состояния и прогрев. Возвращает Flask-сервер дашборда
+    """
+    if not isinstance(dashboard.RESULT_STORE, DiskResultStore):
+        # Экспорт может прийти в другой рабочий процесс, поэтому хранилище общее
+        dashboard.RESULT_STORE = make_result_store(result_dir or DEFAULT_RESULT_DIR)
+
+    server = dashboard.app.server
+    _register_health_routes(server)
+    if warm and not WARM_STATE['ready']:
+        warm_up()
+    return server